@@ -0,0 +1,164 @@
+"""Per-exchange circuit breaker with a rolling health score.
+
+Every fetch feeds ``record``: an EWMA of the failure rate and of the latency
+give a health score in 0..1 (``(1 - error_rate) / (1 + latency / slow_latency)``).
+The breaker opens when an exchange fails ``failure_threshold`` times in a row
+or its health drops below ``min_health``; while open the exchange is not
+fetched at all, so a dead venue costs the others no cycle time.
+
+After ``cooldown`` seconds the breaker goes half-open and the caller runs a
+cheap recovery probe (one small public request, see
+``exchanges.health_check``). A good probe lets a normal fetch through; that
+fetch closes the breaker, while a failure reopens it with a doubled cooldown
+(up to ``max_cooldown``). Rate limits are left to the cadence controller and
+do not count as failures.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+@dataclass
+class ExchangeHealth:
+    state: str = CLOSED
+    error_rate: float = 0.0  # EWMA of failed fetches (0..1)
+    latency: float = 0.0  # EWMA, seconds
+    observations: int = 0
+    consecutive_failures: int = 0
+    opened_at: float = 0.0
+    cooldown: float = 0.0
+    trips: int = 0
+    last_error: str | None = None
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        min_health: float = 0.25,
+        slow_latency: float = 5.0,
+        cooldown: float = 15.0,
+        max_cooldown: float = 300.0,
+        min_observations: int = 5,
+        alpha: float = 0.3,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.min_health = min_health
+        self.slow_latency = slow_latency
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_observations = min_observations
+        self.alpha = alpha
+        self.state: Dict[str, ExchangeHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> ExchangeHealth:
+        st = self.state.get(name)
+        if st is None:
+            st = self.state[name] = ExchangeHealth(cooldown=self.base_cooldown)
+        return st
+
+    def health(self, name: str) -> float:
+        st = self.state.get(name)
+        if st is None:
+            return 1.0
+        return (1.0 - st.error_rate) / (1.0 + st.latency / self.slow_latency)
+
+    def status(self, name: str) -> str:
+        st = self.state.get(name)
+        return st.state if st is not None else CLOSED
+
+    def allow(self, name: str, now: float | None = None) -> str | None:
+        """``"fetch"``, ``"probe"`` (half-open: run a cheap check first) or None (open, skip)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            st = self._get(name)
+            if st.state == CLOSED:
+                return "fetch"
+            if st.state == OPEN:
+                if now - st.opened_at < st.cooldown:
+                    return None
+                st.state = HALF_OPEN
+            return "probe"
+
+    def retry_in(self, name: str, now: float | None = None) -> float:
+        st = self.state.get(name)
+        if st is None or st.state != OPEN:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, st.opened_at + st.cooldown - now)
+
+    def _open(self, st: ExchangeHealth, now: float) -> None:
+        if st.state == HALF_OPEN:
+            st.cooldown = min(self.max_cooldown, st.cooldown * 2.0)
+        else:
+            st.cooldown = self.base_cooldown
+            st.trips += 1
+        st.state = OPEN
+        st.opened_at = now
+
+    def record(self, name: str, ok: bool, latency: float = 0.0, error: str | None = None, now: float | None = None) -> str:
+        """Feed one fetch outcome; returns the new state."""
+        if error == "rate_limit":
+            return self.status(name)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            st = self._get(name)
+            a = self.alpha
+            st.observations += 1
+            st.error_rate += a * ((0.0 if ok else 1.0) - st.error_rate)
+            if ok and latency > 0.0:
+                st.latency = latency if st.latency == 0.0 else st.latency + a * (latency - st.latency)
+            if ok:
+                st.consecutive_failures = 0
+                st.last_error = None
+            else:
+                st.consecutive_failures += 1
+                st.last_error = error or "error"
+            if st.state == HALF_OPEN:
+                if ok:
+                    st.state = CLOSED
+                    st.cooldown = self.base_cooldown
+                    # a recovered exchange starts with a clean slate
+                    st.error_rate = 0.0
+                else:
+                    self._open(st, now)
+            elif st.state == CLOSED:
+                unhealthy = st.observations >= self.min_observations and self.health(name) < self.min_health
+                if st.consecutive_failures >= self.failure_threshold or unhealthy:
+                    self._open(st, now)
+            return st.state
+
+    def record_probe(self, name: str, ok: bool, now: float | None = None) -> None:
+        """Outcome of a half-open recovery probe: a failure reopens, success waits for the real fetch."""
+        if ok:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            st = self._get(name)
+            if st.state == HALF_OPEN:
+                self._open(st, now)
+
+    def state_value(self, name: str) -> int:
+        return _STATE_VALUE[self.status(name)]
+
+    def summary(self) -> str:
+        parts = []
+        for name, st in self.state.items():
+            if st.state == OPEN:
+                parts.append(f"{name} откл. ({self.retry_in(name):.0f}с)")
+            elif st.state == HALF_OPEN:
+                parts.append(f"{name} проверка")
+        return ("Недоступны: " + "  ".join(parts)) if parts else ""
+
+
+BREAKER = CircuitBreaker()
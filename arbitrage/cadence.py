@@ -0,0 +1,226 @@
+"""Per-exchange polling cadence.
+
+Each exchange gets its own interval instead of one shared interval with a
+global backoff. After every fetch the interval is nudged:
+
+* rate limit (429 / DDoS protection): doubled; timeouts and other failures: x1.5;
+* quotes barely changing since the previous fetch: slower; changing a lot: faster;
+* never below ``min_interval`` nor below twice the smoothed response latency.
+
+On top of that a global budget caps the total request rate. The budget is
+shared max-min fair: exchanges polled in bulk (one request per fetch) keep
+their rate, and only the ones polled symbol by symbol are stretched until the
+sum of ``requests_per_fetch / interval`` fits in ``budget_rps``.
+
+``gather_aligned`` is the synchronized alternative to a plain gather: launches
+are staggered by each exchange's smoothed latency so the requests reach the
+servers at about the same instant, and the estimated skew is returned.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+
+@dataclass
+class ExchangeCadence:
+    interval: float
+    next_due: float = 0.0
+    latency: float = 0.0  # EWMA, seconds
+    error_rate: float = 0.0  # EWMA of failed fetches (0..1)
+    change_rate: float = 0.5  # EWMA of the share of quotes that moved between fetches
+    cost: float = 1.0  # requests per fetch (1 for bulk, N for per-symbol)
+    last_error: str | None = None
+    last_quotes: Dict[str, Tuple[float | None, float | None]] = field(default_factory=dict, repr=False)
+
+
+class CadenceController:
+    def __init__(
+        self,
+        names: Iterable[str],
+        base_interval: float,
+        min_interval: float | None = None,
+        max_interval: float = 60.0,
+        budget_rps: float = 30.0,
+        alpha: float = 0.3,
+    ) -> None:
+        self.base_interval = max(0.1, float(base_interval))
+        self._min_from_base = min_interval is None
+        self.min_interval = max(0.1, min_interval if min_interval is not None else self.base_interval / 2.0)
+        self.max_interval = max(self.base_interval, float(max_interval))
+        self.budget_rps = float(budget_rps)
+        self.alpha = alpha
+        self.state: Dict[str, ExchangeCadence] = {n: ExchangeCadence(interval=self.base_interval) for n in names}
+        # (achieved, simultaneous-launch) skew of the last synchronized cycle, seconds
+        self.last_skew: Tuple[float, float] | None = None
+
+    def add(self, name: str) -> None:
+        self.state.setdefault(name, ExchangeCadence(interval=self.base_interval))
+
+    def remove(self, name: str) -> None:
+        self.state.pop(name, None)
+
+    def set_base_interval(self, base_interval: float, now: float | None = None) -> None:
+        """Apply a new base interval to a running controller; adaptation restarts from it."""
+        now = time.monotonic() if now is None else now
+        self.base_interval = max(0.1, float(base_interval))
+        if self._min_from_base:
+            self.min_interval = max(0.1, self.base_interval / 2.0)
+        self.max_interval = max(self.base_interval, self.max_interval)
+        for st in self.state.values():
+            st.interval = self.base_interval
+            st.next_due = min(st.next_due, now + self.base_interval)
+
+    def _allowed_rates(self) -> Dict[str, float]:
+        """Requests/s granted per exchange (water-filling over the budget)."""
+        demand = sorted(((st.cost / st.interval, n) for n, st in self.state.items()))
+        if self.budget_rps <= 0 or sum(d for d, _ in demand) <= self.budget_rps:
+            return {n: d for d, n in demand}
+        remaining = self.budget_rps
+        out: Dict[str, float] = {}
+        for i, (d, n) in enumerate(demand):
+            share = remaining / (len(demand) - i)
+            out[n] = min(d, share)
+            remaining -= out[n]
+        return out
+
+    def effective_interval(self, name: str) -> float:
+        st = self.state[name]
+        rate = self._allowed_rates().get(name) or 0.0
+        interval = st.cost / rate if rate > 0 else st.interval
+        return min(self.max_interval, max(st.interval, interval))
+
+    def due(self, now: float | None = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        return [n for n, st in self.state.items() if st.next_due <= now]
+
+    def seconds_until_next(self, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        if not self.state:
+            return self.base_interval
+        return max(0.0, min(st.next_due for st in self.state.values()) - now)
+
+    def seconds_until_all(self, now: float | None = None) -> float:
+        """Time until every exchange is due (synchronized mode polls them together)."""
+        now = time.monotonic() if now is None else now
+        if not self.state:
+            return self.base_interval
+        return max(0.0, max(st.next_due for st in self.state.values()) - now)
+
+    def latencies(self) -> Dict[str, float]:
+        return {n: st.latency for n, st in self.state.items()}
+
+    def record_skew(self, skew: float, naive: float) -> None:
+        self.last_skew = (skew, naive)
+
+    def observe(
+        self,
+        name: str,
+        latency: float,
+        tickers: Dict[str, dict],
+        error: str | None = None,
+        requests: int = 1,
+        now: float | None = None,
+    ) -> None:
+        """Record one fetch and schedule the next one for ``name``.
+
+        ``error`` is ``"rate_limit"``, ``"timeout"`` or ``"error"``; an empty
+        ``tickers`` without an error counts as ``"error"``. ``"open"`` means
+        the circuit breaker skipped the exchange: nothing was requested, so the
+        interval and the latency/error averages are left as they are.
+        """
+        st = self.state.get(name)
+        if st is None:
+            st = self.state[name] = ExchangeCadence(interval=self.base_interval)
+        now = time.monotonic() if now is None else now
+        if error == "open":
+            st.last_error = error
+            st.next_due = now + self.effective_interval(name)
+            return
+        a = self.alpha
+        st.latency = latency if st.latency == 0.0 else st.latency + a * (latency - st.latency)
+        st.cost = float(max(1, requests))
+        if error is None and not tickers:
+            error = "error"
+        elif error != "rate_limit" and tickers:
+            # a few failed symbols in per-symbol mode are not a failed fetch
+            error = None
+        st.last_error = error
+        st.error_rate += a * ((1.0 if error else 0.0) - st.error_rate)
+        if error == "rate_limit":
+            st.interval *= 2.0
+        elif error:
+            st.interval *= 1.5
+        else:
+            changed = 0
+            quotes = {s: (t.get("bid"), t.get("ask")) for s, t in tickers.items()}
+            prev = st.last_quotes
+            common = 0
+            for s, q in quotes.items():
+                p = prev.get(s)
+                if p is not None:
+                    common += 1
+                    if p != q:
+                        changed += 1
+            st.last_quotes = quotes
+            if common:
+                st.change_rate += a * (changed / common - st.change_rate)
+            if st.change_rate < 0.05:
+                # quiet market: slow down, but keep quotes reasonably fresh
+                st.interval = max(st.interval, min(st.interval * 1.25, self.base_interval * 4.0))
+            elif st.change_rate > 0.25:
+                st.interval *= 0.85
+            else:
+                st.interval += 0.2 * (self.base_interval - st.interval)
+        floor = max(self.min_interval, 2.0 * st.latency)
+        st.interval = min(self.max_interval, max(floor, st.interval))
+        st.next_due = now + self.effective_interval(name)
+
+    def summary(self) -> str:
+        parts = []
+        for name, st in self.state.items():
+            flag = {"rate_limit": " 429", "timeout": " t/o", "error": " err", "open": " откл."}.get(st.last_error or "", "")
+            parts.append(f"{name} {self.effective_interval(name):.1f}с ({st.latency * 1e3:.0f}мс{flag})")
+        line = "Опрос: " + "  ".join(parts)
+        if self.last_skew is not None:
+            skew, naive = self.last_skew
+            line += f"  | перекос {skew * 1e3:.0f}мс (без сдвига ~{naive * 1e3:.0f}мс)"
+        return line
+
+
+async def gather_aligned(
+    calls: Dict[str, Callable[[], Awaitable[Any]]],
+    latency: Dict[str, float],
+) -> Tuple[Dict[str, Any], float, float]:
+    """Run ``calls`` so that their server-side instants line up.
+
+    The server is assumed to build the response half a round trip after the
+    launch, so the exchange with the slowest round trip starts first and the
+    others wait ``(max_rtt - rtt) / 2``. Returns results (exceptions included,
+    like ``return_exceptions=True``), the estimated skew between the
+    request midpoints in seconds, and the skew a simultaneous launch would
+    have had with the same latencies.
+    """
+    half = {n: latency.get(n, 0.0) / 2.0 for n in calls}
+    lead = max(half.values()) if half else 0.0
+    mids: Dict[str, float] = {}
+
+    async def _one(name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        delay = lead - half[name]
+        if delay > 0.0:
+            await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        try:
+            return await fn()
+        except Exception as e:
+            return e
+        finally:
+            mids[name] = (t0 + time.perf_counter()) / 2.0
+
+    names = list(calls)
+    results = await asyncio.gather(*[_one(n, calls[n]) for n in names])
+    skew = (max(mids.values()) - min(mids.values())) if len(mids) > 1 else 0.0
+    naive = (max(half.values()) - min(half.values())) if len(half) > 1 else 0.0
+    return dict(zip(names, results)), skew, naive
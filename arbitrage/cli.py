@@ -1,63 +1,250 @@
 import asyncio
 import argparse
-from typing import Dict, List
+import time
+from typing import Dict, List, Sequence
 
 from rich.console import Console
 from rich.table import Table
 from rich.live import Live
+from rich.console import Group
 
-from .exchanges import create_exchange, close_exchange, get_usdt_spot_symbols, fetch_tickers, create_exchange_safe
-from .scanner import compute_opportunities
+from .exchanges import create_exchange, close_exchange, get_usdt_spot_symbols, fetch_tickers_timed, create_exchange_safe, fetch_status, diagnose_connectivity, refresh_markets
+from .cadence import CadenceController, gather_aligned
+from .breaker import BREAKER
+from .consensus import CONSENSUS
+from .markets import MarketUniverse
+from .endpoints import SELECTOR as ENDPOINTS
+from . import transport
+from .metrics import METRICS, MetricsServer
+from . import tracing
+from .tracing import span
+from .profiling import CycleProfiler
+from .scanner import apply_net_pnl, compute_opportunities, filter_by_z, rank_by_net_pnl, route_key
+from .spreadstats import SpreadStats
+from .lifecycle import LifecycleTracker
+from .networks import RETRY_SEC, transfer_networks
+from .fees import FeeMatrix
+from .recorder import TickRecorder
+from .replay import replay
+from .timing import NULL_TIMER, StageTimer
 
 
 async def _prepare_exchanges(names: List[str]):
     exchanges = {}
     failed: List[str] = []
-    for name in names:
-        try:
-            ex = await create_exchange_safe(name)
-            if ex is None:
-                failed.append(name)
-            else:
-                exchanges[name] = ex
-        except Exception:
+    created = await asyncio.gather(*[create_exchange_safe(name) for name in names], return_exceptions=True)
+    for name, ex in zip(names, created):
+        ok = ex is not None and not isinstance(ex, Exception)
+        BREAKER.record(name, ok)
+        if ok:
+            exchanges[name] = ex
+        else:
             failed.append(name)
     return exchanges, failed
 
 
-def _union_symbols(exchanges) -> List[str]:
-    all_syms = set()
-    for ex in exchanges.values():
-        all_syms |= set(get_usdt_spot_symbols(ex))
-    return sorted(all_syms)
+def _market_universe(exchanges) -> MarketUniverse:
+    universe = MarketUniverse()
+    for name, ex in exchanges.items():
+        universe.set_exchange(name, get_usdt_spot_symbols(ex))
+    return universe
+
+
+def _caption(cadence: CadenceController, universe: MarketUniverse) -> str:
+    return "\n".join(
+        line
+        for line in (cadence.summary(), BREAKER.summary(), ENDPOINTS.summary(), universe.summary(), CONSENSUS.summary())
+        if line
+    )
 
 
-def _render_table(opps) -> Table:
-    table = Table(title="Арбитражные возможности (после комиссий)")
+def _render_table(
+    opps,
+    caption: str | None = None,
+    deal_sizes: Sequence[float] = (),
+    tracker: LifecycleTracker | None = None,
+) -> Table:
+    table = Table(title="Арбитражные возможности (после комиссий)", caption=caption)
     table.add_column("Пара", justify="left")
     table.add_column("Покупка", justify="left")
     table.add_column("Продажа", justify="left")
     table.add_column("Ask", justify="right")
     table.add_column("Bid", justify="right")
     table.add_column("Спред %", justify="right")
+    table.add_column("z", justify="right")
+    if tracker is not None:
+        table.add_column("Держится, мин", justify="right")
+    if deal_sizes:
+        table.add_column("Сеть", justify="left")
+        for size in deal_sizes:
+            table.add_column(f"Профит ${size:g}", justify="right")
 
     for o in opps:
-        table.add_row(
+        row = [
             o.symbol,
             o.buy_exchange,
             o.sell_exchange,
             f"{o.buy_price:.6f}",
             f"{o.sell_price:.6f}",
             f"{o.spread_pct:.3f}",
+            "" if o.z is None else f"{o.z:.1f}",
+        ]
+        if tracker is not None:
+            route = tracker.get(o.symbol, o.buy_exchange, o.sell_exchange)
+            row.append("" if route is None else f"{route.age() / 60.0:.1f}")
+        if deal_sizes and o.net is not None:
+            # "~": transfer fees not known yet, only the known part is deducted
+            approx = "" if o.net.transfers_known else "~"
+            row.append(o.net.base_network or ("…" if o.net.transferable else "нет"))
+            row.extend(f"{approx}{pnl:.2f}" for pnl in o.net.pnl)
+        table.add_row(*row)
+    return table
+
+
+async def _fetch_transfers(exchanges, opps, transfers: Dict[str, tuple], retry: Dict[str, float], limit: int = 3) -> None:
+    """Withdraw networks/fees for the best routes not cached yet (runs beside the scan).
+
+    Failed lookups are not cached (the route stays unknown) and are retried
+    after ``RETRY_SEC``.
+    """
+    count = 0
+    now = time.monotonic()
+    for o in opps:
+        key = route_key(o.buy_exchange, o.sell_exchange, o.symbol)
+        if key in transfers or retry.get(key, 0.0) > now:
+            continue
+        buy = exchanges.get(o.buy_exchange)
+        sell = exchanges.get(o.sell_exchange)
+        if buy is None or sell is None:
+            continue
+        try:
+            transfers[key] = await transfer_networks(buy, sell, o.symbol)
+            retry.pop(key, None)
+        except Exception:
+            retry[key] = time.monotonic() + RETRY_SEC
+        count += 1
+        if count >= limit:
+            break
+
+
+def _render_stats(timer: StageTimer) -> Table:
+    table = Table(title="Время этапов цикла (мс)")
+    table.add_column("Этап", justify="left")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right")
+    table.add_column("p99", justify="right")
+    table.add_column("n", justify="right")
+    # Pipeline stages first, then per-exchange rows (fetch:<exchange>)
+    pct = timer.percentiles()
+    for name in sorted(pct, key=lambda n: (":" in n, n)):
+        p50, p95, p99, n = pct[name]
+        table.add_row(name, f"{p50:.1f}", f"{p95:.1f}", f"{p99:.1f}", str(n))
+    return table
+
+
+def _render_replay(result, top_n: int) -> Table:
+    span = 0.0
+    if result.first_ts is not None and result.last_ts is not None:
+        span = result.last_ts - result.first_ts
+    table = Table(title=f"Реплей: циклов {result.cycles}, {span / 60:.1f} мин, возможностей {result.total_opportunities}")
+    table.add_column("Покупка", justify="left")
+    table.add_column("Продажа", justify="left")
+    table.add_column("Кол-во", justify="right")
+    table.add_column("Длит. p50 (с)", justify="right")
+    table.add_column("Длит. p90 (с)", justify="right")
+    table.add_column("Длит. max (с)", justify="right")
+    table.add_column("Спред p50 %", justify="right")
+    table.add_column("Спред p90 %", justify="right")
+    table.add_column("Спред max %", justify="right")
+
+    pairs = sorted(result.pairs.values(), key=lambda p: p.count, reverse=True)
+    for p in pairs[:top_n]:
+        d50, d90, dmax = p.duration_quantiles()
+        s50, s90, smax = p.spread_quantiles()
+        table.add_row(
+            p.buy_exchange,
+            p.sell_exchange,
+            str(p.count),
+            f"{d50:.1f}",
+            f"{d90:.1f}",
+            f"{dmax:.1f}",
+            f"{s50:.3f}",
+            f"{s90:.3f}",
+            f"{smax:.3f}",
         )
     return table
 
 
-async def run(interval: float, min_spread_bps: float, top_n: int, exchanges_list: List[str], min_qv_usd: float):
+def run_replay(path: str, min_spread_bps: float, top_n: int, min_qv_usd: float) -> None:
+    console = Console()
+    result = replay(path, min_spread_pct=min_spread_bps / 100.0, min_quote_volume_usd=min_qv_usd)
+    if result.cycles == 0:
+        console.print(f"[yellow]В логе нет записанных циклов: {path}[/yellow]")
+        return
+    console.print(_render_replay(result, top_n))
+
+
+def run_diagnose(samples: int) -> None:
+    console = Console()
+    with console.status("Проверка соединения..."):
+        checks = diagnose_connectivity(samples=samples)
+
+    def ms(v: float | None) -> str:
+        return "-" if v is None else f"{v:.0f}"
+
+    table = Table(title=f"Соединение с биржами ({samples} замер.)")
+    table.add_column("Хост")
+    table.add_column("DNS мс", justify="right")
+    table.add_column("TCP мс", justify="right")
+    table.add_column("TLS мс", justify="right")
+    table.add_column("TTFB p50", justify="right")
+    table.add_column("TTFB p95", justify="right")
+    table.add_column("HTTP")
+    for label, rep in checks.items():
+        if rep.error:
+            table.add_row(label, ms(rep.dns_ms), "", "", "", "", f"[red]{rep.error}[/red]")
+            continue
+        table.add_row(
+            label, ms(rep.dns_ms), ms(rep.tcp_ms), ms(rep.tls_ms), ms(rep.ttfb_p50), ms(rep.ttfb_p95),
+            f"{rep.status} ({rep.ok}/{len(rep.samples)})",
+        )
+    console.print(table)
+
+
+async def run(
+    interval: float,
+    min_spread_bps: float,
+    top_n: int,
+    exchanges_list: List[str],
+    min_qv_usd: float,
+    record_dir: str | None = None,
+    record_max_mb: float = 64.0,
+    show_stats: bool = False,
+    metrics_port: int = 0,
+    trace_dir: str | None = None,
+    trace_max_mb: float = 32.0,
+    profiler: CycleProfiler | None = None,
+    budget_rps: float = 30.0,
+    aligned: bool = False,
+    deal_sizes: Sequence[float] = (),
+    min_pnl: float | None = None,
+    include_transfers: bool = True,
+    min_z: float | None = None,
+):
     console = Console()
     min_spread_pct = min_spread_bps / 100.0
+    timer = StageTimer() if show_stats else NULL_TIMER
+    transfer_task: asyncio.Task | None = None
+    # typical spread per route, for the z-score column and --min-z
+    stats = SpreadStats()
+    # open opportunities across cycles, for their age
+    tracker = LifecycleTracker()
 
     exchanges, failed = await _prepare_exchanges(exchanges_list)
+    recorder = TickRecorder(record_dir, max_bytes=int(record_max_mb * 1024 * 1024)) if record_dir else None
+    metrics_server = MetricsServer(port=metrics_port).start() if metrics_port > 0 else None
+    if trace_dir:
+        tracing.enable(trace_dir, max_bytes=int(trace_max_mb * 1024 * 1024))
     try:
         if failed:
             console.print(f"[yellow]Не удалось подключиться к: {', '.join(failed)}. Работаем с остальными.[/yellow]")
@@ -65,7 +252,10 @@ async def run(interval: float, min_spread_bps: float, top_n: int, exchanges_list
             console.print("[red]Недостаточно бирж онлайн для арбитража (нужно минимум 2).[/red]")
             return
 
-        symbols = _union_symbols(exchanges)
+        universe = _market_universe(exchanges)
+        symbols = universe.union()
+        # taker fees per (exchange, symbol) from the loaded markets, resolved once
+        fees = FeeMatrix(symbols, exchanges)
         if not symbols:
             console.print("[yellow]Не найдено USDT-спот пар на доступных биржах.[/yellow]")
             return
@@ -74,36 +264,119 @@ async def run(interval: float, min_spread_bps: float, top_n: int, exchanges_list
         if min_qv_usd > 0:
             console.print(f"Фильтр ликвидности: quoteVolume >= {min_qv_usd:,.0f} USDT")
 
+        # each exchange is polled on its own cadence; others keep their last quotes
+        cadence = CadenceController(exchanges, base_interval=interval, budget_rps=budget_rps)
+        tickers_by_exchange: Dict[str, Dict[str, dict]] = {name: {} for name in exchanges}
+        refreshing: Dict[str, asyncio.Task] = {}
+        # route_key -> (base leg, USDT return leg) withdraw networks, filled in the background
+        transfers: Dict[str, tuple] = {}
+        transfer_retry: Dict[str, float] = {}  # route_key -> monotonic time of the next lookup
+        if profiler is not None:
+            profiler.start()
         with Live(console=console, refresh_per_second=4) as live:
             while True:
-                tickers_by_exchange: Dict[str, Dict[str, dict]] = {}
-                tasks = [
-                    fetch_tickers(ex, symbols) for ex in exchanges.values()
-                ]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for (name, _ex), res in zip(exchanges.items(), results):
-                    if isinstance(res, Exception):
-                        tickers_by_exchange[name] = {}
-                    else:
+                # listings/delistings: market lists are re-fetched in the background
+                # and only the diff is applied (every symbol is polled each cycle,
+                # so new listings need no extra priority here)
+                for diff in universe.poll_refresh(exchanges, refreshing, lambda ex: asyncio.ensure_future(refresh_markets(ex))):
+                    quotes = tickers_by_exchange.get(diff.exchange, {})
+                    for sym in diff.removed:
+                        quotes.pop(sym, None)
+                    for key in [k for k in transfers if k.partition(":")[2] in diff.removed]:
+                        del transfers[key]
+                    CONSENSUS.forget(diff.shared_removed)
+                    symbols = universe.union()
+                    fees = FeeMatrix(symbols, exchanges)
+                due = cadence.due()
+                if aligned and len(due) < len(exchanges):
+                    # synchronized mode: wait until every exchange is due, then launch together
+                    await asyncio.sleep(cadence.seconds_until_all())
+                    continue
+                if not due:
+                    await asyncio.sleep(cadence.seconds_until_next())
+                    continue
+                cycle_t0 = time.perf_counter()
+                with timer.stage("cycle"), span("cycle", exchanges=len(due)):
+                    with timer.stage("fetch"), span("fetch", aligned=aligned):
+                        if aligned:
+                            by_name, skew, naive = await gather_aligned(
+                                {name: (lambda name=name: fetch_tickers_timed(name, exchanges[name], symbols, timer=timer)) for name in due},
+                                cadence.latencies(),
+                            )
+                            results = [by_name[name] for name in due]
+                            cadence.record_skew(skew, naive)
+                            timer.add("skew", skew)
+                            METRICS.quote_skew.observe(skew)
+                        else:
+                            tasks = [
+                                fetch_tickers_timed(name, exchanges[name], symbols, timer=timer) for name in due
+                            ]
+                            results = await asyncio.gather(*tasks, return_exceptions=True)
+                    for name, res in zip(due, results):
+                        error, requests_spent, latency = fetch_status(name, len(symbols))
+                        if isinstance(res, Exception):
+                            res, error = {}, "error"
                         tickers_by_exchange[name] = res
+                        cadence.observe(name, latency, res, error=error, requests=requests_spent)
+                    if recorder is not None:
+                        recorder.record(tickers_by_exchange)
 
-                opps = compute_opportunities(
-                    symbols,
-                    tickers_by_exchange,
-                    min_spread_pct,
-                    min_quote_volume_usd=min_qv_usd,
-                )
-                live.update(_render_table(opps[:top_n]))
-                await asyncio.sleep(interval)
+                    with timer.stage("compute"), span("compute"):
+                        opps = compute_opportunities(
+                            symbols,
+                            tickers_by_exchange,
+                            min_spread_pct,
+                            min_quote_volume_usd=min_qv_usd,
+                            fees=fees,
+                            consensus=CONSENSUS,
+                            stats=stats,
+                        )
+                        tracker.update(opps)
+                        opps = filter_by_z(opps, min_z)
+                    if deal_sizes:
+                        # net PnL per deal size after taker fees and both transfers
+                        with timer.stage("net"), span("net"):
+                            apply_net_pnl(opps, deal_sizes, transfers, include_transfers)
+                            by_spread = opps
+                            opps = rank_by_net_pnl(opps, min_pnl, include_transfers)
+                        # looked up in spread order: routes with unknown fees rank low and would never get theirs
+                        if include_transfers and (transfer_task is None or transfer_task.done()):
+                            transfer_task = asyncio.ensure_future(_fetch_transfers(exchanges, by_spread[:top_n], transfers, transfer_retry))
+                    with timer.stage("render"), span("render", "ui"):
+                        table = _render_table(opps[:top_n], caption=_caption(cadence, universe), deal_sizes=deal_sizes, tracker=tracker)
+                        if timer.enabled:
+                            live.update(Group(table, _render_stats(timer)))
+                        else:
+                            live.update(table)
+                METRICS.record_cycle(time.perf_counter() - cycle_t0, len(opps))
+                if profiler is not None and profiler.cycle_done():
+                    break
+                await asyncio.sleep(cadence.seconds_until_next())
     finally:
+        if transfer_task is not None:
+            transfer_task.cancel()
         await asyncio.gather(*[close_exchange(ex) for ex in exchanges.values()])
+        await transport.close_shared_session()
+        if recorder is not None:
+            recorder.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        tracing.disable()
+        if profiler is not None and profiler.done:
+            console.print(f"Профиль ({profiler.done} цикл.): {profiler.stop()}")
 
 
 def parse_args():
     p = argparse.ArgumentParser(description="USDT спот-арбитраж между Bitget, BingX, Bybit")
-    p.add_argument("--interval", type=float, default=5.0, help="Интервал обновления (сек)")
+    p.add_argument("--interval", type=float, default=5.0, help="Базовый интервал опроса биржи (сек), дальше подстраивается под каждую биржу")
+    p.add_argument("--sync-fetch", action="store_true", help="Синхронный опрос: сдвигать запуск запросов по задержке бирж, чтобы котировки снимались в один момент")
+    p.add_argument("--budget-rps", type=float, default=30.0, help="Общий лимит запросов к биржам в секунду (0 — без лимита)")
     p.add_argument("--min-spread-bps", type=float, default=0.0, help="Минимальный спред (б.п.)")
     p.add_argument("--top", type=int, default=20, help="Сколько показать лучших возможностей")
+    p.add_argument("--deal-sizes", type=str, default="100,1000,5000", help="Размеры сделки в USDT через запятую для расчёта чистого профита (пусто — без расчёта)")
+    p.add_argument("--min-pnl", type=float, default=None, help="Показывать только возможности с чистым профитом не ниже (USDT) хотя бы для одного размера сделки")
+    p.add_argument("--min-z", type=float, default=None, help="Показывать только спреды, которые выше обычного для маршрута хотя бы на столько стандартных отклонений")
+    p.add_argument("--no-transfers", action="store_true", help="Не учитывать комиссии вывода монеты и возврата USDT в профите")
     p.add_argument(
         "--exchanges",
         type=str,
@@ -116,11 +389,38 @@ def parse_args():
         default=50000.0,
         help="Минимальная ликвидность (24ч quoteVolume в USDT) на КАЖДОЙ бирже",
     )
+    p.add_argument("--record", type=str, default=None, help="Каталог для записи тиков каждого цикла (бинарный лог)")
+    p.add_argument("--record-max-mb", type=float, default=64.0, help="Размер файла лога тиков до ротации (МБ)")
+    p.add_argument("--stats", action="store_true", help="Показывать панель времени этапов цикла (p50/p95/p99)")
+    p.add_argument("--metrics-port", type=int, default=0, help="Порт локального эндпоинта метрик Prometheus (0 — выкл.)")
+    p.add_argument("--trace", type=str, default=None, help="Каталог для трассировки циклов (Chrome trace-event JSON)")
+    p.add_argument("--trace-max-mb", type=float, default=32.0, help="Размер файла трассировки до ротации (МБ)")
+    p.add_argument("--profile", type=int, default=0, metavar="N", help="Профилировать N циклов сканирования, записать отчёт и выйти")
+    p.add_argument("--profile-mode", choices=["cprofile", "sample"], default="cprofile", help="Детерминированный профайлер или сэмплирование стека")
+    p.add_argument("--profile-out", type=str, default="profiles", help="Каталог для отчётов профилирования")
+    p.add_argument("--http-transport", choices=["shared", "default"], default=None, help="shared — общий пул соединений с кэшем DNS для всех бирж, default — настройки ccxt (по умолчанию из ARB_HTTP_TRANSPORT или shared)")
+    p.add_argument("--uvloop", action="store_true", help="Использовать uvloop, если установлен")
+    p.add_argument("--diagnose", action="store_true", help="Проверить соединение с биржами (DNS, TCP, TLS, TTFB p50/p95) и выйти")
+    p.add_argument("--diagnose-samples", type=int, default=5, help="Сколько замеров на хост для --diagnose")
+    p.add_argument("--replay", type=str, default=None, help="Прогнать записанный лог тиков (файл или каталог) вместо живых бирж")
     return p.parse_args()
 
 
-async def main_async():
-    args = parse_args()
+def _parse_sizes(raw: str) -> List[float]:
+    sizes: List[float] = []
+    for part in (raw or "").split(","):
+        try:
+            size = float(part)
+        except ValueError:
+            continue
+        if size > 0:
+            sizes.append(size)
+    return sizes
+
+
+async def main_async(args=None):
+    if args is None:
+        args = parse_args()
     exchanges_list = [x.strip().lower() for x in args.exchanges.split(",") if x.strip()]
     await run(
         interval=args.interval,
@@ -128,11 +428,35 @@ async def main_async():
         top_n=args.top,
         exchanges_list=exchanges_list,
         min_qv_usd=args.min_qv_usd,
+        record_dir=args.record,
+        record_max_mb=args.record_max_mb,
+        show_stats=args.stats,
+        metrics_port=args.metrics_port,
+        trace_dir=args.trace,
+        trace_max_mb=args.trace_max_mb,
+        budget_rps=args.budget_rps,
+        aligned=args.sync_fetch,
+        deal_sizes=_parse_sizes(args.deal_sizes),
+        min_pnl=args.min_pnl,
+        include_transfers=not args.no_transfers,
+        min_z=args.min_z,
+        profiler=CycleProfiler(args.profile, out_dir=args.profile_out, mode=args.profile_mode) if args.profile > 0 else None,
     )
 
 
 def main():
-    asyncio.run(main_async())
+    args = parse_args()
+    if args.http_transport:
+        transport.set_enabled(args.http_transport == "shared")
+    if args.uvloop and not transport.install_uvloop():
+        print("uvloop не установлен, используется стандартный цикл asyncio")
+    if args.diagnose:
+        run_diagnose(args.diagnose_samples)
+        return
+    if args.replay:
+        run_replay(args.replay, min_spread_bps=args.min_spread_bps, top_n=args.top, min_qv_usd=args.min_qv_usd)
+        return
+    asyncio.run(main_async(args))
 
 
 if __name__ == "__main__":
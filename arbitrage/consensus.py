@@ -0,0 +1,130 @@
+"""Cross-exchange price consensus: drop quotes that belong to a different token.
+
+The same ticker can name unrelated tokens on two exchanges (a renamed or
+relisted coin, a small token squatting a symbol). The resulting "spread" is
+large and fake, yet it reached the top of the table, started withdraw-network
+lookups and raised alerts; the scanner only cut spreads above 300%.
+
+The scanner calls ``PriceConsensus.check`` only for symbols whose best bid is
+more than ``max_deviation`` above the best ask, so quotes that agree cost one
+reference update per symbol. For the others each exchange's mid price is
+compared with a reference: the median across all quoting exchanges when at
+least three quote, else the symbol's rolling price (an EWMA of past mids
+on which the exchanges agreed). The rolling price also overrules a median
+that has moved away from it, as happens when two of three exchanges list
+the other token. Quotes further than ``max_deviation`` from the reference are
+dropped for the cycle. Two disagreeing quotes and no history leave nothing
+to judge by, and the symbol is skipped.
+
+Rejections are kept per symbol for review (``recent``, ``summary``) and
+counted in ``arb_consensus_rejections_total``.
+"""
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from statistics import median
+from typing import Dict, List, Set
+
+from .metrics import METRICS
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+# relative distance from the reference price beyond which a quote is rejected
+MAX_DEVIATION = _env_float("ARB_CONSENSUS_MAX_DEV", 0.3)
+# how long a rejection stays listed for review
+REJECTION_TTL = _env_float("ARB_CONSENSUS_TTL_SEC", 600.0)
+
+
+@dataclass
+class Rejection:
+    symbol: str
+    exchanges: List[str]  # quotes dropped
+    reference: float | None  # None: no consensus, the whole symbol was skipped
+    prices: Dict[str, float] = field(default_factory=dict)  # mid per quoting exchange
+    at: float = 0.0  # wall time of the last rejection
+    count: int = 1
+
+
+class PriceConsensus:
+    def __init__(
+        self,
+        max_deviation: float = MAX_DEVIATION,
+        alpha: float = 0.2,
+        rejection_ttl: float = REJECTION_TTL,
+    ) -> None:
+        self.max_deviation = max_deviation
+        # best bid / best ask ratio above which the quotes are checked
+        self.limit = 1.0 + max_deviation
+        self.alpha = alpha
+        self.rejection_ttl = rejection_ttl
+        self.reference: Dict[str, float] = {}  # symbol -> rolling agreed mid price
+        self.rejected: Dict[str, Rejection] = {}
+
+    def observe(self, symbol: str, mid: float) -> None:
+        ref = self.reference.get(symbol)
+        self.reference[symbol] = mid if ref is None else ref + self.alpha * (mid - ref)
+
+    def check(self, symbol: str, mids: Dict[str, float], now: float | None = None) -> Set[str] | None:
+        """Exchanges whose mid price of ``symbol`` is off the consensus; None if there is none."""
+        history = self.reference.get(symbol)
+        ref = median(mids.values()) if len(mids) >= 3 else None
+        if history is not None and (ref is None or abs(ref / history - 1.0) > self.max_deviation):
+            ref = history
+        if ref is None or ref <= 0.0:
+            self._reject(symbol, list(mids), None, mids, now)
+            return None
+        lo = ref * (1.0 - self.max_deviation)
+        hi = ref * (1.0 + self.max_deviation)
+        bad = {ex for ex, p in mids.items() if not lo <= p <= hi}
+        if bad:
+            self._reject(symbol, sorted(bad), ref, mids, now)
+        agreed = [p for ex, p in mids.items() if ex not in bad]
+        if len(agreed) >= 2:
+            self.observe(symbol, median(agreed))
+        return bad
+
+    def _reject(self, symbol: str, exchanges: List[str], ref: float | None, mids: Dict[str, float], now: float | None) -> None:
+        prev = self.rejected.get(symbol)
+        self.rejected[symbol] = Rejection(
+            symbol=symbol,
+            exchanges=exchanges,
+            reference=ref,
+            prices=dict(mids),
+            at=time.time() if now is None else now,
+            count=(prev.count + 1) if prev is not None else 1,
+        )
+        for ex in exchanges:
+            METRICS.consensus_rejections.inc(exchange=ex)
+
+    def forget(self, symbols) -> None:
+        """Drop the history of delisted symbols."""
+        for sym in symbols:
+            self.reference.pop(sym, None)
+            self.rejected.pop(sym, None)
+
+    def recent(self, now: float | None = None) -> List[Rejection]:
+        """Rejections within ``rejection_ttl``, newest first (expired ones are dropped)."""
+        now = time.time() if now is None else now
+        for sym in [s for s, r in self.rejected.items() if now - r.at > self.rejection_ttl]:
+            del self.rejected[sym]
+        return sorted(self.rejected.values(), key=lambda r: r.at, reverse=True)
+
+    def summary(self) -> str:
+        recent = self.recent()
+        if not recent:
+            return ""
+        shown = ", ".join(f"{r.symbol} ({', '.join(r.exchanges)})" for r in recent[:5])
+        if len(recent) > 5:
+            shown += f" +{len(recent) - 5}"
+        return f"Цены не сходятся: {shown}"
+
+
+CONSENSUS = PriceConsensus()
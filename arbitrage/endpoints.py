@@ -0,0 +1,265 @@
+"""Fastest-endpoint selection per exchange.
+
+Some exchanges answer on several mirror or regional hosts (Bybit:
+bybitglobal.com / bybit.com / bytick.com, HTX: huobi.pro / api-aws). The
+selector probes every candidate host of an exchange (see probe.py) when the
+exchange is created and again every ``interval`` seconds in a background
+thread, then points the exchange at the healthy host with the lowest time to
+first byte. The switch rewrites the host part of the exchange's API urls in
+place, so the ccxt object, its markets and its connection pool survive.
+
+After ``max_failures`` consecutive failed fetches (timeouts and connection
+errors, not rate limits) the exchange fails over to the next host in the
+last ranking right away and a re-probe is scheduled.
+
+Configuration (environment):
+
+* ``ARB_ENDPOINTS_<NAME>=https://a.example,https://b.example`` — candidate
+  hosts, replacing the defaults below. A base URL override
+  (``ARB_BASE_URL_<NAME>``, fake venues) is kept as the first candidate, so a
+  set of local stand-in servers can be raced against each other;
+* ``ARB_ENDPOINT_PATH_<NAME>=/v5/market/time`` — cheap public path to probe;
+* ``ARB_ENDPOINT_SELECT=0`` — no probing, always use the first candidate;
+* ``ARB_ENDPOINT_REPROBE_SEC=300`` — re-probe period.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from .probe import probe_endpoints
+
+# First entry is the default when probing is off or every candidate fails
+DEFAULT_CANDIDATES: Dict[str, List[str]] = {
+    "bybit": ["https://api.bybitglobal.com", "https://api.bybit.com", "https://api.bytick.com"],
+    "htx": ["https://api.huobi.pro", "https://api-aws.huobi.pro"],
+}
+
+# Cheap public endpoint per exchange id (fake venues are Bybit-shaped)
+PROBE_PATHS: Dict[str, str] = {
+    "bybit": "/v5/market/time",
+    "htx": "/v1/common/timestamp",
+    "huobi": "/v1/common/timestamp",
+    "kucoin": "/api/v1/timestamp",
+    "gateio": "/api/v4/spot/time",
+    "gate": "/api/v4/spot/time",
+    "mexc": "/api/v3/ping",
+    "bitget": "/api/v2/public/time",
+    "bingx": "/openApi/swap/v2/server/time",
+    "bitmart": "/system/time",
+}
+
+
+def _netloc(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def rewrite_hosts(exchange: Any, hosts: List[str], base_url: str) -> None:
+    """Move every API url of ``exchange`` whose host is one of ``hosts`` to ``base_url``'s host.
+
+    Paths are kept, urls on other hosts (e.g. a separate futures API) are left alone.
+    """
+    target = urlsplit(base_url.rstrip("/"))
+    netlocs = {_netloc(h) for h in hosts}
+    if not hasattr(exchange, "urls") and hasattr(exchange, "base_url"):
+        # BybitDirectSync
+        if _netloc(exchange.base_url) in netlocs:
+            exchange.base_url = base_url.rstrip("/")
+        return
+    hostname = getattr(exchange, "hostname", None)
+
+    def _rewrite(node: Any) -> Any:
+        if isinstance(node, dict):
+            return {k: _rewrite(v) for k, v in node.items()}
+        if isinstance(node, str):
+            url = node.replace("{hostname}", hostname) if hostname and "{hostname}" in node else node
+            parts = urlsplit(url)
+            if parts.netloc.lower() in netlocs:
+                return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+            return node
+        return node
+
+    urls = getattr(exchange, "urls", None)
+    if isinstance(urls, dict) and "api" in urls:
+        urls["api"] = _rewrite(urls["api"])
+
+
+@dataclass
+class EndpointState:
+    candidates: List[str]
+    probe_path: str
+    current: str
+    ranking: List[str] = field(default_factory=list)  # healthy hosts, fastest first
+    latency_ms: Dict[str, Optional[float]] = field(default_factory=dict)  # TTFB p50 per host
+    last_probe: float = 0.0
+    failures: int = 0
+    switches: int = 0
+    probing: bool = False
+
+
+class EndpointSelector:
+    def __init__(
+        self,
+        enabled: bool = True,
+        interval: float = 300.0,
+        samples: int = 3,
+        timeout: float = 3.0,
+        max_failures: int = 2,
+        hysteresis: float = 0.15,
+    ) -> None:
+        self.enabled = enabled
+        self.interval = interval
+        self.samples = samples
+        self.timeout = timeout
+        self.max_failures = max_failures
+        # switch only when the new host is at least this much faster
+        self.hysteresis = hysteresis
+        self.state: Dict[str, EndpointState] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "EndpointSelector":
+        enabled = os.getenv("ARB_ENDPOINT_SELECT", "1").strip().lower() not in ("0", "false", "no", "off")
+        try:
+            interval = float(os.getenv("ARB_ENDPOINT_REPROBE_SEC") or 300.0)
+        except ValueError:
+            interval = 300.0
+        return cls(enabled=enabled, interval=interval)
+
+    def setup(self, name: str, ex_id: str = "", override: str | None = None) -> Optional[EndpointState]:
+        """Register candidates for ``name`` (once); None when there is nothing to choose from."""
+        with self._lock:
+            if name in self.state:
+                return self.state[name]
+            env = [u.strip().rstrip("/") for u in (os.getenv(f"ARB_ENDPOINTS_{name.upper()}") or "").split(",") if u.strip()]
+            if env:
+                candidates = ([override.rstrip("/")] if override else []) + env
+            elif override:
+                # an explicit base URL wins over the built-in mirrors
+                candidates = []
+            else:
+                candidates = list(DEFAULT_CANDIDATES.get(name) or DEFAULT_CANDIDATES.get(ex_id) or [])
+            candidates = list(dict.fromkeys(candidates))
+            if not candidates:
+                return None
+            path = os.getenv(f"ARB_ENDPOINT_PATH_{name.upper()}") or PROBE_PATHS.get(name) or PROBE_PATHS.get(ex_id) or "/"
+            st = EndpointState(candidates=candidates, probe_path=path, current=candidates[0], ranking=list(candidates))
+            self.state[name] = st
+            return st
+
+    def current(self, name: str) -> Optional[str]:
+        st = self.state.get(name)
+        return st.current if st is not None else None
+
+    def prepare(self, name: str, ex_id: str = "", override: str | None = None) -> Optional[str]:
+        """Setup plus a blocking first probe; returns the host to use. Call at exchange creation."""
+        st = self.setup(name, ex_id, override)
+        if st is None:
+            return None
+        if self.enabled and len(st.candidates) > 1 and st.last_probe == 0.0:
+            self.probe(name)
+        return st.current
+
+    def probe(self, name: str) -> Optional[str]:
+        """Probe every candidate of ``name`` (blocking) and switch to the fastest healthy one."""
+        st = self.state.get(name)
+        if st is None:
+            return None
+        reports = probe_endpoints(
+            [(host, host + st.probe_path) for host in st.candidates],
+            samples=self.samples,
+            timeout=self.timeout,
+        )
+        healthy = [(r.ttfb_p50, r.ttfb_p95 or 0.0, host) for host, r in reports.items() if r.ok and r.ttfb_p50 is not None]
+        healthy.sort()
+        with self._lock:
+            st.latency_ms = {host: r.ttfb_p50 if r.ok else None for host, r in reports.items()}
+            st.last_probe = time.monotonic()
+            st.probing = False
+            st.ranking = [host for _, _, host in healthy]
+            if not st.ranking:
+                return st.current
+            best = st.ranking[0]
+            cur = st.latency_ms.get(st.current)
+            best_ms = st.latency_ms.get(best) or 0.0
+            if cur is None or best_ms < cur * (1.0 - self.hysteresis):
+                if best != st.current:
+                    st.switches += 1
+                st.current = best
+                st.failures = 0
+            return st.current
+
+    def _probe_in_background(self, name: str) -> None:
+        st = self.state.get(name)
+        if st is None or st.probing:
+            return
+        st.probing = True
+
+        def _run() -> None:
+            try:
+                self.probe(name)
+            except Exception:
+                st.probing = False
+                st.last_probe = time.monotonic()
+
+        threading.Thread(target=_run, name=f"endpoints-{name}", daemon=True).start()
+
+    def failover(self, name: str) -> Optional[str]:
+        """Move ``name`` to the next host of the last ranking (or the next candidate)."""
+        with self._lock:
+            st = self.state.get(name)
+            if st is None or len(st.candidates) < 2:
+                return None
+            order = [h for h in st.ranking if h != st.current] + [h for h in st.candidates if h != st.current and h not in st.ranking]
+            st.ranking = [h for h in st.ranking if h != st.current]
+            st.current = order[0]
+            st.failures = 0
+            st.switches += 1
+            # re-rank soon: the failed host may be back, or the new one slow
+            st.last_probe = min(st.last_probe, time.monotonic() - self.interval + 30.0)
+            return st.current
+
+    def apply(self, name: str, exchange: Any) -> None:
+        """Point ``exchange`` at the selected host for ``name`` (no-op if already there)."""
+        st = self.state.get(name)
+        if st is None or exchange is None:
+            return
+        if getattr(exchange, "_arb_endpoint", None) == st.current:
+            return
+        rewrite_hosts(exchange, st.candidates, st.current)
+        try:
+            exchange._arb_endpoint = st.current
+        except Exception:
+            pass
+
+    def record(self, name: str, exchange: Any, ok: bool, error: str | None = None) -> None:
+        """Feed one fetch outcome; fails over and re-probes as needed. Never blocks."""
+        st = self.state.get(name)
+        if st is None:
+            return
+        if ok:
+            st.failures = 0
+        elif error != "rate_limit":
+            st.failures += 1
+            if st.failures >= self.max_failures:
+                self.failover(name)
+        if self.enabled and len(st.candidates) > 1 and time.monotonic() - st.last_probe >= self.interval:
+            self._probe_in_background(name)
+        self.apply(name, exchange)
+
+    def summary(self) -> str:
+        parts = []
+        for name, st in self.state.items():
+            if len(st.candidates) < 2:
+                continue
+            ms = st.latency_ms.get(st.current)
+            lat = f" {ms:.0f}мс" if ms is not None else ""
+            parts.append(f"{name} {_netloc(st.current)}{lat}")
+        return ("Хосты: " + "  ".join(parts)) if parts else ""
+
+
+SELECTOR = EndpointSelector.from_env()
@@ -1,10 +1,21 @@
 from typing import Dict, List, Any, Optional, Tuple
 import asyncio
+import os
+import time
 
 import ccxt.async_support as ccxt
 import ccxt as ccxt_sync
-import socket
 import requests
+from urllib.parse import urlsplit
+
+from .metrics import METRICS
+from .probe import EndpointReport, probe_endpoints, probe_once
+from .timing import NULL_TIMER
+from .tracing import span
+from . import htx
+from .breaker import BREAKER
+from .endpoints import PROBE_PATHS, SELECTOR as ENDPOINTS
+from . import transport
 
 
 EXCHANGE_CLASSES: Dict[str, Any] = {
@@ -26,8 +37,129 @@ def _add_optional(name: str) -> None:
 for opt in ["kucoin", "htx", "mexc", "gateio", "bitmart", "coinw"]:
     _add_optional(opt)
 
+# Base URL overrides (e.g. a local stand-in server): ARB_BASE_URL_<NAME>=http://127.0.0.1:8900
+URL_OVERRIDES: Dict[str, str] = {}
+# Extra venues served by a Bybit-shaped stand-in: ARB_FAKE_EXCHANGES=fake1=http://127.0.0.1:8901,fake2=...
+FAKE_EXCHANGES: Dict[str, str] = {}
+
+for _name in list(EXCHANGE_CLASSES.keys()):
+    _url = os.getenv(f"ARB_BASE_URL_{_name.upper()}")
+    if _url:
+        URL_OVERRIDES[_name] = _url.rstrip("/")
+
+
+def register_fake_exchange(name: str, base_url: str) -> None:
+    """Expose a Bybit-shaped stand-in server as an extra exchange called ``name``."""
+    name = name.strip().lower()
+    EXCHANGE_CLASSES[name] = ccxt.bybit
+    EXCHANGE_CLASSES_SYNC[name] = ccxt_sync.bybit
+    FAKE_EXCHANGES[name] = base_url.rstrip("/")
+    URL_OVERRIDES[name] = base_url.rstrip("/")
+    if name not in SUPPORTED_EXCHANGES:
+        SUPPORTED_EXCHANGES.append(name)
+        SUPPORTED_EXCHANGES.sort()
+
+
+def set_exchange_base_url(exchange, base_url: str) -> None:
+    """Point every REST API url of a ccxt exchange at ``base_url`` (in place)."""
+    base_url = base_url.rstrip("/")
+
+    def _rewrite(node):
+        if isinstance(node, dict):
+            return {k: _rewrite(v) for k, v in node.items()}
+        if isinstance(node, str):
+            return base_url
+        return node
+
+    urls = getattr(exchange, "urls", None)
+    if isinstance(urls, dict) and "api" in urls:
+        urls["api"] = _rewrite(urls["api"])
+
+
+# Max symbols per fetch_tickers(symbols) call; long lists are split into concurrent chunks.
+# Conservative defaults, override with ARB_TICKERS_BATCH_<NAME>.
+TICKERS_BATCH_LIMITS: Dict[str, int] = {
+    "bitget": 100,
+    "bingx": 100,
+    "bybit": 100,
+    "kucoin": 100,
+    "htx": 100,
+    "mexc": 100,
+    "gateio": 100,
+    "bitmart": 50,
+    "coinw": 50,
+}
+DEFAULT_TICKERS_BATCH = 50
+TICKERS_BATCH_CONCURRENCY = 4
+
+
+def tickers_batch_size(label: str, ex_id: str = "") -> int:
+    for key in (label, ex_id):
+        if not key:
+            continue
+        env = os.getenv(f"ARB_TICKERS_BATCH_{key.upper()}")
+        if env:
+            try:
+                return max(1, int(env))
+            except ValueError:
+                pass
+    return TICKERS_BATCH_LIMITS.get(label) or TICKERS_BATCH_LIMITS.get(ex_id) or DEFAULT_TICKERS_BATCH
+
+
+def _chunks(symbols: List[str], size: int) -> List[List[str]]:
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+
+async def _fetch_tickers_chunked(exchange: ccxt.Exchange, symbols: List[str], size: int, info: Dict[str, Any]) -> Dict[str, Any]:
+    """fetch_tickers(symbols) in chunks of ``size``, run concurrently (ccxt's throttle still applies)."""
+    chunks = _chunks(symbols, size)
+    info["requests"] = len(chunks)
+    if len(chunks) == 1:
+        return await exchange.fetch_tickers(chunks[0])
+    semaphore = asyncio.Semaphore(TICKERS_BATCH_CONCURRENCY)
+
+    async def _one(chunk: List[str]) -> Dict[str, Any]:
+        async with semaphore:
+            return await exchange.fetch_tickers(chunk)
+
+    merged: Dict[str, Any] = {}
+    for res in await asyncio.gather(*[_one(c) for c in chunks], return_exceptions=True):
+        if isinstance(res, Exception):
+            _note_error(info, res)
+        elif isinstance(res, dict):
+            merged.update(res)
+    return merged
+
+
+def _fetch_tickers_chunked_sync(exchange, symbols: List[str], size: int, info: Dict[str, Any]) -> Dict[str, Any]:
+    # sync ccxt clients are not thread-safe: chunks go one after another
+    chunks = _chunks(symbols, size)
+    info["requests"] = len(chunks)
+    merged: Dict[str, Any] = {}
+    for chunk in chunks:
+        try:
+            res = exchange.fetch_tickers(chunk)
+        except Exception as e:
+            _note_error(info, e)
+            continue
+        if isinstance(res, dict):
+            merged.update(res)
+    return merged
+
+
+def _spot_options(name: str) -> Dict[str, Any]:
+    if name in ("bybit", "bingx") or name in FAKE_EXCHANGES:
+        return {"defaultType": "spot", "loadAllMarkets": False}
+    return {}
+
+
 SUPPORTED_EXCHANGES = sorted(EXCHANGE_CLASSES.keys())
 
+for _item in (os.getenv("ARB_FAKE_EXCHANGES") or "").split(","):
+    if "=" in _item:
+        _fake_name, _fake_url = _item.split("=", 1)
+        register_fake_exchange(_fake_name, _fake_url.strip())
+
 
 class BybitDirectSync:
     def __init__(self, base_url: str = "https://api.bybitglobal.com") -> None:
@@ -36,24 +168,29 @@ class BybitDirectSync:
         self._load_markets()
 
     def _load_markets(self) -> None:
+        self.markets = {m["symbol"]: m for m in self.fetch_markets()}
+
+    def fetch_markets(self) -> List[Dict[str, Any]]:
         url = f"{self.base_url}/v5/market/instruments-info"
         params = {"category": "spot"}
         r = requests.get(url, params=params, timeout=8)
         r.raise_for_status()
         data = r.json()
         instruments = data.get("result", {}).get("list", [])
+        markets: List[Dict[str, Any]] = []
         for inst in instruments:
             quote = inst.get("quoteCoin")
             if quote != "USDT":
                 continue
             base = inst.get("baseCoin")
             symbol_ccxt = f"{base}/USDT"
-            self.markets[symbol_ccxt] = {
+            markets.append({
                 "symbol": symbol_ccxt,
                 "spot": True,
                 "quote": "USDT",
                 "active": True,
-            }
+            })
+        return markets
 
     def fetch_tickers(self, symbols: List[str]) -> Dict[str, Any]:
         url = f"{self.base_url}/v5/market/tickers"
@@ -173,18 +310,16 @@ async def create_exchange(name: str) -> ccxt.Exchange:
         "enableRateLimit": True,
         "timeout": 15000,
         # Prefer spot by default where applicable
-        "options": {"defaultType": "spot", "loadAllMarkets": False} if name in ("bybit", "bingx") else {},
+        "options": _spot_options(name),
+        # shared keep-alive pool + DNS cache (see transport.py)
+        **transport.exchange_options(),
     }
-    # For Bybit, try global endpoint to bypass regional DNS issues
-    if name == "bybit":
-        opts["urls"] = {
-            **getattr(ccxt.bybit, "urls", {}),
-            "api": {
-                "public": "https://api.bybitglobal.com",
-                "private": "https://api.bybitglobal.com",
-            },
-        }
     exchange = klass(opts)
+    if name in URL_OVERRIDES:
+        set_exchange_base_url(exchange, URL_OVERRIDES[name])
+    # fastest mirror host (e.g. bybitglobal.com vs bybit.com), see endpoints.py
+    await asyncio.to_thread(ENDPOINTS.prepare, name, exchange.id, URL_OVERRIDES.get(name))
+    ENDPOINTS.apply(name, exchange)
     await exchange.load_markets()
     return exchange
 
@@ -195,17 +330,14 @@ async def create_exchange_safe(name: str) -> Optional[ccxt.Exchange]:
         opts = {
             "enableRateLimit": True,
             "timeout": 10000,
-            "options": {"defaultType": "spot", "loadAllMarkets": False} if name in ("bybit", "bingx") else {},
+            "options": _spot_options(name),
+            **transport.exchange_options(),
         }
-        if name == "bybit":
-            opts["urls"] = {
-                **getattr(ccxt.bybit, "urls", {}),
-                "api": {
-                    "public": "https://api.bybitglobal.com",
-                    "private": "https://api.bybitglobal.com",
-                },
-            }
         exchange = klass(opts)
+        if name in URL_OVERRIDES:
+            set_exchange_base_url(exchange, URL_OVERRIDES[name])
+        await asyncio.to_thread(ENDPOINTS.prepare, name, exchange.id, URL_OVERRIDES.get(name))
+        ENDPOINTS.apply(name, exchange)
         try:
             await exchange.load_markets()
         except Exception:
@@ -224,17 +356,13 @@ def create_exchange_sync(name: str):
     opts = {
         "enableRateLimit": True,
         "timeout": 15000,
-        "options": {"defaultType": "spot", "loadAllMarkets": False} if name in ("bybit", "bingx") else {},
+        "options": _spot_options(name),
     }
-    if name == "bybit":
-        opts["urls"] = {
-            **getattr(ccxt_sync.bybit, "urls", {}),
-            "api": {
-                "public": "https://api.bybitglobal.com",
-                "private": "https://api.bybitglobal.com",
-            },
-        }
     ex = klass(opts)
+    if name in URL_OVERRIDES:
+        set_exchange_base_url(ex, URL_OVERRIDES[name])
+    ENDPOINTS.prepare(name, ex.id, URL_OVERRIDES.get(name))
+    ENDPOINTS.apply(name, ex)
     ex.load_markets()
     return ex
 
@@ -245,8 +373,11 @@ def create_exchange_sync_safe(name: str):
         return ex
     except Exception:
         # Fallback for Bybit: direct REST client
-        if name == "bybit":
+        if name == "bybit" or name in FAKE_EXCHANGES:
             try:
+                base_url = ENDPOINTS.current(name) or URL_OVERRIDES.get(name)
+                if base_url:
+                    return BybitDirectSync(base_url=base_url)
                 return BybitDirectSync()
             except Exception:
                 pass
@@ -267,9 +398,9 @@ async def close_exchange(exchange: ccxt.Exchange) -> None:
         pass
 
 
-def get_usdt_spot_symbols(exchange: ccxt.Exchange) -> List[str]:
+def _usdt_spot_symbols(markets) -> List[str]:
     symbols: List[str] = []
-    for market in exchange.markets.values():
+    for market in markets:
         if not market.get("active", True):
             continue
         if market.get("spot") is not True:
@@ -283,44 +414,123 @@ def get_usdt_spot_symbols(exchange: ccxt.Exchange) -> List[str]:
     return symbols
 
 
+def get_usdt_spot_symbols(exchange: ccxt.Exchange) -> List[str]:
+    return _usdt_spot_symbols(exchange.markets.values())
+
+
 def get_usdt_spot_symbols_sync(exchange) -> List[str]:
     # Supports both ccxt sync Exchange and BybitDirectSync
     markets = getattr(exchange, "markets", {}) or {}
-    symbols: List[str] = []
-    for m in markets.values():
-        if not m.get("active", True):
-            continue
-        if m.get("spot") is not True:
-            continue
-        if m.get("quote") != "USDT":
-            continue
-        symbol = m.get("symbol")
-        if symbol:
-            symbols.append(symbol)
-    symbols.sort()
-    return symbols
+    return _usdt_spot_symbols(markets.values())
+
+
+# Market-list refresh: fetch_markets() alone is one or a few requests, unlike
+# load_markets(reload=True), which also re-downloads currencies on many exchanges.
+# The exchange's markets are only replaced when the USDT spot set changed.
+
+async def refresh_markets(exchange: ccxt.Exchange) -> Tuple[List[str], bool]:
+    """(current USDT spot symbols, whether they changed); markets are updated in place."""
+    fetched = await exchange.fetch_markets()
+    symbols = _usdt_spot_symbols(fetched)
+    if symbols == get_usdt_spot_symbols(exchange):
+        return symbols, False
+    # keeps the loaded currencies (withdraw networks), rebuilds the market indexes
+    exchange.set_markets(fetched)
+    return symbols, True
+
+
+def apply_markets_sync(exchange, fetched: List[Dict[str, Any]]) -> Tuple[List[str], bool]:
+    """Second half of ``refresh_markets_sync``; ``exchange.fetch_markets()`` itself
+    does not touch the exchange's state, so it may run on another thread."""
+    symbols = _usdt_spot_symbols(fetched)
+    if symbols == get_usdt_spot_symbols_sync(exchange):
+        return symbols, False
+    if isinstance(exchange, BybitDirectSync):
+        exchange.markets = {m["symbol"]: m for m in fetched}
+    else:
+        exchange.set_markets(fetched)
+    return symbols, True
+
+
+def refresh_markets_sync(exchange) -> Tuple[List[str], bool]:
+    return apply_markets_sync(exchange, exchange.fetch_markets())
+
+
+# Outcome of the last fetch per exchange label: strategy used and error kind, for the cadence controller
+LAST_FETCH: Dict[str, Dict[str, Any]] = {}
+
+
+def _error_kind(e: BaseException) -> str:
+    if isinstance(e, (ccxt_sync.RateLimitExceeded, ccxt_sync.DDoSProtection)):
+        return "rate_limit"
+    if isinstance(e, requests.HTTPError) and getattr(e.response, "status_code", None) == 429:
+        return "rate_limit"
+    if isinstance(e, (ccxt_sync.RequestTimeout, asyncio.TimeoutError, requests.Timeout)):
+        return "timeout"
+    return "error"
 
 
-async def fetch_tickers(exchange: ccxt.Exchange, symbols: List[str]) -> Dict[str, Any]:
-    # Prefer bulk where safe. Avoid mega-responses for HTX (Huobi): use per-symbol there.
+def _note_error(info: Dict[str, Any], e: BaseException) -> None:
+    kind = _error_kind(e)
+    # a rate limit anywhere in the fallback chain is the signal that matters
+    if info.get("error") != "rate_limit":
+        info["error"] = kind
+
+
+def fetch_status(name: str, symbols: int) -> Tuple[Optional[str], int, float]:
+    """(error kind or None, requests spent, latency in seconds) of the last fetch for ``name``."""
+    info = LAST_FETCH.get(name) or {}
+    if info.get("strategy") == "per_symbol":
+        requests_spent = symbols
+    else:
+        requests_spent = int(info.get("requests") or 1)
+    return info.get("error"), requests_spent, float(info.get("latency") or 0.0)
+
+
+async def fetch_tickers(exchange: ccxt.Exchange, symbols: List[str], timer=NULL_TIMER, name: str | None = None) -> Dict[str, Any]:
+    # Prefer bulk where safe. HTX (Huobi) all-tickers is huge: stream-decode only the requested USDT pairs.
     ex_id = getattr(exchange, "id", "") or getattr(getattr(exchange, "__class__", object), "id", "")
+    label = name or ex_id
+    info: Dict[str, Any] = {"strategy": "all", "error": None}
+    LAST_FETCH[label] = info
+    bulk_tried = False
+    if ex_id in ("htx", "huobi"):
+        try:
+            with span("fetch_tickers stream", "fetch", exchange=label):
+                tickers = await htx.fetch_tickers_stream(exchange, symbols)
+            if tickers:
+                return tickers
+        except Exception as e:
+            _note_error(info, e)
+        METRICS.fetch_fallbacks.inc(exchange=label, strategy="per_symbol")
     try:
         if ex_id not in ("htx", "huobi") and hasattr(exchange, "has") and getattr(exchange, "has", {}).get("fetchTickers"):
             try:
-                tickers = await exchange.fetch_tickers()
+                with span("fetch_tickers all", "fetch", exchange=label):
+                    tickers = await exchange.fetch_tickers()
                 if isinstance(tickers, dict) and tickers:
-                    return _normalize_tickers(ex_id, tickers)
-            except Exception:
-                pass
+                    with timer.stage("normalize"), span("normalize", exchange=label):
+                        return _normalize_tickers(ex_id, tickers)
+            except Exception as e:
+                _note_error(info, e)
+            bulk_tried = True
+            METRICS.fetch_fallbacks.inc(exchange=label, strategy="symbols")
+            info["strategy"] = "symbols"
             try:
-                tickers = await exchange.fetch_tickers(symbols)
+                batch = tickers_batch_size(label, ex_id)
+                with span("fetch_tickers symbols", "fetch", exchange=label, symbols=len(symbols), batch=batch):
+                    tickers = await _fetch_tickers_chunked(exchange, symbols, batch, info)
                 if isinstance(tickers, dict) and tickers:
-                    return _normalize_tickers(ex_id, tickers)
-            except Exception:
-                pass
+                    with timer.stage("normalize"), span("normalize", exchange=label):
+                        return _normalize_tickers(ex_id, tickers)
+            except Exception as e:
+                _note_error(info, e)
     except Exception:
         pass
 
+    if bulk_tried:
+        METRICS.fetch_fallbacks.inc(exchange=label, strategy="per_symbol")
+    info["strategy"] = "per_symbol"
     # Fallback to per-symbol
     results: Dict[str, Any] = {}
     semaphore = asyncio.Semaphore(10)
@@ -330,81 +540,203 @@ async def fetch_tickers(exchange: ccxt.Exchange, symbols: List[str]) -> Dict[str
             async with semaphore:
                 t = await exchange.fetch_ticker(sym)
             results[sym] = t
-        except Exception:
-            pass
+        except Exception as e:
+            _note_error(info, e)
 
-    await asyncio.gather(*[_fetch(s) for s in symbols])
-    return _normalize_tickers(ex_id, results)
+    with span("fetch_ticker per_symbol", "fetch", exchange=label, symbols=len(symbols)):
+        await asyncio.gather(*[_fetch(s) for s in symbols])
+    with timer.stage("normalize"), span("normalize", exchange=label):
+        return _normalize_tickers(ex_id, results)
 
 
-def fetch_tickers_sync(exchange, symbols: List[str]) -> Dict[str, Any]:
-    # Prefer bulk without params first unless it's HTX (their all-tickers response is huge and slow)
+def fetch_tickers_sync(exchange, symbols: List[str], timer=NULL_TIMER, name: str | None = None) -> Dict[str, Any]:
+    # Prefer bulk without params first; HTX goes through the streaming decoder (all-tickers response is huge)
     # Support BybitDirectSync fallback client explicitly
+    info: Dict[str, Any] = {"strategy": "all", "error": None}
     if isinstance(exchange, BybitDirectSync):
+        LAST_FETCH[name or "bybit"] = info
         try:
             return exchange.fetch_tickers(symbols)
-        except Exception:
+        except Exception as e:
+            _note_error(info, e)
             return {}
     ex_id = getattr(exchange, "id", "")
+    label = name or ex_id
+    LAST_FETCH[label] = info
+    bulk_tried = False
+    if ex_id in ("htx", "huobi"):
+        try:
+            with span("fetch_tickers stream", "fetch", exchange=label):
+                tickers = htx.fetch_tickers_stream_sync(exchange, symbols)
+            if tickers:
+                return tickers
+        except Exception as e:
+            _note_error(info, e)
+        METRICS.fetch_fallbacks.inc(exchange=label, strategy="per_symbol")
     try:
         if ex_id not in ("htx", "huobi") and hasattr(exchange, "has") and getattr(exchange, "has", {}).get("fetchTickers"):
             try:
-                tickers = exchange.fetch_tickers()
+                with span("fetch_tickers all", "fetch", exchange=label):
+                    tickers = exchange.fetch_tickers()
                 if isinstance(tickers, dict) and tickers:
-                    return _normalize_tickers(ex_id, tickers)
-            except Exception:
-                pass
+                    with timer.stage("normalize"), span("normalize", exchange=label):
+                        return _normalize_tickers(ex_id, tickers)
+            except Exception as e:
+                _note_error(info, e)
+            bulk_tried = True
+            METRICS.fetch_fallbacks.inc(exchange=label, strategy="symbols")
+            info["strategy"] = "symbols"
             try:
-                tickers = exchange.fetch_tickers(symbols)
+                batch = tickers_batch_size(label, ex_id)
+                with span("fetch_tickers symbols", "fetch", exchange=label, symbols=len(symbols), batch=batch):
+                    tickers = _fetch_tickers_chunked_sync(exchange, symbols, batch, info)
                 if isinstance(tickers, dict) and tickers:
-                    return _normalize_tickers(ex_id, tickers)
-            except Exception:
-                pass
+                    with timer.stage("normalize"), span("normalize", exchange=label):
+                        return _normalize_tickers(ex_id, tickers)
+            except Exception as e:
+                _note_error(info, e)
     except Exception:
         pass
+    if bulk_tried:
+        METRICS.fetch_fallbacks.inc(exchange=label, strategy="per_symbol")
+    info["strategy"] = "per_symbol"
     results: Dict[str, Any] = {}
-    for sym in symbols:
-        try:
-            t = exchange.fetch_ticker(sym)
-            results[sym] = t
-        except Exception:
-            pass
-    return _normalize_tickers(ex_id, results)
+    with span("fetch_ticker per_symbol", "fetch", exchange=label, symbols=len(symbols)):
+        for sym in symbols:
+            try:
+                t = exchange.fetch_ticker(sym)
+                results[sym] = t
+            except Exception as e:
+                _note_error(info, e)
+    with timer.stage("normalize"), span("normalize", exchange=label):
+        return _normalize_tickers(ex_id, results)
+
+
+def _api_base(exchange) -> Optional[str]:
+    """scheme://host of the exchange's public REST API."""
+    base = getattr(exchange, "base_url", None)
+    node = (getattr(exchange, "urls", None) or {}).get("api")
+    while isinstance(node, dict) and node:
+        node = node.get("public") or node.get("spot") or next(iter(node.values()))
+    if isinstance(node, str):
+        base = node.replace("{hostname}", getattr(exchange, "hostname", None) or "")
+    if not base:
+        return None
+    parts = urlsplit(base)
+    return f"{parts.scheme}://{parts.netloc}" if parts.netloc else None
 
 
-def diagnose_connectivity() -> Dict[str, Dict[str, str]]:
-    """Return connectivity diagnostics for exchanges: DNS and HTTPS checks."""
-    checks: Dict[str, Dict[str, str]] = {}
+def health_check(name: str, exchange, timeout: float = 5.0) -> bool:
+    """Cheap recovery probe for a half-open breaker: one small public request, no ccxt."""
+    ex_id = getattr(exchange, "id", "") or ("bybit" if isinstance(exchange, BybitDirectSync) else "")
+    base = ENDPOINTS.current(name) or _api_base(exchange)
+    path = PROBE_PATHS.get(name) or PROBE_PATHS.get(ex_id)
+    if not base or not path:
+        # nothing cheap to call: let the regular fetch be the trial
+        return True
+    sample = probe_once(base + path, timeout=timeout)
+    return sample.error is None and sample.status is not None and sample.status < 500
 
-    def check_host(label: str, host: str, url: str) -> Dict[str, str]:
-        res: Dict[str, str] = {}
-        # DNS
-        try:
-            socket.gethostbyname(host)
-            res["dns"] = "ok"
-        except Exception as e:
-            res["dns"] = f"fail: {e}"
-        # HTTPS GET
-        try:
-            r = requests.get(url, timeout=5)
-            res["https"] = f"{r.status_code}"
-        except Exception as e:
-            res["https"] = f"fail: {e}"
-        return res
-
-    checks["bitget"] = check_host("bitget", "api.bitget.com", "https://api.bitget.com/api/spot/v1/public/time")
-    checks["bingx"] = check_host("bingx", "open-api.bingx.com", "https://open-api.bingx.com/openApi/swap/v2/quote/price?symbol=BTC-USDT")
-    # Bybit endpoints
-    checks["bybit.com"] = check_host("bybit.com", "api.bybit.com", "https://api.bybit.com/v5/market/time")
-    checks["bybitglobal.com"] = check_host("bybitglobal.com", "api.bybitglobal.com", "https://api.bybitglobal.com/v5/market/time")
-    # Kucoin
-    checks["kucoin"] = check_host("kucoin", "api.kucoin.com", "https://api.kucoin.com/api/v1/status")
-    # Gate.io
-    checks["gateio"] = check_host("gateio", "api.gateio.ws", "https://api.gateio.ws/api/v4/spot/currencies")
-    # MEXC
-    checks["mexc"] = check_host("mexc", "api.mexc.com", "https://api.mexc.com/api/v3/ping")
-    # BitMart
-    checks["bitmart"] = check_host("bitmart", "api-cloud.bitmart.com", "https://api-cloud.bitmart.com/system/service")
-    # HTX (Huobi)
-    checks["htx"] = check_host("htx", "api.huobi.pro", "https://api.huobi.pro/market/tickers")
-    return checks
+
+def _skip_open(name: str) -> Dict[str, Any]:
+    LAST_FETCH[name] = {"strategy": "skipped", "error": "open", "latency": 0.0}
+    METRICS.breaker_state.set(BREAKER.state_value(name), exchange=name)
+    return {}
+
+
+def _record_health(name: str, exchange, ok: bool, latency: float, error: str | None) -> None:
+    BREAKER.record(name, ok, latency, error)
+    METRICS.breaker_state.set(BREAKER.state_value(name), exchange=name)
+    METRICS.exchange_health.set(round(BREAKER.health(name), 4), exchange=name)
+    ENDPOINTS.record(name, exchange, ok, error)
+
+
+async def fetch_tickers_timed(name: str, exchange: ccxt.Exchange, symbols: List[str], timer=NULL_TIMER) -> Dict[str, Any]:
+    """``fetch_tickers`` plus per-exchange latency for the stage timer and metrics.
+
+    Exchanges with an open circuit breaker are skipped without any request.
+    """
+    gate = BREAKER.allow(name)
+    if gate is None:
+        return _skip_open(name)
+    if gate == "probe":
+        ok = await asyncio.to_thread(health_check, name, exchange)
+        BREAKER.record_probe(name, ok)
+        if not ok:
+            return _skip_open(name)
+    t0 = time.perf_counter()
+    result: Dict[str, Any] = {}
+    try:
+        with span(f"fetch {name}", "fetch", symbols=len(symbols)):
+            result = await fetch_tickers(exchange, symbols, timer=timer, name=name)
+        return result
+    finally:
+        dt = time.perf_counter() - t0
+        timer.add(f"fetch:{name}", dt)
+        METRICS.record_fetch(name, dt, len(result), error=not result)
+        info = LAST_FETCH.setdefault(name, {})
+        info["latency"] = dt
+        _record_health(name, exchange, bool(result), dt, info.get("error"))
+
+
+def fetch_tickers_sync_timed(name: str, exchange, symbols: List[str], timer=NULL_TIMER) -> Dict[str, Any]:
+    gate = BREAKER.allow(name)
+    if gate is None:
+        return _skip_open(name)
+    if gate == "probe":
+        ok = health_check(name, exchange)
+        BREAKER.record_probe(name, ok)
+        if not ok:
+            return _skip_open(name)
+    t0 = time.perf_counter()
+    result: Dict[str, Any] = {}
+    try:
+        with span(f"fetch {name}", "fetch", symbols=len(symbols)):
+            result = fetch_tickers_sync(exchange, symbols, timer=timer, name=name)
+        return result
+    finally:
+        dt = time.perf_counter() - t0
+        timer.add(f"fetch:{name}", dt)
+        METRICS.record_fetch(name, dt, len(result), error=not result)
+        info = LAST_FETCH.setdefault(name, {})
+        info["latency"] = dt
+        _record_health(name, exchange, bool(result), dt, info.get("error"))
+
+
+# Hosts checked by the connectivity diagnostics (label, URL of a cheap public endpoint)
+DIAG_ENDPOINTS: List[Tuple[str, str]] = [
+    ("bitget", "https://api.bitget.com/api/spot/v1/public/time"),
+    ("bingx", "https://open-api.bingx.com/openApi/swap/v2/quote/price?symbol=BTC-USDT"),
+    # Bybit: both domains, to pick the faster one
+    ("bybit.com", "https://api.bybit.com/v5/market/time"),
+    ("bybitglobal.com", "https://api.bybitglobal.com/v5/market/time"),
+    ("kucoin", "https://api.kucoin.com/api/v1/status"),
+    ("gateio", "https://api.gateio.ws/api/v4/spot/currencies"),
+    ("mexc", "https://api.mexc.com/api/v3/ping"),
+    ("bitmart", "https://api-cloud.bitmart.com/system/service"),
+    ("htx", "https://api.huobi.pro/market/tickers"),
+]
+
+
+def diagnostic_endpoints() -> List[Tuple[str, str]]:
+    """DIAG_ENDPOINTS with URL overrides applied, plus the registered fake venues."""
+    out: List[Tuple[str, str]] = []
+    for label, url in DIAG_ENDPOINTS:
+        override = URL_OVERRIDES.get(label.split(".")[0])
+        if override:
+            # Keep the path, swap scheme and host for the stand-in server
+            parts = urlsplit(url)
+            url = override + parts.path + (f"?{parts.query}" if parts.query else "")
+        out.append((label, url))
+    for name, base_url in FAKE_EXCHANGES.items():
+        out.append((name, f"{base_url}/v5/market/time"))
+    return out
+
+
+def diagnose_connectivity(samples: int = 5, timeout: float = 5.0) -> Dict[str, EndpointReport]:
+    """Probe all diagnostic endpoints concurrently.
+
+    Each host is sampled ``samples`` times over fresh connections; the report
+    has median DNS/TCP/TLS setup times and p50/p95 time to first byte.
+    """
+    return probe_endpoints(diagnostic_endpoints(), samples=samples, timeout=timeout)
@@ -0,0 +1,400 @@
+"""Local stand-in exchange server for reproducible load tests.
+
+Serves Bybit v5-shaped public REST endpoints (the shape used by both the ccxt
+``bybit`` class and ``BybitDirectSync``) with configurable latency, error
+rate, payload size and 429 rate limiting. ``/market/tickers`` answers in the
+HTX shape (gzip when asked) for the streaming HTX decoder. Start one server per fake venue and
+register them with ``ARB_FAKE_EXCHANGES`` (or ``ARB_BASE_URL_BYBIT`` to
+replace Bybit itself)::
+
+    python -m arbitrage.fakeserver --venues 3 --symbols 600 --latency-ms 40
+    set ARB_FAKE_EXCHANGES=fake1=http://127.0.0.1:8901,fake2=...
+    python -m arbitrage.cli --exchanges fake1,fake2,fake3
+
+``--loadtest N`` runs N fetch cycles against the started venues in-process
+and prints throughput instead of serving forever.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+@dataclass
+class FakeExchangeConfig:
+    symbols: int = 500
+    latency_ms: float = 20.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    # requests per second before answering 429; 0 disables the limiter
+    rate_limit_rps: float = 0.0
+    retry_after_s: float = 1.0
+    # filler bytes added to every ticker/instrument entry to inflate payloads
+    pad_bytes: int = 0
+    # deterministic prices shared by venues with the same seed
+    seed: int = 1
+    # per-venue price deviation so venues disagree a little
+    venue_seed: int = 0
+    deviation: float = 0.002
+    # relative random-walk step applied per second
+    volatility: float = 0.0005
+
+
+def _base_name(i: int) -> str:
+    letters = ""
+    n = i
+    for _ in range(3):
+        n, r = divmod(n, 26)
+        letters = chr(65 + r) + letters
+    return "X" + letters + (str(n) if n else "")
+
+
+class _Market:
+    """Price state for one venue; mids drift with time, quotes carry venue noise."""
+
+    def __init__(self, cfg: FakeExchangeConfig) -> None:
+        rng = random.Random(cfg.seed)
+        self.cfg = cfg
+        self.bases = [_base_name(i) for i in range(cfg.symbols)]
+        self.mids = {b: rng.lognormvariate(0, 3) for b in self.bases}
+        self.volumes = {b: rng.lognormvariate(13, 2) for b in self.bases}
+        vrng = random.Random(cfg.seed * 1000 + cfg.venue_seed)
+        self.offsets = {b: 1.0 + vrng.uniform(-cfg.deviation, cfg.deviation) for b in self.bases}
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.rng = random.Random(cfg.seed * 7919 + cfg.venue_seed)
+
+    def quote(self, base: str) -> Tuple[float, float, float]:
+        t = time.time() - self.started
+        # cheap deterministic wander so quotes change between cycles
+        phase = (zlib.crc32(base.encode()) % 1000) / 1000.0
+        drift = 1.0 + self.cfg.volatility * math.sqrt(max(t, 0.0)) * math.sin(t / 7.0 + phase * 6.28)
+        with self.lock:
+            noise = 1.0 + self.rng.uniform(-self.cfg.deviation, self.cfg.deviation) / 4
+        mid = self.mids[base] * self.offsets[base] * drift * noise
+        half = mid * 0.0005
+        return mid - half, mid + half, mid
+
+
+class _TokenBucket:
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+class FakeExchangeServer:
+    """Threaded HTTP server answering Bybit v5 public endpoints."""
+
+    def __init__(self, config: FakeExchangeConfig | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or FakeExchangeConfig()
+        self.market = _Market(self.config)
+        self.bucket = _TokenBucket(self.config.rate_limit_rps)
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "rate_limited": 0}
+        self._stats_lock = threading.Lock()
+        self._rng = random.Random(self.config.seed + 17)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                server._handle(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeExchangeServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-exchange", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _send(self, h: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        if "gzip" in (h.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body, compresslevel=5)
+            headers = {**(headers or {}), "Content-Encoding": "gzip"}
+        h.send_response(status)
+        h.send_header("Content-Type", "application/json")
+        h.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            h.send_header(k, v)
+        h.end_headers()
+        h.wfile.write(body)
+
+    def _wrap(self, result: Any) -> Dict[str, Any]:
+        return {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": {}, "time": int(time.time() * 1000)}
+
+    def _handle(self, h: BaseHTTPRequestHandler) -> None:
+        cfg = self.config
+        self._count("requests")
+        delay = cfg.latency_ms + (self._rng.uniform(0, cfg.jitter_ms) if cfg.jitter_ms > 0 else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if not self.bucket.take():
+            self._count("rate_limited")
+            self._send(h, 429, {"retCode": 10006, "retMsg": "Too many visits!", "result": {}, "time": int(time.time() * 1000)},
+                       {"Retry-After": f"{cfg.retry_after_s:g}"})
+            return
+        if cfg.error_rate > 0 and self._rng.random() < cfg.error_rate:
+            self._count("errors")
+            self._send(h, 502, {"retCode": 10016, "retMsg": "Internal error", "result": {}})
+            return
+        parts = urlsplit(h.path)
+        q = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        route = {
+            "/v5/market/time": self._time,
+            "/v5/market/instruments-info": self._instruments,
+            "/v5/market/tickers": self._tickers,
+            "/v5/market/orderbook": self._orderbook,
+            "/v5/asset/coin/query-info": self._coins,
+        }.get(parts.path)
+        if parts.path == "/market/tickers":
+            self._send(h, 200, self._htx_tickers())
+            return
+        if route is None:
+            self._send(h, 404, {"retCode": 10001, "retMsg": f"unknown path {parts.path}", "result": {}})
+            return
+        self._send(h, 200, self._wrap(route(q)))
+
+    def _pad(self) -> Dict[str, str]:
+        return {"pad": "x" * self.config.pad_bytes} if self.config.pad_bytes > 0 else {}
+
+    def _time(self, q: Dict[str, str]) -> Dict[str, Any]:
+        now = time.time()
+        return {"timeSecond": str(int(now)), "timeNano": str(int(now * 1e9))}
+
+    def _instruments(self, q: Dict[str, str]) -> Dict[str, Any]:
+        category = q.get("category", "spot")
+        items: List[Dict[str, Any]] = []
+        if category == "spot":
+            for base in self.market.bases:
+                items.append({
+                    "symbol": f"{base}USDT",
+                    "baseCoin": base,
+                    "quoteCoin": "USDT",
+                    "innovation": "0",
+                    "status": "Trading",
+                    "marginTrading": "none",
+                    "lotSizeFilter": {
+                        "basePrecision": "0.0001",
+                        "quotePrecision": "0.00000001",
+                        "minOrderQty": "0.0001",
+                        "maxOrderQty": "1000000",
+                        "minOrderAmt": "1",
+                        "maxOrderAmt": "2000000",
+                    },
+                    "priceFilter": {"tickSize": "0.00000001"},
+                    **self._pad(),
+                })
+        return {"category": category, "list": items, "nextPageCursor": ""}
+
+    def _ticker(self, base: str) -> Dict[str, Any]:
+        bid, ask, mid = self.market.quote(base)
+        vol = self.market.volumes[base]
+        return {
+            "symbol": f"{base}USDT",
+            "bid1Price": f"{bid:.10g}",
+            "bid1Size": "100",
+            "ask1Price": f"{ask:.10g}",
+            "ask1Size": "100",
+            "lastPrice": f"{mid:.10g}",
+            "prevPrice24h": f"{mid:.10g}",
+            "price24hPcnt": "0.01",
+            "highPrice24h": f"{mid * 1.05:.10g}",
+            "lowPrice24h": f"{mid * 0.95:.10g}",
+            "turnover24h": f"{vol * mid:.6f}",
+            "volume24h": f"{vol:.6f}",
+            "usdIndexPrice": f"{mid:.10g}",
+            **self._pad(),
+        }
+
+    def _tickers(self, q: Dict[str, str]) -> Dict[str, Any]:
+        category = q.get("category", "spot")
+        if category != "spot":
+            return {"category": category, "list": []}
+        sym = q.get("symbol")
+        if sym:
+            base = sym[:-4] if sym.endswith("USDT") else sym
+            items = [self._ticker(base)] if base in self.market.mids else []
+        else:
+            items = [self._ticker(b) for b in self.market.bases]
+        return {"category": category, "list": items}
+
+    def _htx_tickers(self) -> Dict[str, Any]:
+        data: List[Dict[str, Any]] = []
+        for i, base in enumerate(self.market.bases):
+            bid, ask, mid = self.market.quote(base)
+            vol = self.market.volumes[base]
+            quotes = ("usdt", "btc", "eth") if i % 3 == 0 else ("usdt",)
+            for quote in quotes:
+                scale = 1.0 if quote == "usdt" else 1e-5
+                data.append({
+                    "symbol": f"{base.lower()}{quote}",
+                    "open": mid * scale, "high": mid * 1.05 * scale, "low": mid * 0.95 * scale, "close": mid * scale,
+                    "amount": vol, "vol": vol * mid * scale, "count": 1000,
+                    "bid": bid * scale, "bidSize": 100.0, "ask": ask * scale, "askSize": 100.0,
+                })
+        return {"status": "ok", "ts": int(time.time() * 1000), "data": data}
+
+    def _orderbook(self, q: Dict[str, str]) -> Dict[str, Any]:
+        sym = q.get("symbol", "")
+        base = sym[:-4] if sym.endswith("USDT") else sym
+        limit = int(q.get("limit", "25") or 25)
+        if base not in self.market.mids:
+            return {"s": sym, "b": [], "a": [], "ts": int(time.time() * 1000), "u": 0}
+        bid, ask, _ = self.market.quote(base)
+        step = (ask - bid) or bid * 0.0001
+        bids = [[f"{bid - i * step:.10g}", f"{10 + i:.4f}"] for i in range(limit)]
+        asks = [[f"{ask + i * step:.10g}", f"{10 + i:.4f}"] for i in range(limit)]
+        return {"s": sym, "b": bids, "a": asks, "ts": int(time.time() * 1000), "u": 1, "seq": 1}
+
+    def _coins(self, q: Dict[str, str]) -> Dict[str, Any]:
+        coin = (q.get("coin") or "").upper()
+        chains = [
+            {"chainType": "TRC20", "chain": "TRX", "withdrawFee": "1", "withdrawEnable": "1", "depositEnable": "1",
+             "chainDeposit": "1", "chainWithdraw": "1", "confirmation": "20", "minAccuracy": "6"},
+            {"chainType": "ERC20", "chain": "ETH", "withdrawFee": "5", "withdrawEnable": "1", "depositEnable": "1",
+             "chainDeposit": "1", "chainWithdraw": "1", "confirmation": "12", "minAccuracy": "6"},
+        ]
+        return {"rows": [{"name": coin, "coin": coin, "remainAmount": "1000000", "chains": chains}]}
+
+
+def start_venues(n: int, config: FakeExchangeConfig, base_port: int = 0, host: str = "127.0.0.1") -> List[FakeExchangeServer]:
+    """Start ``n`` servers sharing prices (same seed) but with per-venue noise."""
+    servers: List[FakeExchangeServer] = []
+    for i in range(n):
+        cfg = FakeExchangeConfig(**{**config.__dict__, "venue_seed": i + 1})
+        port = base_port + i if base_port else 0
+        servers.append(FakeExchangeServer(cfg, host=host, port=port).start())
+    return servers
+
+
+async def _loadtest_async(names: List[str], cycles: int) -> Dict[str, Any]:
+    from . import transport
+    from .exchanges import close_exchange, create_exchange, fetch_tickers, get_usdt_spot_symbols
+    from .scanner import compute_opportunities
+
+    exchanges = {name: await create_exchange(name) for name in names}
+    try:
+        symbols = sorted(set().union(*[set(get_usdt_spot_symbols(ex)) for ex in exchanges.values()]))
+        durations: List[float] = []
+        fetched = 0
+        for _ in range(cycles):
+            t0 = time.perf_counter()
+            results = await asyncio.gather(*[fetch_tickers(ex, symbols) for ex in exchanges.values()], return_exceptions=True)
+            tickers_by_exchange = {n: ({} if isinstance(r, Exception) else r) for n, r in zip(exchanges, results)}
+            compute_opportunities(symbols, tickers_by_exchange, 0.0, min_quote_volume_usd=0.0)
+            durations.append(time.perf_counter() - t0)
+            fetched += sum(len(t) for t in tickers_by_exchange.values())
+        total = sum(durations)
+        return {
+            "symbols": len(symbols),
+            "cycles": cycles,
+            "symbols_per_s": fetched / total if total > 0 else 0.0,
+            "cycle_p50_ms": sorted(durations)[len(durations) // 2] * 1e3,
+            "cycle_max_ms": max(durations) * 1e3,
+        }
+    finally:
+        await asyncio.gather(*[close_exchange(ex) for ex in exchanges.values()])
+        await transport.close_shared_session()
+
+
+def run_loadtest(servers: List[FakeExchangeServer], cycles: int) -> Dict[str, Any]:
+    from .exchanges import register_fake_exchange
+
+    names = []
+    for i, srv in enumerate(servers):
+        name = f"fake{i + 1}"
+        register_fake_exchange(name, srv.url)
+        names.append(name)
+    return asyncio.run(_loadtest_async(names, cycles))
+
+
+def main(argv: List[str] | None = None) -> None:
+    p = argparse.ArgumentParser(description="Локальный тестовый сервер биржи (формат Bybit v5)")
+    p.add_argument("--venues", type=int, default=2, help="Сколько независимых площадок поднять")
+    p.add_argument("--host", type=str, default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8901, help="Порт первой площадки (остальные по порядку)")
+    p.add_argument("--symbols", type=int, default=500, help="Число USDT-пар")
+    p.add_argument("--latency-ms", type=float, default=20.0)
+    p.add_argument("--jitter-ms", type=float, default=10.0)
+    p.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 502")
+    p.add_argument("--rate-limit", type=float, default=0.0, help="Запросов/сек до ответа 429 (0 — без лимита)")
+    p.add_argument("--retry-after", type=float, default=1.0, help="Retry-After для 429 (сек)")
+    p.add_argument("--pad-bytes", type=int, default=0, help="Доп. байт в каждой записи ответа")
+    p.add_argument("--loadtest", type=int, default=0, help="Прогнать N циклов fetch_tickers и выйти")
+    args = p.parse_args(argv)
+
+    cfg = FakeExchangeConfig(
+        symbols=args.symbols,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rps=args.rate_limit,
+        retry_after_s=args.retry_after,
+        pad_bytes=args.pad_bytes,
+    )
+    servers = start_venues(args.venues, cfg, base_port=args.port, host=args.host)
+    try:
+        if args.loadtest > 0:
+            res = run_loadtest(servers, args.loadtest)
+            print(json.dumps(res, indent=2))
+            for i, srv in enumerate(servers):
+                print(f"fake{i + 1}: {srv.stats}")
+            return
+        env = ",".join(f"fake{i + 1}={srv.url}" for i, srv in enumerate(servers))
+        print(f"ARB_FAKE_EXCHANGES={env}")
+        print("Ctrl+C для остановки")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for srv in servers:
+            srv.stop()
+
+
+if __name__ == "__main__":
+    main()
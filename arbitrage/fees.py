@@ -1,10 +1,29 @@
+"""Taker fees per exchange and per symbol.
+
+The fee for one (exchange, symbol) comes from, in order:
+
+1. ``FEE_TAKER_<EXCHANGE>`` in the environment (or .env), for any exchange;
+2. the symbol's ``taker`` fee in the exchange's market metadata (ccxt fills
+   it from the market listing where the exchange publishes per-symbol fees,
+   otherwise from the exchange's public fee schedule);
+3. ``DEFAULT_FEES``, the public base-tier schedule, then 0.1%.
+
+``FeeMatrix`` resolves this once per symbol universe into one dense row of
+floats per exchange, so the scanner pays an array index per quote instead of
+a lookup chain per symbol and cycle.
+"""
+from __future__ import annotations
+
+from array import array
 from dataclasses import dataclass
-from typing import Dict
+from typing import Any, Dict, Iterable
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+FALLBACK_TAKER = 0.001
+
 
 @dataclass(frozen=True)
 class ExchangeFees:
@@ -22,25 +41,96 @@ def _env_float(var_name: str, default: float) -> float:
         return default
 
 
+def _fees(name: str, taker: float, maker: float) -> ExchangeFees:
+    return ExchangeFees(
+        taker=_env_float(f"FEE_TAKER_{name.upper()}", taker),
+        maker=_env_float(f"FEE_MAKER_{name.upper()}", maker),
+    )
+
+
+# Base-tier spot fees, used when the market metadata has none
 DEFAULT_FEES: Dict[str, ExchangeFees] = {
-    "bitget": ExchangeFees(
-        taker=_env_float("FEE_TAKER_BITGET", 0.001),
-        maker=_env_float("FEE_MAKER_BITGET", 0.001),
-    ),
-    "bingx": ExchangeFees(
-        taker=_env_float("FEE_TAKER_BINGX", 0.001),
-        maker=_env_float("FEE_MAKER_BINGX", 0.001),
-    ),
-    "bybit": ExchangeFees(
-        taker=_env_float("FEE_TAKER_BYBIT", 0.001),
-        maker=_env_float("FEE_MAKER_BYBIT", 0.001),
-    ),
+    "bitget": _fees("bitget", 0.001, 0.001),
+    "bingx": _fees("bingx", 0.001, 0.001),
+    "bybit": _fees("bybit", 0.001, 0.001),
+    "kucoin": _fees("kucoin", 0.001, 0.001),
+    "htx": _fees("htx", 0.002, 0.002),
+    "mexc": _fees("mexc", 0.0005, 0.0),
+    "gateio": _fees("gateio", 0.002, 0.002),
+    "bitmart": _fees("bitmart", 0.0025, 0.0025),
+    "coinw": _fees("coinw", 0.002, 0.002),
 }
 
 
+def taker_override(exchange_name: str) -> float | None:
+    """``FEE_TAKER_<NAME>`` if set (a user's own fee tier beats any published one)."""
+    value = _env_float(f"FEE_TAKER_{exchange_name.upper()}", -1.0)
+    return value if value >= 0.0 else None
+
+
 def get_taker_fee(exchange_name: str) -> float:
+    """Exchange-wide taker fee (override or base tier), without market metadata."""
     name = exchange_name.lower()
     fees = DEFAULT_FEES.get(name)
-    if fees is None:
-        return 0.001
-    return fees.taker
+    if fees is not None:
+        return fees.taker
+    override = taker_override(name)
+    return override if override is not None else FALLBACK_TAKER
+
+
+def market_taker_fee(market: Dict[str, Any] | None) -> float | None:
+    """Percentage taker fee from one ccxt market entry, None if absent or unusable."""
+    if not market or market.get("percentage") is False:
+        return None
+    try:
+        fee = float(market.get("taker"))
+    except (TypeError, ValueError):
+        return None
+    # anything outside 0..5% is a parsing artefact rather than a fee
+    if not 0.0 <= fee < 0.05:
+        return None
+    return fee
+
+
+class FeeMatrix:
+    """Dense exchange x symbol taker fee matrix for one symbol universe."""
+
+    def __init__(self, symbols: Iterable[str], exchanges: Dict[str, Any] | None = None) -> None:
+        self.symbols = list(symbols)
+        self.column: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.defaults: Dict[str, float] = {}
+        self.rows: Dict[str, array] = {}
+        for name, exchange in (exchanges or {}).items():
+            self.set_exchange(name, exchange)
+
+    def set_exchange(self, name: str, exchange: Any = None) -> None:
+        """(Re)build the row of ``name`` from its loaded markets."""
+        default = get_taker_fee(name)
+        self.defaults[name] = default
+        row = array("d", [default]) * len(self.symbols)
+        markets = getattr(exchange, "markets", None) or {}
+        if markets and taker_override(name) is None:
+            for i, sym in enumerate(self.symbols):
+                fee = market_taker_fee(markets.get(sym))
+                if fee is not None:
+                    row[i] = fee
+        self.rows[name] = row
+
+    def remove_exchange(self, name: str) -> None:
+        self.rows.pop(name, None)
+        self.defaults.pop(name, None)
+
+    def row(self, name: str) -> array:
+        """Row of ``name``; exchanges without markets get their default schedule."""
+        row = self.rows.get(name)
+        if row is None:
+            self.set_exchange(name)
+            row = self.rows[name]
+        return row
+
+    def taker(self, name: str, symbol: str) -> float:
+        col = self.column.get(symbol)
+        if col is None:
+            self.row(name)
+            return self.defaults[name]
+        return self.row(name)[col]
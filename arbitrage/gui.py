@@ -1,4 +1,5 @@
 import asyncio
+import concurrent.futures
 import threading
 import time
 import queue
@@ -8,10 +9,26 @@ from typing import Dict, List, Tuple
 import tkinter as tk
 from tkinter import ttk, messagebox
 
-from .exchanges import create_exchange, close_exchange, get_usdt_spot_symbols, fetch_tickers, create_exchange_safe, diagnose_connectivity, SUPPORTED_EXCHANGES
-from .scanner import compute_opportunities, Opportunity
-from .fees import get_taker_fee
-from .networks import best_common_network
+from .exchanges import get_usdt_spot_symbols, fetch_tickers_timed, diagnose_connectivity, fetch_status, refresh_markets, SUPPORTED_EXCHANGES
+from .scanner import Opportunity, ScanResult, apply_net_pnl, filter_by_z, rank_by_net_pnl, route_key, scan_quotes
+from .spreadstats import SpreadStats
+from .lifecycle import CLOSED, LifecycleEvent, LifecycleTracker
+from .fees import FeeMatrix
+from .networks import RETRY_SEC, transfer_networks, transfer_networks_sync
+from .recorder import TickRecorder
+from .timing import NULL_TIMER, StageTimer
+from .metrics import METRICS, MetricsServer
+from . import tracing
+from .tracing import span
+from .profiling import CycleProfiler
+from .scheduler import SymbolScheduler
+from .cadence import CadenceController, gather_aligned
+from .markets import MarketDiff, MarketUniverse
+from .pool import ExchangePool
+from .breaker import BREAKER
+from .consensus import CONSENSUS
+from .endpoints import SELECTOR as ENDPOINTS
+from . import transport
 try:
     from win10toast import ToastNotifier
 except Exception:
@@ -45,6 +62,14 @@ def build_pair_url(exchange_name: str, symbol: str) -> str | None:
     return None
 
 
+def _status_line(cadence: CadenceController, universe: MarketUniverse) -> str:
+    return "  | ".join(
+        line
+        for line in (cadence.summary(), BREAKER.summary(), ENDPOINTS.summary(), universe.summary(), CONSENSUS.summary())
+        if line
+    )
+
+
 class ArbitrageGUI:
     def __init__(self, interval: float = 5.0, min_spread_bps: float = 0.0, top_n: int = 20, min_qv_usd: float = 50000.0, exchanges: List[str] | None = None) -> None:
         self.interval = interval
@@ -61,13 +86,28 @@ class ArbitrageGUI:
         self.queue: queue.Queue[List[Opportunity]] = queue.Queue()
         self.stop_event = threading.Event()
         self.worker_thread: threading.Thread | None = None
+        # exchanges outlive worker runs (Stop/Start, settings changes); async ones on the pool's loop
+        self.pool = ExchangePool()
+        self._worker_future: concurrent.futures.Future | None = None
         self.exchange_objects: Dict[str, object] = {}
+        # settings snapshot read by the running worker (replaced on every edit)
+        self._live_settings: Dict[str, object] = {"exchanges": list(self.exchanges_list)}
+        self.selected_show_all: bool = True
+        # deal size and transfer toggle used by the worker's net PnL stage
+        self.deal_size: float = 1000.0
+        self.include_transfers: bool = True
+        self._failed_exchanges: List[str] = []
         self.network_cache: Dict[str, Tuple[Tuple[str, float | None] | None, Tuple[str, float | None] | None]] = {}
+        # route key -> monotonic time before which a failed lookup is not retried (never cached)
+        self._network_retry: Dict[str, float] = {}
+        # taker fee per (exchange, symbol), rebuilt when the universe changes
+        self.fee_matrix = FeeMatrix(())
         # key: f"{buy}->{sell}:{symbol}" => ((base_net, base_fee), (quote_net, quote_fee)) or None if not found
         self.sync_mode = tk.BooleanVar(value=True)
         self.selected_sync_mode: bool = True
         self.notifier = ToastNotifier() if ToastNotifier is not None else None
-        self._notified_keys: set[str] = set()
+        # open opportunities across cycles (first seen, peak), one alert per opening
+        self.lifecycle = LifecycleTracker()
         self.additional_symbols: set[str] = {"BTC/USDT"}
         self._selected_row_key: str | None = None
         # deal and payout settings
@@ -78,7 +118,32 @@ class ArbitrageGUI:
         self.max_withdraw_enabled = tk.BooleanVar(value=False)
         self.max_withdraw_usd_var = tk.DoubleVar(value=20.0)
         self.network_filter_var = tk.StringVar(value="Любая")
+        self.min_z_var = tk.StringVar(value="")  # empty: no z-score filter
         self._last_opps: List[Opportunity] = []
+        # typical spread per route, fed by every scan
+        self.spread_stats = SpreadStats()
+        # optional tick recording (binary log next to user_settings.json)
+        self.record_ticks = tk.BooleanVar(value=False)
+        self.selected_record_ticks: bool = False
+        self.recorder: TickRecorder | None = None
+        # optional per-stage cycle timings shown under the status bar
+        self.show_timings = tk.BooleanVar(value=False)
+        self.timer = NULL_TIMER
+        # opt-in trace-event export (traces/ next to user_settings.json)
+        self.trace_enabled = tk.BooleanVar(value=False)
+        # local Prometheus endpoint; port comes from user_settings.json ("metrics_port", 0 = off)
+        self.metrics_port: int = 0
+        # total request budget across exchanges ("request_budget_rps" in user_settings.json)
+        self.request_budget_rps: float = 30.0
+        # asyncio worker only: stagger launches by latency so quotes are taken at one instant
+        self.aligned_fetch = tk.BooleanVar(value=False)
+        self.selected_aligned_fetch: bool = False
+        self.metrics_server: MetricsServer | None = None
+        # --profile N: profile the worker thread for the first N cycles after Start
+        self.profile_cycles: int = 0
+        self.profile_mode: str = "cprofile"
+        self.profile_out: str = "profiles"
+        self.profiler: CycleProfiler | None = None
 
         self._build_widgets()
 
@@ -131,6 +196,8 @@ class ArbitrageGUI:
         self.network_combo.set("Любая")
         self.network_combo.pack(side=tk.LEFT)
         self.network_combo.bind("<<ComboboxSelected>>", lambda e: self._apply_live_filters())
+        ttk.Label(filt, text="Мин. z:").pack(side=tk.LEFT, padx=(12, 0))
+        ttk.Entry(filt, textvariable=self.min_z_var, width=5).pack(side=tk.LEFT, padx=(4, 0))
 
         self.start_btn = ttk.Button(ctrl, text="Старт", command=self.start_worker)
         self.start_btn.pack(side=tk.LEFT, padx=(6, 4))
@@ -143,6 +210,10 @@ class ArbitrageGUI:
         ex_frame = ttk.Frame(container)
         ex_frame.pack(fill=tk.X, padx=10, pady=(0, 8))
         ttk.Checkbutton(ex_frame, text="Режим без asyncio (fallback)", variable=self.sync_mode).pack(side=tk.RIGHT)
+        ttk.Checkbutton(ex_frame, text="Запись тиков", variable=self.record_ticks).pack(side=tk.RIGHT, padx=8)
+        ttk.Checkbutton(ex_frame, text="Тайминги", variable=self.show_timings).pack(side=tk.RIGHT)
+        ttk.Checkbutton(ex_frame, text="Трассировка", variable=self.trace_enabled).pack(side=tk.RIGHT, padx=8)
+        ttk.Checkbutton(ex_frame, text="Синхронный опрос", variable=self.aligned_fetch).pack(side=tk.RIGHT)
         ttk.Button(ex_frame, text="Проверка соединения", command=self.show_connectivity).pack(side=tk.RIGHT, padx=8)
         sym_box = ttk.Frame(container)
         sym_box.pack(fill=tk.X, padx=10, pady=(0, 8))
@@ -171,7 +242,7 @@ class ArbitrageGUI:
         # Table with scrollbar
         table_frame = ttk.Frame(main_area)
         table_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 8))
-        cols = ("symbol", "buy", "sell", "ask", "bid", "spread", "net", "fee", "pnl")
+        cols = ("symbol", "buy", "sell", "ask", "bid", "spread", "z", "age", "net", "fee", "pnl")
         self.tree = ttk.Treeview(table_frame, columns=cols, show="headings", height=18, selectmode="browse")
         vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
         hsb = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
@@ -189,6 +260,8 @@ class ArbitrageGUI:
             ("ask", "Ask", tk.E, 110),
             ("bid", "Bid", tk.E, 110),
             ("spread", "Спред %", tk.E, 90),
+            ("z", "z", tk.E, 60),
+            ("age", "Держится, мин", tk.E, 100),
             ("net", "Сеть", tk.W, 90),
             ("fee", "Ком.", tk.E, 90),
             ("pnl", "Профит $", tk.E, 100),
@@ -232,17 +305,25 @@ class ArbitrageGUI:
         ttk.Label(quote_box, textvariable=self.quote_net_var).pack(anchor=tk.W, padx=8, pady=2)
         ttk.Label(quote_box, textvariable=self.quote_fee_var).pack(anchor=tk.W, padx=8, pady=2)
 
+        # Typical spread of the route (spreadstats)
+        self.stats_var = tk.StringVar(value="Спред: —")
+        ttk.Label(details, textvariable=self.stats_var, wraplength=360, justify=tk.LEFT).pack(anchor=tk.W, padx=8, pady=(0, 8))
+
         # Status bar
         self.status_var = tk.StringVar(value="Ожидание...")
         ttk.Label(container, textvariable=self.status_var, anchor=tk.W).pack(fill=tk.X, padx=10, pady=(0, 8))
+        self.cadence_var = tk.StringVar(value="")
+        ttk.Label(container, textvariable=self.cadence_var, anchor=tk.W, foreground="#666").pack(fill=tk.X, padx=10, pady=(0, 2))
+        self.timings_var = tk.StringVar(value="")
+        ttk.Label(container, textvariable=self.timings_var, anchor=tk.W, foreground="#666").pack(fill=tk.X, padx=10, pady=(0, 8))
 
     # Sorting helper
     def _sort_by(self, col: str, descending: bool) -> None:
         data = [(self.tree.set(k, col), k) for k in self.tree.get_children("")]
-        if col in ("ask", "bid", "spread", "pnl"):
+        if col in ("ask", "bid", "spread", "z", "age", "pnl"):
             def to_float(x):
                 try:
-                    return float(x[0])
+                    return float(str(x[0]).lstrip("~"))
                 except Exception:
                     return float("nan")
             data.sort(key=to_float, reverse=descending)
@@ -255,49 +336,41 @@ class ArbitrageGUI:
     async def _precompute_networks(self, opps: List[Opportunity], limit: int = 3) -> None:
         count = 0
         for o in opps[: self.top_n]:
-            key = f"{o.buy_exchange}->{o.sell_exchange}:{o.symbol}"
-            if key in self.network_cache:
+            key = route_key(o.buy_exchange, o.sell_exchange, o.symbol)
+            hit = key in self.network_cache
+            METRICS.cache_lookup("networks", hit)
+            if hit or self._network_retry.get(key, 0.0) > time.monotonic():
                 continue
-            base, quote = o.symbol.split("/")
             try:
                 src = self.exchange_objects.get(o.buy_exchange)
                 dst = self.exchange_objects.get(o.sell_exchange)
                 if not src or not dst:
                     continue
-                base_net = await best_common_network(src, dst, base)
-                quote_net = await best_common_network(src, dst, quote)
-                base_tuple = None if base_net is None else (base_net.network, base_net.withdraw_fee)
-                quote_tuple = None if quote_net is None else (quote_net.network, quote_net.withdraw_fee)
-                self.network_cache[key] = (base_tuple, quote_tuple)
+                self.network_cache[key] = await transfer_networks(src, dst, o.symbol)
+                self._network_retry.pop(key, None)
             except Exception:
-                self.network_cache[key] = (None, None)
+                self._network_retry[key] = time.monotonic() + RETRY_SEC
             count += 1
             if count >= limit:
                 break
 
     def _precompute_networks_sync(self, opps: List[Opportunity], limit: int = 3) -> None:
-        try:
-            from .networks import best_common_network_sync
-        except Exception:
-            return
         count = 0
         for o in opps[: self.top_n]:
-            key = f"{o.buy_exchange}->{o.sell_exchange}:{o.symbol}"
-            if key in self.network_cache:
+            key = route_key(o.buy_exchange, o.sell_exchange, o.symbol)
+            hit = key in self.network_cache
+            METRICS.cache_lookup("networks", hit)
+            if hit or self._network_retry.get(key, 0.0) > time.monotonic():
                 continue
-            base, quote = o.symbol.split("/")
             try:
                 src = self.exchange_objects.get(o.buy_exchange)
                 dst = self.exchange_objects.get(o.sell_exchange)
                 if not src or not dst:
                     continue
-                base_net = best_common_network_sync(src, dst, base)
-                quote_net = best_common_network_sync(src, dst, quote)
-                base_tuple = None if base_net is None else (base_net.network, base_net.withdraw_fee)
-                quote_tuple = None if quote_net is None else (quote_net.network, quote_net.withdraw_fee)
-                self.network_cache[key] = (base_tuple, quote_tuple)
+                self.network_cache[key] = transfer_networks_sync(src, dst, o.symbol)
+                self._network_retry.pop(key, None)
             except Exception:
-                self.network_cache[key] = (None, None)
+                self._network_retry[key] = time.monotonic() + RETRY_SEC
             count += 1
             if count >= limit:
                 break
@@ -322,17 +395,18 @@ class ArbitrageGUI:
             to_compute.append((i, key, base, src, dst))
 
         if to_compute:
+            from .networks import best_common_network
             tasks = [best_common_network(src, dst, base) for (_, _, base, src, dst) in to_compute]
             results = await asyncio.gather(*tasks, return_exceptions=True)
             for (i, key, base, _src, _dst), res in zip(to_compute, results):
+                # no verdict from a failed lookup: not cached, asked again next time
                 if isinstance(res, Exception) or res is None:
-                    self.network_cache.setdefault(key, (None, None))
-                else:
-                    base_tuple = (res.network, res.withdraw_fee)
-                    old = self.network_cache.get(key)
-                    quote_tuple = None if old is None else old[1]
-                    self.network_cache[key] = (base_tuple, quote_tuple)
-                    include[i] = True
+                    continue
+                base_tuple = (res.network, res.withdraw_fee)
+                old = self.network_cache.get(key)
+                quote_tuple = None if old is None else old[1]
+                self.network_cache[key] = (base_tuple, quote_tuple)
+                include[i] = True
 
         return [o for i, o in enumerate(candidates) if include[i]]
 
@@ -361,16 +435,19 @@ class ArbitrageGUI:
             except Exception:
                 res = None
             if res is None:
-                self.network_cache.setdefault(key, (None, None))
-            else:
-                base_tuple = (res.network, res.withdraw_fee)
-                old = self.network_cache.get(key)
-                quote_tuple = None if old is None else old[1]
-                self.network_cache[key] = (base_tuple, quote_tuple)
-                include[i] = True
+                continue
+            base_tuple = (res.network, res.withdraw_fee)
+            old = self.network_cache.get(key)
+            quote_tuple = None if old is None else old[1]
+            self.network_cache[key] = (base_tuple, quote_tuple)
+            include[i] = True
         return [o for i, o in enumerate(candidates) if include[i]]
 
     def _update_table(self, opps: List[Opportunity]) -> None:
+        with self.timer.stage("render"), span("ui update", "ui", rows=len(opps)):
+            self._render_table(opps)
+
+    def _render_table(self, opps: List[Opportunity]) -> None:
         # Remember selection
         prev_key = self._selected_row_key
         for item in self.tree.get_children():
@@ -380,39 +457,26 @@ class ArbitrageGUI:
         self._last_opps = list(opps)
         # apply live filters before rendering
         filtered = self._apply_live_filters(return_only=True)
+        size, include = self._deal_settings()
+        now = time.time()
         for idx, o in enumerate(filtered[: self.top_n]):
             tag = "odd" if idx % 2 else ""
             key = f"{o.symbol}:{o.buy_exchange}->{o.sell_exchange}"
+            net = o.net
             net_str = "…"
             fee_str = ""
-            entry = self.network_cache.get(key)
-            if entry is not None:
-                base_tuple, _ = entry
-                if base_tuple is not None:
-                    net, fee = base_tuple
-                    net_str = str(net)
-                    fee_str = "?" if fee is None else f"{fee} {o.symbol.split('/')[0]}"
-            # calculate expected PnL in $ for given deal size (USDT)
+            if net is not None and net.base_network is not None:
+                net_str = str(net.base_network)
+                fee_str = "?" if net.base_withdraw_fee is None else f"{net.base_withdraw_fee} {o.symbol.split('/')[0]}"
+            elif net is not None and not net.transferable:
+                net_str = "нет"
+            # net PnL in $ for the deal size; "~" while the transfer fees are not known yet
             pnl_value = ""
-            try:
-                size = float(self.deal_amount.get())
-                # cost to buy size worth of quote
-                buy_cost = size
-                # proceeds from sell
-                sell_proceeds = size * (1.0 + o.spread_pct / 100.0)
-                # include base withdrawal fee if requested and available
-                if self.include_withdraw.get() and entry is not None and entry[0] is not None:
-                    base_fee = entry[0][1]
-                    base = o.symbol.split("/")[0]
-                    if base_fee is not None:
-                        # approximate base amount for transfer equal to size / ask price
-                        base_amt = size / o.buy_price
-                        # deduct fee valued at sell price into USDT
-                        buy_cost += base_fee * o.buy_price
-                        sell_proceeds -= base_fee * o.sell_price
-                pnl_value = f"{(sell_proceeds - buy_cost):.2f}"
-            except Exception:
-                pnl_value = ""
+            if size > 0:
+                approx = "~" if include and (net is None or not net.transfers_known) else ""
+                pnl_value = f"{approx}{o.pnl_at(size, include):.2f}"
+            route = self.lifecycle.get(o.symbol, o.buy_exchange, o.sell_exchange)
+            age = "" if route is None else f"{route.age(now) / 60.0:.1f}"
             iid = self.tree.insert("", tk.END, values=(
                 o.symbol,
                 o.buy_exchange,
@@ -420,6 +484,8 @@ class ArbitrageGUI:
                 f"{o.buy_price:.6f}",
                 f"{o.sell_price:.6f}",
                 f"{o.spread_pct:.3f}",
+                "" if o.z is None else f"{o.z:.1f}",
+                age,
                 net_str,
                 fee_str,
                 pnl_value,
@@ -442,6 +508,7 @@ class ArbitrageGUI:
             self.base_fee_var.set("Комиссия: —")
             self.quote_net_var.set("USDT: —")
             self.quote_fee_var.set("Комиссия: —")
+            self.stats_var.set("Спред: —")
             return
         values = row["values"]
         symbol = str(values[0])
@@ -449,6 +516,7 @@ class ArbitrageGUI:
         sell = str(values[2])
         self._selected_row_key = f"{symbol}:{buy}->{sell}"
         self.details_symbol.set(f"{symbol}  |  Покупка: {buy}  →  Продажа: {sell}")
+        self.stats_var.set(self.spread_stats.describe(symbol, buy, sell))
         key = f"{buy}->{sell}:{symbol}"
         entry = self.network_cache.get(key)
         base, quote = symbol.split("/")
@@ -468,7 +536,7 @@ class ArbitrageGUI:
                         note = f"лучший вывод {buy}: {net_buy.network if net_buy else '—'}"
                         fee = None if net_buy is None else net_buy.withdraw_fee
                     else:
-                        net_buy_async = asyncio.run(best_withdraw_network(self.exchange_objects.get(buy), base))
+                        net_buy_async = self.pool.run(best_withdraw_network(self.exchange_objects.get(buy), base), timeout=10)
                         net_buy = net_buy_async
                         note = f"лучший вывод {buy}: {net_buy.network if net_buy else '—'}"
                         fee = None if net_buy is None else net_buy.withdraw_fee
@@ -482,26 +550,24 @@ class ArbitrageGUI:
                 self.base_net_var.set(f"База {base}: сеть {net}")
                 fee_str = "?" if fee is None else f"{fee} {base}"
                 self.base_fee_var.set(f"Комиссия: {fee_str}")
+            # USDT leg: proceeds go back from the sell exchange to the buy exchange
             if quote_tuple is None:
                 try:
                     from .networks import best_withdraw_network, best_withdraw_network_sync
                     if self.selected_sync_mode:
-                        net_buy = best_withdraw_network_sync(self.exchange_objects.get(buy), "USDT")
-                        note = f"лучший вывод {buy}: {net_buy.network if net_buy else '—'}"
-                        fee = None if net_buy is None else net_buy.withdraw_fee
+                        net_sell = best_withdraw_network_sync(self.exchange_objects.get(sell), "USDT")
                     else:
-                        net_buy_async = asyncio.run(best_withdraw_network(self.exchange_objects.get(buy), "USDT"))
-                        net_buy = net_buy_async
-                        note = f"лучший вывод {buy}: {net_buy.network if net_buy else '—'}"
-                        fee = None if net_buy is None else net_buy.withdraw_fee
-                    self.quote_net_var.set(f"USDT: общая сеть не найдена ({note})")
+                        net_sell = self.pool.run(best_withdraw_network(self.exchange_objects.get(sell), "USDT"), timeout=10)
+                    note = f"лучший вывод {sell}: {net_sell.network if net_sell else '—'}"
+                    fee = None if net_sell is None else net_sell.withdraw_fee
+                    self.quote_net_var.set(f"USDT (возврат): общая сеть не найдена ({note})")
                     self.quote_fee_var.set("Комиссия: ?" if fee is None else f"Комиссия: {fee} USDT")
                 except Exception:
-                    self.quote_net_var.set("USDT: общая сеть не найдена")
+                    self.quote_net_var.set("USDT (возврат): общая сеть не найдена")
                     self.quote_fee_var.set("Комиссия: —")
             else:
                 net, fee = quote_tuple
-                self.quote_net_var.set(f"USDT: сеть {net}")
+                self.quote_net_var.set(f"USDT (возврат): сеть {net}")
                 fee_str = "?" if fee is None else f"{fee} USDT"
                 self.quote_fee_var.set(f"Комиссия: {fee_str}")
 
@@ -542,37 +608,42 @@ class ArbitrageGUI:
         self._open_exchange(str(values[2]), symbol)
 
     def start_worker(self) -> None:
-        # If previous worker is still winding down, wait briefly
+        # If the previous worker is still finishing a request, retry shortly instead of blocking Tk
         if self.worker_thread and self.worker_thread.is_alive():
-            try:
-                # Give it a short grace period to stop
-                self.worker_thread.join(timeout=2.0)
-            except Exception:
-                pass
-            if self.worker_thread.is_alive():
-                # Still alive — do not start another
-                self.status_var.set("Ожидаю завершения предыдущего запуска...")
-                return
-        self.interval = float(self.interval_var.get())
-        self.min_spread_bps = float(self.spread_var.get())
-        self.min_qv_usd = float(self.qv_var.get())
-        self.top_n = int(self.top_var.get())
+            self.status_var.set("Ожидаю завершения предыдущего запуска...")
+            self.root.after(200, self.start_worker)
+            return
+        try:
+            settings = self._snapshot_settings()
+        except (tk.TclError, ValueError):
+            self.status_var.set("Проверьте числовые параметры")
+            return
         # Cache fallback mode in a plain bool (Tk variables are not thread-safe)
         try:
             self.selected_sync_mode = bool(self.sync_mode.get())
         except Exception:
             self.selected_sync_mode = True
-        # Read active exchanges from selector
-        active = [name for name, var in self.ex_vars.items() if var.get() and name in self.available_exchanges]
+        try:
+            self.selected_record_ticks = bool(self.record_ticks.get())
+        except Exception:
+            self.selected_record_ticks = False
+        self.timer = StageTimer() if self.show_timings.get() else NULL_TIMER
+        if self.trace_enabled.get():
+            import os
+            tracing.enable(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "traces")))
+        else:
+            tracing.disable()
+        self.timings_var.set("")
         # Need at least two
-        if len(active) < 2:
+        if len(settings["exchanges"]) < 2:
             self.status_var.set("Выберите минимум две биржи")
             return
-        self.exchanges_list = active
-        # Reset per-run state
-        self.stop_event.clear()
-        self.network_cache.clear()
-        self._notified_keys.clear()
+        self.exchanges_list = list(settings["exchanges"])
+        self.interval = settings["interval"]
+        self._live_settings = settings
+        self._failed_exchanges = []
+        # Reset per-run state; the network cache stays valid, exchanges are reused
+        self.lifecycle = LifecycleTracker()
         self.stop_event.clear()
         self.worker_thread = threading.Thread(target=self._worker_main, daemon=True)
         self.worker_thread.start()
@@ -582,19 +653,21 @@ class ArbitrageGUI:
 
     def stop_worker(self) -> None:
         self.stop_event.set()
-        # Try to stop the worker thread gracefully
-        if self.worker_thread and self.worker_thread.is_alive():
-            try:
-                self.worker_thread.join(timeout=3.0)
-            except Exception:
-                pass
-        self.worker_thread = None
+        # the async worker is cancelled at its current await; the sync one sees the event at once
+        fut = self._worker_future
+        if fut is not None:
+            fut.cancel()
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_var.set("Остановлено")
 
     def _on_close(self) -> None:
         self.stop_worker()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        tracing.disable()
+        self.pool.close(timeout=3.0)
         self.root.after(200, self.root.destroy)
 
     def _poll_queue(self) -> None:
@@ -607,57 +680,58 @@ class ArbitrageGUI:
             pass
         self.root.after(300, self._poll_queue)
 
-    def _apply_live_filters(self, return_only: bool = False) -> List[Opportunity]:
-        # compute PnL for each opp with current settings and filter
-        result: List[Opportunity] = []
-        size = 0.0
+    def _deal_settings(self) -> Tuple[float, bool]:
         try:
             size = float(self.deal_amount.get())
         except Exception:
             size = 0.0
+        try:
+            include = bool(self.include_withdraw.get())
+        except Exception:
+            include = True
+        return size, include
+
+    def _apply_live_filters(self, return_only: bool = False) -> List[Opportunity]:
+        # net PnL and transfer fees come with each opportunity (scanner.apply_net_pnl); only filter here
+        if not return_only:
+            # used as an event handler: re-render the last cycle with the new filters
+            self._update_table(self._last_opps)
+            return []
+        size, include = self._deal_settings()
         want_net = self.network_combo.get() if hasattr(self, "network_combo") else "Любая"
-        min_pnl = 0.0
+        min_pnl = None
         try:
             min_pnl = float(self.min_pnl_var.get())
         except Exception:
-            min_pnl = 0.0
+            min_pnl = None
+        if size <= 0:
+            min_pnl = None
         max_fee_usd = None
         if self.max_withdraw_enabled.get():
             try:
                 max_fee_usd = float(self.max_withdraw_usd_var.get())
             except Exception:
                 max_fee_usd = None
+        min_z = None
+        try:
+            raw_z = self.min_z_var.get().strip().replace(",", ".")
+            min_z = float(raw_z) if raw_z else None
+        except Exception:
+            min_z = None
+        any_net = not want_net or want_net == "Любая"
+        if any_net and max_fee_usd is None and min_pnl is None and min_z is None:
+            return list(self._last_opps)
         filtered_opps: List[Opportunity] = []
-        for o in self._last_opps:
-            key = f"{o.buy_exchange}->{o.sell_exchange}:{o.symbol}"
-            entry = self.network_cache.get(key)
-            base_ok = True
-            pnl_ok = True
-            fee_ok = True
-            # network constraint
-            if want_net and want_net != "Любая":
-                base_ok = entry is not None and entry[0] is not None and str(entry[0][0]).upper() == want_net
-            # fee filter
+        for o in filter_by_z(self._last_opps, min_z):
+            net = o.net
+            if not any_net and (net is None or str(net.base_network).upper() != want_net):
+                continue
             if max_fee_usd is not None:
-                if entry is None or entry[0] is None or entry[0][1] is None:
-                    fee_ok = False
-                else:
-                    fee_ok = (entry[0][1] * o.buy_price) <= max_fee_usd
-            # pnl calculation
-            if size > 0:
-                buy_cost = size
-                sell_proceeds = size * (1.0 + o.spread_pct / 100.0)
-                if self.include_withdraw.get() and entry is not None and entry[0] is not None and entry[0][1] is not None:
-                    fee = entry[0][1]
-                    buy_cost += fee * o.buy_price
-                    sell_proceeds -= fee * o.sell_price
-                pnl_ok = (sell_proceeds - buy_cost) >= min_pnl
-            if base_ok and fee_ok and pnl_ok:
-                filtered_opps.append(o)
-        if return_only:
-            return filtered_opps
-        # if used as event handler, trigger re-render
-        self._update_table(filtered_opps)
+                if net is None or net.base_withdraw_fee is None or net.base_withdraw_fee * o.buy_price > max_fee_usd:
+                    continue
+            if min_pnl is not None and o.pnl_at(size, include) < min_pnl:
+                continue
+            filtered_opps.append(o)
         return filtered_opps
 
     def _export_csv(self) -> None:
@@ -674,20 +748,40 @@ class ArbitrageGUI:
             out_path = os.path.abspath(out_path)
             with open(out_path, "w", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f)
-                writer.writerow(["symbol","buy","sell","ask","bid","spread","net","fee","pnl"])
+                writer.writerow(["symbol","buy","sell","ask","bid","spread","z","age_min","net","fee","pnl"])
                 for r in rows:
                     writer.writerow(r)
             messagebox.showinfo("Экспорт CSV", f"Сохранено: {out_path}")
         except Exception as e:
             messagebox.showerror("Экспорт CSV", f"Ошибка: {e}")
 
+    def _ticks_dir(self) -> str:
+        import os
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "ticks"))
+
     def _worker_main(self) -> None:
+        if self.selected_record_ticks:
+            try:
+                self.recorder = TickRecorder(self._ticks_dir())
+            except Exception:
+                self.recorder = None
         try:
             if self.selected_sync_mode:
                 self._worker_sync()
             else:
-                asyncio.run(self._worker_async())
+                # async exchanges live on the pool loop; Stop cancels this task there
+                self._worker_future = self.pool.submit(self._worker_async())
+                try:
+                    self._worker_future.result()
+                except concurrent.futures.CancelledError:
+                    pass
+                finally:
+                    self._worker_future = None
         finally:
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
+            tracing.flush()
             # Ensure buttons reflect stopped state if thread exits on its own
             self.root.after(0, lambda: (
                 self.start_btn.config(state=tk.NORMAL),
@@ -695,179 +789,388 @@ class ArbitrageGUI:
                 self.status_var.set("Остановлено")
             ))
 
+    def _start_profiler(self) -> None:
+        if self.profile_cycles > 0:
+            # started on the scanning thread (worker or pool loop), not the Tk loop
+            self.profiler = CycleProfiler(self.profile_cycles, out_dir=self.profile_out, mode=self.profile_mode).start()
+
+    def _finish_profile(self) -> None:
+        profiler, self.profiler = self.profiler, None
+        # profile once per session; later Start presses run unprofiled
+        self.profile_cycles = 0
+        try:
+            path = profiler.stop()
+        except Exception:
+            return
+        if path:
+            self.root.after(0, lambda: messagebox.showinfo("Профилирование", f"Отчёт ({profiler.done} цикл.):\n{path}"))
+
+    def _snapshot_settings(self) -> Dict[str, object]:
+        """Plain copy of the scan settings (Tk thread only; workers read the snapshot)."""
+        interval = float(self.interval_var.get())
+        if interval <= 0:
+            raise ValueError("interval")
+        return {
+            "interval": interval,
+            "min_spread_bps": float(self.spread_var.get()),
+            "min_qv": float(self.qv_var.get()),
+            "top_n": max(1, int(self.top_var.get())),
+            "show_all": bool(self.show_all_var.get()),
+            "aligned": bool(self.aligned_fetch.get()),
+            "deal": max(0.0, float(self.deal_amount.get())),
+            "include_withdraw": bool(self.include_withdraw.get()),
+            "exchanges": [name for name, var in self.ex_vars.items() if var.get() and name in self.available_exchanges],
+        }
+
+    def _on_settings_changed(self, *_args) -> None:
+        try:
+            settings = self._snapshot_settings()
+        except (tk.TclError, ValueError):
+            # half-typed value in an entry: keep the previous settings
+            return
+        # a new dict each time: the running worker notices it by identity
+        self._live_settings = settings
+
+    def _apply_settings(self, settings: Dict[str, object], cadence: CadenceController) -> None:
+        interval_changed = settings["interval"] != self.interval
+        self.interval = settings["interval"]
+        self.min_spread_bps = settings["min_spread_bps"]
+        self.min_qv_usd = settings["min_qv"]
+        self.top_n = settings["top_n"]
+        self.selected_show_all = settings["show_all"]
+        self.selected_aligned_fetch = settings["aligned"]
+        self.deal_size = settings["deal"]
+        self.include_transfers = settings["include_withdraw"]
+        if interval_changed:
+            cadence.set_base_interval(self.interval)
+
+    def _min_spread_pct(self) -> float:
+        return (-1e9 if self.selected_show_all else self.min_spread_bps) / 100.0
+
+    def _scan(self, symbols: List[str], tickers_by_exchange: Dict[str, Dict[str, dict]]) -> ScanResult:
+        """One scanner pass with the current settings (see scanner.scan_quotes)."""
+        return scan_quotes(
+            symbols,
+            tickers_by_exchange,
+            min_spread_pct=self._min_spread_pct(),
+            min_quote_volume_usd=self.min_qv_usd,
+            fees=self.fee_matrix,
+            pinned=tuple(self.additional_symbols),
+            candidate_limit=self.top_n,
+            consensus=CONSENSUS,
+            stats=self.spread_stats,
+        )
+
+    @staticmethod
+    def _rows(result: ScanResult) -> List[Opportunity]:
+        """Opportunities plus pinned pairs; the best candidates when nothing passes the filters."""
+        if result.pinned:
+            opps = sorted(result.opportunities + result.pinned, key=lambda o: o.spread_pct, reverse=True)
+        else:
+            opps = result.opportunities
+        return opps or result.candidates
+
+    def _sync_exchange_set(self, ex_objs: Dict[str, object], connecting, start_connect) -> Tuple[object, bool]:
+        """Bring ``ex_objs`` in line with the selected exchanges; returns (pending connect, changed).
+
+        Deselected exchanges are dropped (they stay warm in the pool); missing
+        ones are connected in the background via ``start_connect(names)``,
+        which returns a future/task resolving to ``(exchanges, failed)``.
+        """
+        wanted = list(self._live_settings["exchanges"])
+        changed = False
+        if connecting is not None and connecting.done():
+            try:
+                got, failed = connecting.result()
+            except BaseException:
+                got, failed = {}, []
+            connecting = None
+            for name, ex in got.items():
+                if name in wanted and name not in ex_objs:
+                    ex_objs[name] = ex
+                    changed = True
+            self._failed_exchanges = [n for n in failed if n in wanted]
+            if self._failed_exchanges and len(ex_objs) >= 2:
+                self.root.after(0, lambda f=", ".join(self._failed_exchanges): self.status_var.set(f"Часть бирж недоступна: {f}. Работаем с остальными."))
+        for name in list(ex_objs):
+            if name not in wanted:
+                del ex_objs[name]
+                changed = True
+        if connecting is None:
+            missing = [n for n in wanted if n not in ex_objs and BREAKER.retry_in(n) == 0.0]
+            if missing:
+                connecting = start_connect(missing)
+        return connecting, changed
+
+    def _symbol_budget(self, n: int) -> int:
+        # Limit symbols more aggressively to improve performance, especially with heavy exchanges (e.g., HTX)
+        return min(n, max(150, min(self.top_n * 30, 600)))
+
+    def _rebuild_universe(self, ex_objs, list_symbols, cadence: CadenceController, tickers_by_exchange, scheduler, universe: MarketUniverse):
+        """Shared symbols (>=2 exchanges) for the current exchange set; scheduler stats survive."""
+        for name in universe.exchanges:
+            if name not in ex_objs:
+                universe.remove_exchange(name)
+        for name, ex in ex_objs.items():
+            if name not in universe:
+                universe.set_exchange(name, list_symbols(ex))
+        per_counts = universe.per_counts()
+        symbols = universe.shared()
+        self.root.after(0, lambda pc=per_counts, n=len(symbols): self.status_var.set(f"Пары (>=2 бирж): {n} (" + ", ".join([f"{k}={v}" for k,v in pc.items()]) + ")"))
+        # Always include pinned symbols
+        symbols = sorted(set(symbols) | set(self.additional_symbols))
+        limit_symbols = self._symbol_budget(len(symbols))
+        if scheduler is None:
+            # fixed per-cycle budget: best-ranked symbols every cycle, the rest in rotating slices
+            scheduler = SymbolScheduler(symbols, limit_symbols, pinned=self.additional_symbols)
+        else:
+            scheduler.set_universe(symbols, limit_symbols)
+        for name in list(cadence.state):
+            if name not in ex_objs:
+                cadence.remove(name)
+                tickers_by_exchange.pop(name, None)
+        for name in ex_objs:
+            cadence.add(name)
+            tickers_by_exchange.setdefault(name, {})
+        self.exchange_objects = dict(ex_objs)
+        self.fee_matrix = FeeMatrix(symbols, ex_objs)
+        return symbols, scheduler
+
+    def _apply_market_diffs(self, diffs: List[MarketDiff], universe: MarketUniverse, scheduler: SymbolScheduler, tickers_by_exchange) -> List[str]:
+        """Update the universe, quotes and caches for listings/delistings; returns the new symbol list."""
+        listed: List[str] = []
+        for diff in diffs:
+            gone = set(diff.removed)
+            quotes = tickers_by_exchange.get(diff.exchange, {})
+            for sym in gone:
+                quotes.pop(sym, None)
+            # withdraw networks cached for routes that no longer exist
+            for key in list(self.network_cache):
+                route, _, sym = key.partition(":")
+                buy, _, sell = route.partition("->")
+                if sym in diff.shared_removed or (sym in gone and diff.exchange in (buy, sell)):
+                    self.network_cache.pop(key, None)
+                    self._network_retry.pop(key, None)
+            CONSENSUS.forget(diff.shared_removed)
+            listed.extend(diff.shared_added)
+        symbols = sorted(set(universe.shared()) | set(self.additional_symbols))
+        scheduler.set_universe(symbols, self._symbol_budget(len(symbols)))
+        # refreshed markets can carry new per-symbol fees as well
+        self.fee_matrix = FeeMatrix(symbols, self.exchange_objects)
+        if listed:
+            # new cross-exchange listings are fetched every cycle for a while
+            scheduler.boost(listed, universe.new_listing_ttl)
+        return symbols
+
+    def _waiting_for_exchanges(self, ex_objs: Dict[str, object]) -> None:
+        msg = "Недостаточно бирж онлайн для арбитража (нужно минимум 2). Повтор подключений..."
+        if self._failed_exchanges:
+            msg += f" Недоступны: {', '.join(self._failed_exchanges)}."
+        if len(self._live_settings["exchanges"]) < 2:
+            msg = "Выберите минимум две биржи"
+        self.root.after(0, lambda m=msg: self.status_var.set(m))
+
     async def _worker_async(self) -> None:
-        ex_objs: Dict[str, object] = {}
+        self._start_profiler()
         try:
-            # Keep retrying init until at least 2 exchanges are online or stopped
-            while not self.stop_event.is_set():
-                ex_objs.clear()
-                failed: List[str] = []
-                for name in self.exchanges_list:
-                    try:
-                        ex = await create_exchange_safe(name)
-                        if ex is None:
-                            failed.append(name)
-                        else:
-                            ex_objs[name] = ex
-                    except Exception:
-                        failed.append(name)
-                self.exchange_objects = ex_objs
-                if len(ex_objs) >= 2:
-                    if failed:
-                        self.root.after(0, lambda: self.status_var.set(f"Часть бирж недоступна: {', '.join(failed)}. Работаем с остальными."))
-                    break
-                else:
-                    msg = "Недостаточно бирж онлайн для арбитража (нужно минимум 2). Повтор подключений..."
-                    if failed:
-                        msg += f" Недоступны: {', '.join(failed)}."
-                    self.root.after(0, lambda m=msg: self.status_var.set(m))
-                    await asyncio.sleep(3)
-            if len(ex_objs) < 2:
-                return
+            await self._scan_async()
+        except asyncio.CancelledError:
+            # Stop cancels the task directly; exchanges stay open in the pool
+            pass
+        finally:
+            if self.profiler is not None:
+                self._finish_profile()
+            self.exchange_objects = {}
 
-            # Union, then leave только те пары, которые есть хотя бы на двух выбранных биржах
-            per_counts = {name: len(get_usdt_spot_symbols(ex)) for name, ex in ex_objs.items()}
-            sets_by_ex = {name: set(get_usdt_spot_symbols(ex)) for name, ex in ex_objs.items()}
-            union_all = set().union(*sets_by_ex.values()) if sets_by_ex else set()
-            symbols = [s for s in sorted(union_all) if sum(1 for st in sets_by_ex.values() if s in st) >= 2]
-            self.root.after(0, lambda pc=per_counts, n=len(symbols): self.status_var.set(f"Пары (>=2 бирж): {n} (" + ", ".join([f"{k}={v}" for k,v in pc.items()]) + ")"))
-            # Always include pinned symbols
-            symbols = sorted(set(symbols) | set(self.additional_symbols))
-            # Limit symbols more aggressively to improve performance, especially with heavy exchanges (e.g., HTX)
-            limit_symbols = min(len(symbols), max(150, min(self.top_n * 30, 600)))
-            symbols_lim = list(symbols)[:limit_symbols]
-
-            min_spread_pct = (-1e9 if self.show_all_var.get() else self.min_spread_bps) / 100.0
-
-            backoff = 2.0
-            while not self.stop_event.is_set():
-                tasks = [fetch_tickers(ex, symbols_lim) for ex in ex_objs.values()]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                tickers_by_exchange: Dict[str, Dict[str, dict]] = {}
-                for (name, _ex), res in zip(ex_objs.items(), results):
-                    if isinstance(res, Exception):
-                        tickers_by_exchange[name] = {}
+    async def _scan_async(self) -> None:
+        ex_objs: Dict[str, object] = {}
+        symbols: List[str] = []
+        scheduler: SymbolScheduler | None = None
+        universe = MarketUniverse()
+        refreshing: Dict[str, asyncio.Future] = {}
+        connecting = None
+        dirty = False
+        applied = None
+        # per-exchange polling cadence; exchanges not due keep their last quotes
+        cadence = CadenceController([], base_interval=self.interval, budget_rps=self.request_budget_rps)
+        tickers_by_exchange: Dict[str, Dict[str, dict]] = {}
+        timer = self.timer
+        while not self.stop_event.is_set():
+            # settings edited while running are applied here, exchanges included
+            settings = self._live_settings
+            if settings is not applied:
+                applied = settings
+                self._apply_settings(settings, cadence)
+            connecting, changed = self._sync_exchange_set(
+                ex_objs, connecting, lambda names: asyncio.ensure_future(self.pool.acquire_async(names))
+            )
+            dirty = dirty or changed
+            if len(ex_objs) < 2:
+                self.exchange_objects = dict(ex_objs)
+                self._waiting_for_exchanges(ex_objs)
+                await asyncio.sleep(0.5)
+                continue
+            if dirty:
+                symbols, scheduler = self._rebuild_universe(ex_objs, get_usdt_spot_symbols, cadence, tickers_by_exchange, scheduler, universe)
+                dirty = False
+            # market lists are re-fetched in the background; only diffs touch the universe
+            diffs = universe.poll_refresh(ex_objs, refreshing, lambda ex: asyncio.ensure_future(refresh_markets(ex)))
+            if diffs:
+                symbols = self._apply_market_diffs(diffs, universe, scheduler, tickers_by_exchange)
+            aligned = self.selected_aligned_fetch
+            due = cadence.due()
+            if aligned and len(due) < len(ex_objs):
+                # synchronized mode: all exchanges are launched together once all are due
+                await asyncio.sleep(min(cadence.seconds_until_all(), 1.0))
+                continue
+            if not due:
+                await asyncio.sleep(min(cadence.seconds_until_next(), 1.0))
+                continue
+            cycle_t0 = time.perf_counter()
+            with span("cycle", exchanges=len(due)):
+                batches = {name: scheduler.next_batch(name) for name in due}
+                with timer.stage("fetch"), span("fetch", aligned=aligned):
+                    if aligned:
+                        by_name, skew, naive = await gather_aligned(
+                            {name: (lambda name=name: fetch_tickers_timed(name, ex_objs[name], batches[name], timer=timer)) for name in due},
+                            cadence.latencies(),
+                        )
+                        results = [by_name[name] for name in due]
+                        cadence.record_skew(skew, naive)
+                        timer.add("skew", skew)
+                        METRICS.quote_skew.observe(skew)
                     else:
-                        tickers_by_exchange[name] = res
-
-                opps = compute_opportunities(
-                    symbols,
-                    tickers_by_exchange,
-                    min_spread_pct=min_spread_pct,
-                    min_quote_volume_usd=self.min_qv_usd,
-                )
-                opps = self._append_pinned_opportunities(opps, tickers_by_exchange)
-                if not opps:
-                    opps = self._build_best_candidates(symbols, tickers_by_exchange, limit=self.top_n)
-                await self._precompute_networks(opps, limit=self.top_n)
+                        tasks = [fetch_tickers_timed(name, ex_objs[name], batches[name], timer=timer) for name in due]
+                        results = await asyncio.gather(*tasks, return_exceptions=True)
+                for name, res in zip(due, results):
+                    error, requests_spent, latency = fetch_status(name, len(batches[name]))
+                    if isinstance(res, Exception):
+                        res, error = {}, "error"
+                    tickers_by_exchange[name] = res
+                    cadence.observe(name, latency, res, error=error, requests=requests_spent)
+                scheduler.observe(tickers_by_exchange)
+                if self.recorder is not None:
+                    self.recorder.record(tickers_by_exchange)
+
+                with timer.stage("compute"), span("compute"):
+                    result = self._scan(symbols, tickers_by_exchange)
+                    opps = self._rows(result)
+                with timer.stage("networks"), span("networks"):
+                    await self._precompute_networks(opps, limit=self.top_n)
+                with timer.stage("net"), span("net"):
+                    apply_net_pnl(opps, (self.deal_size,), self.network_cache, self.include_transfers)
+                    opps = rank_by_net_pnl(opps, include_transfers=self.include_transfers)
+                # pinned rows and quiet-market candidates are shown, not tracked
+                events = self.lifecycle.update(result.opportunities)
                 # Update UI safely from the main thread
                 self.root.after(0, lambda data=opps: self._update_table(data))
-                self._notify_if_threshold(opps)
+                self._notify_if_threshold(events)
                 try:
                     self.queue.put_nowait(opps)
                 except queue.Full:
                     pass
-                self.root.after(0, lambda n=len(symbols), m=len(opps), ls=limit_symbols: self.status_var.set(f"Пары: {n} (берём {ls}) | арбитражных возможностей: {m}"))
-
-                # dynamic backoff if no data received from majority of exchanges
-                failures = sum(1 for r in results if isinstance(r, Exception))
-                if failures >= max(1, len(results) // 2):
-                    backoff = min(backoff * 1.5, 20.0)
-                else:
-                    backoff = 2.0
-                await asyncio.sleep(max(self.interval, backoff))
-        finally:
-            await asyncio.gather(*[close_exchange(ex) for ex in ex_objs.values()])
-            # Fully drop references for clean restart
-            self.exchange_objects = {}
+                self.root.after(0, lambda n=len(symbols), m=len(opps), ls=scheduler.describe(): self.status_var.set(f"Пары: {n} (опрос {ls}) | арбитражных возможностей: {m}"))
+            cycle_dt = time.perf_counter() - cycle_t0
+            METRICS.record_cycle(cycle_dt, len(opps))
+            if timer.enabled:
+                timer.add("cycle", cycle_dt)
+                self.root.after(0, lambda line=timer.summary_line(): self.timings_var.set(line))
+            if self.profiler is not None and self.profiler.cycle_done():
+                self._finish_profile()
+            self.root.after(0, lambda line=_status_line(cadence, universe): self.cadence_var.set(line))
+            await asyncio.sleep(min(cadence.seconds_until_next(), 1.0))
 
     # Sync fallback worker (no asyncio/aiodns)
     def _worker_sync(self) -> None:
-        from .exchanges import create_exchange_sync_safe, get_usdt_spot_symbols_sync, fetch_tickers_sync
+        from .exchanges import get_usdt_spot_symbols_sync, fetch_tickers_sync_timed, apply_markets_sync
+        self._start_profiler()
         ex_objs: Dict[str, object] = {}
+        symbols: List[str] = []
+        scheduler: SymbolScheduler | None = None
+        universe = MarketUniverse()
+        refreshing: Dict[str, concurrent.futures.Future] = {}
+        connecting = None
+        dirty = False
+        applied = None
+        cadence = CadenceController([], base_interval=self.interval, budget_rps=self.request_budget_rps)
+        tickers_by_exchange: Dict[str, Dict[str, dict]] = {}
+        timer = self.timer
         try:
-            # Keep retrying init until at least 2 exchanges are online or stopped
-            while not self.stop_event.is_set():
-                ex_objs.clear()
-                failed: List[str] = []
-                for name in self.exchanges_list:
-                    try:
-                        ex = create_exchange_sync_safe(name)
-                        if ex is None:
-                            failed.append(name)
-                        else:
-                            ex_objs[name] = ex
-                    except Exception:
-                        failed.append(name)
-                self.exchange_objects = ex_objs
-                if len(ex_objs) >= 2:
-                    if failed:
-                        self.root.after(0, lambda: self.status_var.set(f"Часть бирж недоступна: {', '.join(failed)}. Работаем с остальными."))
-                    break
-                else:
-                    msg = "Недостаточно бирж онлайн для арбитража (нужно минимум 2). Повтор подключений..."
-                    if failed:
-                        msg += f" Недоступны: {', '.join(failed)}."
-                    self.root.after(0, lambda m=msg: self.status_var.set(m))
-                    time.sleep(3)
-            if len(ex_objs) < 2:
-                return
-
-            per_counts = {name: len(get_usdt_spot_symbols_sync(ex)) for name, ex in ex_objs.items()}
-            sets_by_ex = {name: set(get_usdt_spot_symbols_sync(ex)) for name, ex in ex_objs.items()}
-            union_all = set().union(*sets_by_ex.values()) if sets_by_ex else set()
-            symbols = [s for s in sorted(union_all) if sum(1 for st in sets_by_ex.values() if s in st) >= 2]
-            symbols = sorted(set(symbols) | set(self.additional_symbols))
-            # Limit symbols more aggressively to improve performance, especially with heavy exchanges (e.g., HTX)
-            limit_symbols = min(len(symbols), max(150, min(self.top_n * 30, 600)))
-            symbols_lim = list(symbols)[:limit_symbols]
-
-            min_spread_pct = (-1e9 if self.show_all_var.get() else self.min_spread_bps) / 100.0
-
-            backoff = 2.0
             while not self.stop_event.is_set():
-                tickers_by_exchange: Dict[str, Dict[str, dict]] = {}
-                for name, ex in ex_objs.items():
+                settings = self._live_settings
+                if settings is not applied:
+                    applied = settings
+                    self._apply_settings(settings, cadence)
+                connecting, changed = self._sync_exchange_set(ex_objs, connecting, self.pool.acquire_sync_background)
+                dirty = dirty or changed
+                if len(ex_objs) < 2:
+                    self.exchange_objects = dict(ex_objs)
+                    self._waiting_for_exchanges(ex_objs)
+                    self.stop_event.wait(0.5)
+                    continue
+                if dirty:
+                    symbols, scheduler = self._rebuild_universe(ex_objs, get_usdt_spot_symbols_sync, cadence, tickers_by_exchange, scheduler, universe)
+                    dirty = False
+                # the market list is fetched off-thread; applying it touches the exchange, so it happens here
+                diffs = universe.poll_refresh(ex_objs, refreshing, lambda ex: self.pool.submit_sync(ex.fetch_markets), apply_markets_sync)
+                if diffs:
+                    symbols = self._apply_market_diffs(diffs, universe, scheduler, tickers_by_exchange)
+                due = cadence.due()
+                if not due:
+                    # wait() instead of sleep(): Stop takes effect immediately
+                    self.stop_event.wait(min(cadence.seconds_until_next(), 1.0))
+                    continue
+                cycle_t0 = time.perf_counter()
+                with span("cycle", exchanges=len(due)):
+                    with timer.stage("fetch"), span("fetch"):
+                        for name in due:
+                            if self.stop_event.is_set():
+                                break
+                            try:
+                                batch = scheduler.next_batch(name)
+                                res = fetch_tickers_sync_timed(name, ex_objs[name], batch, timer=timer)
+                                error, requests_spent, latency = fetch_status(name, len(batch))
+                            except Exception:
+                                res, error, requests_spent, latency = {}, "error", 1, 0.0
+                            tickers_by_exchange[name] = res
+                            cadence.observe(name, latency, res, error=error, requests=requests_spent)
+                    if self.stop_event.is_set():
+                        break
+                    scheduler.observe(tickers_by_exchange)
+                    if self.recorder is not None:
+                        self.recorder.record(tickers_by_exchange)
+
+                    with timer.stage("compute"), span("compute"):
+                        result = self._scan(symbols, tickers_by_exchange)
+                        opps = self._rows(result)
+                    with timer.stage("networks"), span("networks"):
+                        self._precompute_networks_sync(opps, limit=self.top_n)
+                    with timer.stage("net"), span("net"):
+                        apply_net_pnl(opps, (self.deal_size,), self.network_cache, self.include_transfers)
+                        opps = rank_by_net_pnl(opps, include_transfers=self.include_transfers)
+                    # pinned rows and quiet-market candidates are shown, not tracked
+                    events = self.lifecycle.update(result.opportunities)
+                    # Update UI from the main thread
+                    self.root.after(0, lambda data=opps: self._update_table(data))
+                    self._notify_if_threshold(events)
                     try:
-                        tickers_by_exchange[name] = fetch_tickers_sync(ex, symbols_lim)
-                    except Exception:
-                        tickers_by_exchange[name] = {}
-
-                from .scanner import compute_opportunities
-                opps = compute_opportunities(
-                    symbols,
-                    tickers_by_exchange,
-                    min_spread_pct=min_spread_pct,
-                    min_quote_volume_usd=self.min_qv_usd,
-                )
-                opps = self._append_pinned_opportunities(opps, tickers_by_exchange)
-                if not opps:
-                    opps = self._build_best_candidates(symbols, tickers_by_exchange, limit=self.top_n)
-                self._precompute_networks_sync(opps, limit=self.top_n)
-                # Update UI from the main thread
-                self.root.after(0, lambda data=opps: self._update_table(data))
-                self._notify_if_threshold(opps)
-                try:
-                    self.queue.put_nowait(opps)
-                except queue.Full:
-                    pass
-                self.root.after(0, lambda n=len(symbols), m=len(opps), ls=limit_symbols: self.status_var.set(f"Пары: {n} (берём {ls}) | арбитражных возможностей: {m}"))
-                failures = sum(1 for v in tickers_by_exchange.values() if not v)
-                if failures >= max(1, len(tickers_by_exchange) // 2):
-                    backoff = min(backoff * 1.5, 20.0)
-                else:
-                    backoff = 2.0
-                time.sleep(max(self.interval, backoff))
+                        self.queue.put_nowait(opps)
+                    except queue.Full:
+                        pass
+                    self.root.after(0, lambda n=len(symbols), m=len(opps), ls=scheduler.describe(): self.status_var.set(f"Пары: {n} (опрос {ls}) | арбитражных возможностей: {m}"))
+                cycle_dt = time.perf_counter() - cycle_t0
+                METRICS.record_cycle(cycle_dt, len(opps))
+                if timer.enabled:
+                    timer.add("cycle", cycle_dt)
+                    self.root.after(0, lambda line=timer.summary_line(): self.timings_var.set(line))
+                if self.profiler is not None and self.profiler.cycle_done():
+                    self._finish_profile()
+                self.root.after(0, lambda line=_status_line(cadence, universe): self.cadence_var.set(line))
+                self.stop_event.wait(min(cadence.seconds_until_next(), 1.0))
         finally:
-            # Some sync exchanges may have .close
-            for ex in ex_objs.values():
-                try:
-                    close = getattr(ex, "close", None)
-                    if callable(close):
-                        close()
-                except Exception:
-                    pass
-            # Fully drop references for clean restart
+            if self.profiler is not None:
+                self._finish_profile()
+            # exchanges stay open in the pool for the next Start
             self.exchange_objects = {}
 
     def run(self) -> None:
@@ -885,6 +1188,12 @@ class ArbitrageGUI:
                 self.top_var.set(cfg.get("top_n", self.top_n))
                 self.deal_amount.set(cfg.get("deal", 1000.0))
                 self.include_withdraw.set(cfg.get("include_withdraw", True))
+                self.record_ticks.set(cfg.get("record_ticks", False))
+                self.show_timings.set(cfg.get("show_timings", False))
+                self.metrics_port = int(cfg.get("metrics_port", 0) or 0)
+                self.request_budget_rps = float(cfg.get("request_budget_rps", self.request_budget_rps))
+                self.trace_enabled.set(cfg.get("trace", False))
+                self.aligned_fetch.set(cfg.get("sync_fetch", False))
                 for name, val in cfg.get("exchanges", {}).items():
                     if name in self.ex_vars:
                         self.ex_vars[name].set(bool(val))
@@ -903,6 +1212,12 @@ class ArbitrageGUI:
                     "top_n": int(self.top_var.get()),
                     "deal": float(self.deal_amount.get()),
                     "include_withdraw": bool(self.include_withdraw.get()),
+                    "record_ticks": bool(self.record_ticks.get()),
+                    "show_timings": bool(self.show_timings.get()),
+                    "metrics_port": int(self.metrics_port),
+                    "request_budget_rps": float(self.request_budget_rps),
+                    "trace": bool(self.trace_enabled.get()),
+                    "sync_fetch": bool(self.aligned_fetch.get()),
                     "exchanges": {k: bool(v.get()) for k, v in self.ex_vars.items()},
                 }
                 with open(cfg_path, "w", encoding="utf-8") as f:
@@ -912,43 +1227,77 @@ class ArbitrageGUI:
             self.root.after(5000, _persist)
 
         self.root.after(5000, _persist)
+        if self.metrics_port > 0:
+            try:
+                self.metrics_server = MetricsServer(port=self.metrics_port).start()
+            except Exception:
+                self.metrics_server = None
         # any change in filters should re-apply
         try:
             self.min_pnl_var.trace_add("write", lambda *_: self._apply_live_filters())
             self.max_withdraw_usd_var.trace_add("write", lambda *_: self._apply_live_filters())
             self.max_withdraw_enabled.trace_add("write", lambda *_: self._apply_live_filters())
             self.include_withdraw.trace_add("write", lambda *_: self._apply_live_filters())
+            self.deal_amount.trace_add("write", lambda *_: self._apply_live_filters())
+            self.min_z_var.trace_add("write", lambda *_: self._apply_live_filters())
         except Exception:
             pass
+        # scan settings (exchanges included) are picked up by the running worker
+        for var in (self.interval_var, self.spread_var, self.qv_var, self.top_var, self.show_all_var, self.aligned_fetch, self.deal_amount, self.include_withdraw, *self.ex_vars.values()):
+            var.trace_add("write", self._on_settings_changed)
+        self._on_settings_changed()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self.root.mainloop()
 
     def show_connectivity(self) -> None:
-        try:
-            checks = diagnose_connectivity()
-        except Exception as e:
-            messagebox.showerror("Проверка соединения", f"Ошибка диагностики: {e}")
+        # probing takes seconds; run it off the Tk thread and report back via after()
+        if getattr(self, "_diag_running", False):
             return
-        lines = ["Диагностика соединения:"]
-        for k, v in checks.items():
-            lines.append(f"{k}: DNS={v.get('dns')} HTTPS={v.get('https')}")
-        messagebox.showinfo("Проверка соединения", "\n".join(lines))
+        self._diag_running = True
+        prev_status = self.status_var.get()
+        self.status_var.set("Проверка соединения...")
+
+        def done(checks: Dict[str, object] | None, error: str | None) -> None:
+            self._diag_running = False
+            if self.status_var.get() == "Проверка соединения...":
+                self.status_var.set(prev_status)
+            if error is not None:
+                messagebox.showerror("Проверка соединения", f"Ошибка диагностики: {error}")
+                return
+            lines = ["Диагностика соединения (медиана DNS/TCP/TLS, TTFB p50/p95):"]
+            for k, rep in (checks or {}).items():
+                lines.append(f"{k}: {rep.summary()}")
+            messagebox.showinfo("Проверка соединения", "\n".join(lines))
 
-    def _notify_if_threshold(self, opps: List[Opportunity]) -> None:
+        def work() -> None:
+            try:
+                checks = diagnose_connectivity()
+            except Exception as e:
+                self.root.after(0, lambda err=str(e): done(None, err))
+                return
+            self.root.after(0, lambda: done(checks, None))
+
+        threading.Thread(target=work, name="diagnose", daemon=True).start()
+
+    def _notify_if_threshold(self, events: List[LifecycleEvent]) -> None:
         if self.notifier is None:
             return
         try:
-            for o in opps:
-                if o.spread_pct >= 2.5:
-                    key = f"{o.symbol}:{o.buy_exchange}->{o.sell_exchange}:{round(o.spread_pct, 2)}"
-                    if key in self._notified_keys:
-                        continue
-                    self._notified_keys.add(key)
-                    title = f"Арбитраж {o.symbol} {o.spread_pct:.2f}%"
-                    msg = f"Покупка: {o.buy_exchange}  Продажа: {o.sell_exchange}  Ask: {o.buy_price:.6f}  Bid: {o.sell_price:.6f}"
-                    try:
-                        self.notifier.show_toast(title, msg, duration=5, threaded=True)
-                    except Exception:
-                        pass
+            for ev in events:
+                route = ev.route
+                # once per opening, when the spread first reaches the threshold
+                if ev.kind == CLOSED or route.alerted or route.spread_pct < 2.5:
+                    continue
+                route.alerted = True
+                o = route.opportunity
+                title = f"Арбитраж {route.symbol} {route.spread_pct:.2f}%"
+                msg = f"Покупка: {route.buy_exchange}  Продажа: {route.sell_exchange}  Ask: {o.buy_price:.6f}  Bid: {o.sell_price:.6f}"
+                if ev.duration >= 1.0:
+                    msg += f"  Держится: {ev.duration:.0f}с"
+                try:
+                    self.notifier.show_toast(title, msg, duration=5, threaded=True)
+                except Exception:
+                    pass
         except Exception:
             pass
 
@@ -961,120 +1310,22 @@ class ArbitrageGUI:
         self.additional_symbols.add(sym)
         self.status_var.set(f"Пара добавлена: {sym}")
 
-    def _append_pinned_opportunities(self, opps: List[Opportunity], tickers_by_exchange: Dict[str, Dict[str, dict]]) -> List[Opportunity]:
-        existing_syms = {o.symbol for o in opps}
-        extra: List[Opportunity] = []
-        for sym in self.additional_symbols:
-            if sym in existing_syms:
-                continue
-            # Build best buy/sell across exchanges even if спред небольшой
-            best_ask = None
-            best_ask_ex = None
-            best_bid = None
-            best_bid_ex = None
-            for ex_name, tmap in tickers_by_exchange.items():
-                t = tmap.get(sym)
-                if not t:
-                    continue
-                ask = t.get("ask")
-                bid = t.get("bid")
-                if ask is not None:
-                    ask = float(ask)
-                    if best_ask is None or ask < best_ask:
-                        best_ask = ask
-                        best_ask_ex = ex_name
-                if bid is not None:
-                    bid = float(bid)
-                    if best_bid is None or bid > best_bid:
-                        best_bid = bid
-                        best_bid_ex = ex_name
-            if best_ask is None or best_bid is None or best_ask_ex is None or best_bid_ex is None:
-                continue
-            if best_ask_ex == best_bid_ex:
-                continue
-            buy_fee = get_taker_fee(best_ask_ex)
-            sell_fee = get_taker_fee(best_bid_ex)
-            eff_buy = best_ask * (1.0 + buy_fee)
-            eff_sell = best_bid * (1.0 - sell_fee)
-            if eff_buy <= 0:
-                continue
-            spread = (eff_sell - eff_buy) / eff_buy * 100.0
-            extra.append(
-                Opportunity(
-                    symbol=sym,
-                    buy_exchange=best_ask_ex,
-                    sell_exchange=best_bid_ex,
-                    buy_price=best_ask,
-                    sell_price=best_bid,
-                    spread_pct=max(spread, 0.0),
-                )
-            )
-        if not extra:
-            return opps
-        merged = opps + extra
-        # Удалим дубликаты по символу, оставляя лучший спред
-        best_by_sym: Dict[str, Opportunity] = {}
-        for o in merged:
-            cur = best_by_sym.get(o.symbol)
-            if cur is None or o.spread_pct > cur.spread_pct:
-                best_by_sym[o.symbol] = o
-        result = list(best_by_sym.values())
-        result.sort(key=lambda o: o.spread_pct, reverse=True)
-        return result
-
-    def _build_best_candidates(self, symbols: list[str], tickers_by_exchange: Dict[str, Dict[str, dict]], limit: int = 50) -> List[Opportunity]:
-        from .fees import get_taker_fee
-        cands: List[Opportunity] = []
-        for sym in symbols[: max(limit, 50)]:
-            best_ask = None
-            best_ask_ex = None
-            best_bid = None
-            best_bid_ex = None
-            for ex_name, tmap in tickers_by_exchange.items():
-                t = tmap.get(sym)
-                if not t:
-                    continue
-                ask = t.get("ask")
-                bid = t.get("bid")
-                if ask is not None:
-                    ask = float(ask)
-                    if best_ask is None or ask < best_ask:
-                        best_ask = ask
-                        best_ask_ex = ex_name
-                if bid is not None:
-                    bid = float(bid)
-                    if best_bid is None or bid > best_bid:
-                        best_bid = bid
-                        best_bid_ex = ex_name
-            if best_ask is None or best_bid is None or best_ask_ex is None or best_bid_ex is None:
-                continue
-            if best_ask_ex == best_bid_ex:
-                continue
-            buy_fee = get_taker_fee(best_ask_ex)
-            sell_fee = get_taker_fee(best_bid_ex)
-            eff_buy = best_ask * (1.0 + buy_fee)
-            eff_sell = best_bid * (1.0 - sell_fee)
-            if eff_buy <= 0:
-                continue
-            spread = (eff_sell - eff_buy) / eff_buy * 100.0
-            cands.append(
-                Opportunity(
-                    symbol=sym,
-                    buy_exchange=best_ask_ex,
-                    sell_exchange=best_bid_ex,
-                    buy_price=best_ask,
-                    sell_price=best_bid,
-                    spread_pct=max(spread, 0.0),
-                )
-            )
-            if len(cands) >= limit:
-                break
-        cands.sort(key=lambda o: o.spread_pct, reverse=True)
-        return cands
 
+def main(argv: List[str] | None = None) -> None:
+    import argparse
 
-def main() -> None:
+    p = argparse.ArgumentParser(description="GUI арбитража USDT")
+    p.add_argument("--profile", type=int, default=0, metavar="N", help="Профилировать поток сканирования первые N циклов после «Старт»")
+    p.add_argument("--profile-mode", choices=["cprofile", "sample"], default="cprofile", help="Детерминированный профайлер или сэмплирование стека")
+    p.add_argument("--profile-out", type=str, default="profiles", help="Каталог для отчётов профилирования")
+    p.add_argument("--uvloop", action="store_true", help="Использовать uvloop в потоке сканирования, если установлен")
+    args = p.parse_args(argv)
+    if args.uvloop:
+        transport.install_uvloop()
     app = ArbitrageGUI()
+    app.profile_cycles = max(0, args.profile)
+    app.profile_mode = args.profile_mode
+    app.profile_out = args.profile_out
     app.run()
 
 
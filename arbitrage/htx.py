@@ -0,0 +1,221 @@
+"""Streaming bulk tickers for HTX (Huobi).
+
+``GET /market/tickers`` returns every pair on the exchange (several thousand
+entries, mostly not USDT) and ccxt turns each one into a full ticker dict, so
+the bulk path used to be skipped for HTX in favour of per-symbol requests.
+Here the body is requested compressed, decompressed chunk by chunk and
+scanned for flat ``{...}`` entries; only entries whose id is in the requested
+USDT set are parsed (orjson when installed), straight into the normalized
+``{"bid", "ask", "quoteVolume"}`` shape.
+
+Record a live payload for the benchmarks with::
+
+    python -m arbitrage.htx --record htx_tickers.json.gz
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+try:
+    import orjson  # type: ignore
+
+    _loads = orjson.loads
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+    _loads = json.loads
+
+DEFAULT_URL = "https://api.huobi.pro/market/tickers"
+CHUNK = 64 * 1024
+_SYMBOL_KEY = b'"symbol":"'
+
+
+def wanted_ids(exchange: Any, symbols: Iterable[str]) -> Dict[str, str]:
+    """Exchange market id -> unified symbol for the requested USDT pairs."""
+    markets = getattr(exchange, "markets", None) or {}
+    out: Dict[str, str] = {}
+    for sym in symbols:
+        if not sym.endswith("/USDT"):
+            continue
+        m = markets.get(sym)
+        mid = m.get("id") if isinstance(m, dict) else None
+        out[str(mid or sym.replace("/", "").lower())] = sym
+    return out
+
+
+def tickers_url(exchange: Any) -> str:
+    api = (getattr(exchange, "urls", None) or {}).get("api")
+    base = (api.get("public") or api.get("spot")) if isinstance(api, dict) else api
+    if not base:
+        return DEFAULT_URL
+    base = base.replace("{hostname}", getattr(exchange, "hostname", None) or "api.huobi.pro")
+    return base.rstrip("/") + "/market/tickers"
+
+
+class TickerStreamDecoder:
+    """Incremental decoder for the ``/market/tickers`` body.
+
+    ``feed`` raw (possibly gzip/deflate encoded) chunks, then ``close``;
+    matching entries accumulate in ``result``. Only the unparsed tail of the
+    current chunk is buffered, never the whole document.
+    """
+
+    def __init__(self, wanted: Dict[str, str], encoding: Optional[str] = None) -> None:
+        self.wanted = {k.encode("ascii"): v for k, v in wanted.items()}
+        self.result: Dict[str, Dict[str, Any]] = {}
+        self.entries = 0
+        self.compressed_bytes = 0
+        self.raw_bytes = 0
+        enc = (encoding or "").lower()
+        # 32 + MAX_WBITS accepts both gzip and zlib headers
+        self._inflate = zlib.decompressobj(32 + zlib.MAX_WBITS) if enc in ("gzip", "deflate", "x-gzip") else None
+        self._buf = b""
+        self._in_data = False
+
+    def feed(self, chunk: bytes) -> None:
+        self.compressed_bytes += len(chunk)
+        if self._inflate is not None:
+            chunk = self._inflate.decompress(chunk)
+        self._consume(chunk)
+
+    def close(self) -> Dict[str, Dict[str, Any]]:
+        if self._inflate is not None:
+            self._consume(self._inflate.flush())
+        self._buf = b""
+        return self.result
+
+    def _consume(self, data: bytes) -> None:
+        if not data:
+            return
+        self.raw_bytes += len(data)
+        buf = self._buf + data if self._buf else data
+        pos = 0
+        if not self._in_data:
+            i = buf.find(b'"data":[')
+            if i < 0:
+                # keep a short tail in case the key is split across chunks
+                self._buf = buf[-16:]
+                return
+            self._in_data = True
+            pos = i + 8
+        wanted = self.wanted
+        while True:
+            start = buf.find(b"{", pos)
+            if start < 0:
+                pos = len(buf)
+                break
+            end = buf.find(b"}", start)
+            if end < 0:
+                pos = start
+                break
+            self.entries += 1
+            k = buf.find(_SYMBOL_KEY, start, end)
+            if k >= 0:
+                k += len(_SYMBOL_KEY)
+                sym_id = buf[k:buf.find(b'"', k, end)]
+                unified = wanted.get(sym_id)
+                if unified is not None:
+                    self._add(unified, buf[start:end + 1])
+            pos = end + 1
+        self._buf = buf[pos:]
+
+    def _add(self, symbol: str, raw: bytes) -> None:
+        try:
+            t = _loads(raw)
+        except Exception:
+            return
+        bid = t.get("bid")
+        ask = t.get("ask")
+        # HTX: "vol" is the 24h turnover in quote currency, "amount" in base
+        qv = t.get("vol")
+        if qv is None and t.get("amount") is not None and t.get("close") is not None:
+            qv = float(t["amount"]) * float(t["close"])
+        self.result[symbol] = {
+            "bid": float(bid) if bid is not None else None,
+            "ask": float(ask) if ask is not None else None,
+            "quoteVolume": float(qv) if qv is not None else None,
+        }
+
+
+def decode_payload(payload: bytes, wanted: Dict[str, str], encoding: Optional[str] = "gzip", chunk: int = CHUNK) -> Dict[str, Dict[str, Any]]:
+    """Decode a recorded body as if it arrived in ``chunk``-sized pieces."""
+    dec = TickerStreamDecoder(wanted, encoding)
+    view = memoryview(payload)
+    for i in range(0, len(payload), chunk):
+        dec.feed(bytes(view[i:i + chunk]))
+    return dec.close()
+
+
+async def fetch_tickers_stream(exchange: Any, symbols: List[str], timeout: float = 15.0) -> Dict[str, Dict[str, Any]]:
+    """Bulk HTX tickers over aiohttp with gzip transfer and incremental decode."""
+    import aiohttp
+
+    from ccxt.base.errors import RateLimitExceeded
+
+    wanted = wanted_ids(exchange, symbols)
+    if not wanted:
+        return {}
+    session = getattr(exchange, "session", None)
+    own = session is None or getattr(session, "closed", True)
+    if own:
+        session = aiohttp.ClientSession()
+    try:
+        async with session.get(
+            tickers_url(exchange),
+            headers={"Accept-Encoding": "gzip, deflate"},
+            auto_decompress=False,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as resp:
+            if resp.status == 429:
+                raise RateLimitExceeded("htx 429")
+            resp.raise_for_status()
+            dec = TickerStreamDecoder(wanted, resp.headers.get("Content-Encoding"))
+            async for chunk in resp.content.iter_chunked(CHUNK):
+                dec.feed(chunk)
+            return dec.close()
+    finally:
+        if own:
+            await session.close()
+
+
+def fetch_tickers_stream_sync(exchange: Any, symbols: List[str], timeout: float = 15.0) -> Dict[str, Dict[str, Any]]:
+    wanted = wanted_ids(exchange, symbols)
+    if not wanted:
+        return {}
+    with requests.get(tickers_url(exchange), headers={"Accept-Encoding": "gzip, deflate"}, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        dec = TickerStreamDecoder(wanted, r.headers.get("Content-Encoding"))
+        for chunk in r.raw.stream(CHUNK, decode_content=False):
+            dec.feed(chunk)
+        return dec.close()
+
+
+def record_payload(path: str, url: str = DEFAULT_URL, timeout: float = 30.0) -> int:
+    """Save the raw (compressed) ``/market/tickers`` body; returns bytes written."""
+    with requests.get(url, headers={"Accept-Encoding": "gzip"}, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        data = r.raw.read(decode_content=False)
+    if r.headers.get("Content-Encoding", "").lower() not in ("gzip", "x-gzip"):
+        # keep recordings uniformly gzip-compressed
+        data = gzip.compress(data)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def main(argv: List[str] | None = None) -> None:
+    p = argparse.ArgumentParser(description="Запись ответа HTX /market/tickers для бенчмарков")
+    p.add_argument("--record", type=str, required=True, help="Файл для сохранения (gzip)")
+    p.add_argument("--url", type=str, default=DEFAULT_URL, help="URL эндпоинта")
+    args = p.parse_args(argv)
+    n = record_payload(args.record, args.url)
+    print(f"{args.record}: {n} байт")
+
+
+if __name__ == "__main__":
+    main()
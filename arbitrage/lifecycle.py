@@ -0,0 +1,113 @@
+"""Lifecycle of opportunities across scan cycles.
+
+Opportunities are recomputed from scratch every cycle; ``LifecycleTracker``
+matches them by route (symbol, buy exchange, sell exchange) and turns the
+cycles into events:
+
+- ``opened``: the route has a positive spread after being absent;
+- ``updated``: the route is still open and its spread changed;
+- ``closed``: the route is gone. Its duration runs from the first cycle it
+  was seen to the first cycle it was missing.
+
+Only open routes are held, so memory follows the number of opportunities on
+the board rather than everything ever seen.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from .metrics import METRICS
+from .scanner import Opportunity
+
+OPENED = "opened"
+UPDATED = "updated"
+CLOSED = "closed"
+
+RouteKey = Tuple[str, str, str]
+
+
+@dataclass(slots=True)
+class OpenOpportunity:
+    symbol: str
+    buy_exchange: str
+    sell_exchange: str
+    first_seen: float
+    last_seen: float
+    spread_pct: float
+    peak_spread: float
+    cycles: int = 1
+    alerted: bool = False  # free for consumers, e.g. one notification per opening
+    opportunity: Opportunity | None = None  # latest one
+
+    @property
+    def key(self) -> RouteKey:
+        return (self.symbol, self.buy_exchange, self.sell_exchange)
+
+    def age(self, now: float | None = None) -> float:
+        return max(0.0, (time.time() if now is None else now) - self.first_seen)
+
+
+@dataclass(slots=True)
+class LifecycleEvent:
+    kind: str  # OPENED, UPDATED or CLOSED
+    route: OpenOpportunity
+    ts: float
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.ts - self.route.first_seen)
+
+
+class LifecycleTracker:
+    def __init__(self, min_spread_pct: float = 0.0) -> None:
+        # routes at or below this spread count as closed (pinned rows and
+        # quiet-market candidates are clipped to 0)
+        self.min_spread_pct = min_spread_pct
+        self.open: Dict[RouteKey, OpenOpportunity] = {}
+
+    def update(self, opps: Iterable[Opportunity], now: float | None = None) -> List[LifecycleEvent]:
+        """Feed one cycle's opportunities; returns the events, closings last."""
+        now = time.time() if now is None else now
+        events: List[LifecycleEvent] = []
+        seen = set()
+        for o in opps:
+            if o.spread_pct <= self.min_spread_pct:
+                continue
+            key = (o.symbol, o.buy_exchange, o.sell_exchange)
+            if key in seen:
+                continue
+            seen.add(key)
+            st = self.open.get(key)
+            if st is None:
+                st = self.open[key] = OpenOpportunity(
+                    o.symbol, o.buy_exchange, o.sell_exchange, now, now, o.spread_pct, o.spread_pct, opportunity=o
+                )
+                events.append(LifecycleEvent(OPENED, st, now))
+                continue
+            st.last_seen = now
+            st.cycles += 1
+            st.opportunity = o
+            if o.spread_pct != st.spread_pct:
+                st.spread_pct = o.spread_pct
+                if o.spread_pct > st.peak_spread:
+                    st.peak_spread = o.spread_pct
+                events.append(LifecycleEvent(UPDATED, st, now))
+        if len(seen) < len(self.open):
+            for key in [k for k in self.open if k not in seen]:
+                events.append(self._close(key, now))
+        return events
+
+    def close_all(self, now: float | None = None) -> List[LifecycleEvent]:
+        """Close every open route (end of a log or of a scan session)."""
+        now = time.time() if now is None else now
+        return [self._close(key, now) for key in list(self.open)]
+
+    def _close(self, key: RouteKey, now: float) -> LifecycleEvent:
+        event = LifecycleEvent(CLOSED, self.open.pop(key), now)
+        METRICS.opportunity_duration.observe(event.duration)
+        return event
+
+    def get(self, symbol: str, buy: str, sell: str) -> OpenOpportunity | None:
+        return self.open.get((symbol, buy, sell))
@@ -0,0 +1,197 @@
+"""Symbol registry kept current by periodic market-list refreshes.
+
+The scan universe used to be computed once from the markets loaded at
+startup, so listings and delistings were only seen after a restart.
+``MarketUniverse`` keeps the USDT spot symbols of every connected exchange
+and a per-symbol exchange count; ``set_exchange`` applies a fresh list as a
+diff and reports which symbols entered or left the shared set (listed on at
+least two exchanges), so callers can update the scheduler and evict caches
+without rebuilding everything.
+
+Each exchange is refreshed every ``refresh_interval`` seconds
+(``ARB_MARKETS_REFRESH_SEC``, 0 disables); see ``exchanges.refresh_markets``.
+Symbols that become shared through a refresh are new cross-exchange
+listings and are reported by ``new_listings`` for a while, so workers can
+poll them with priority.
+"""
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+from .metrics import METRICS
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+REFRESH_INTERVAL = _env_float("ARB_MARKETS_REFRESH_SEC", 600.0)
+# how long a new cross-exchange listing stays flagged for priority polling
+NEW_LISTING_TTL = _env_float("ARB_NEW_LISTING_SEC", 1800.0)
+
+
+@dataclass
+class MarketDiff:
+    exchange: str
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    shared_added: List[str] = field(default_factory=list)
+    shared_removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+class MarketUniverse:
+    def __init__(
+        self,
+        refresh_interval: float = REFRESH_INTERVAL,
+        new_listing_ttl: float = NEW_LISTING_TTL,
+    ) -> None:
+        self.refresh_interval = refresh_interval
+        self.new_listing_ttl = new_listing_ttl
+        self.by_exchange: Dict[str, Set[str]] = {}
+        self.counts: Dict[str, int] = {}
+        self._shared: Set[str] = set()
+        self.listed_at: Dict[str, float] = {}  # new cross-exchange listing -> wall time seen
+        self.next_refresh: Dict[str, float] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_exchange
+
+    @property
+    def exchanges(self) -> List[str]:
+        return list(self.by_exchange)
+
+    def _count(self, sym: str, delta: int, diff: MarketDiff) -> None:
+        n = self.counts.get(sym, 0) + delta
+        if n > 0:
+            self.counts[sym] = n
+        else:
+            self.counts.pop(sym, None)
+        if delta > 0 and n == 2:
+            self._shared.add(sym)
+            diff.shared_added.append(sym)
+        elif delta < 0 and n == 1:
+            self._shared.discard(sym)
+            diff.shared_removed.append(sym)
+
+    def set_exchange(self, name: str, symbols: Iterable[str], now: float | None = None) -> MarketDiff:
+        """Apply the current symbol list of ``name``; returns what changed.
+
+        The first list of an exchange is its initial load: symbols it makes
+        shared are not flagged as new listings.
+        """
+        fresh = set(symbols)
+        initial = name not in self.by_exchange
+        old = self.by_exchange.get(name, set())
+        diff = MarketDiff(name, sorted(fresh - old), sorted(old - fresh))
+        for sym in diff.added:
+            self._count(sym, 1, diff)
+        for sym in diff.removed:
+            self._count(sym, -1, diff)
+        self.by_exchange[name] = fresh
+        mono = time.monotonic()
+        if initial:
+            # spread the first refreshes so the exchanges do not all re-list at once
+            self.next_refresh[name] = mono + self.refresh_interval * (1.0 + 0.1 * len(self.next_refresh))
+        else:
+            if diff.added:
+                METRICS.market_changes.inc(len(diff.added), exchange=name, kind="listed")
+            if diff.removed:
+                METRICS.market_changes.inc(len(diff.removed), exchange=name, kind="delisted")
+            wall = time.time() if now is None else now
+            for sym in diff.shared_added:
+                self.listed_at[sym] = wall
+        for sym in diff.shared_removed:
+            self.listed_at.pop(sym, None)
+        METRICS.shared_symbols.set(len(self._shared))
+        return diff
+
+    def remove_exchange(self, name: str) -> MarketDiff:
+        old = self.by_exchange.pop(name, set())
+        self.next_refresh.pop(name, None)
+        diff = MarketDiff(name, [], sorted(old))
+        for sym in diff.removed:
+            self._count(sym, -1, diff)
+        for sym in diff.shared_removed:
+            self.listed_at.pop(sym, None)
+        METRICS.shared_symbols.set(len(self._shared))
+        return diff
+
+    def shared(self) -> List[str]:
+        """Symbols listed on at least two exchanges."""
+        return sorted(self._shared)
+
+    def union(self) -> List[str]:
+        return sorted(self.counts)
+
+    def per_counts(self) -> Dict[str, int]:
+        return {name: len(syms) for name, syms in self.by_exchange.items()}
+
+    def new_listings(self, now: float | None = None) -> List[str]:
+        """Cross-exchange listings seen within ``new_listing_ttl`` (expired ones are dropped)."""
+        now = time.time() if now is None else now
+        for sym in [s for s, t in self.listed_at.items() if now - t > self.new_listing_ttl]:
+            del self.listed_at[sym]
+        return sorted(self.listed_at)
+
+    def refresh_due(self, now: float | None = None) -> List[str]:
+        if self.refresh_interval <= 0:
+            return []
+        now = time.monotonic() if now is None else now
+        return [name for name, due in self.next_refresh.items() if due <= now]
+
+    def mark_refreshed(self, name: str, now: float | None = None) -> None:
+        if name in self.by_exchange:
+            now = time.monotonic() if now is None else now
+            self.next_refresh[name] = now + self.refresh_interval
+
+    def poll_refresh(
+        self,
+        exchanges: Dict[str, Any],
+        pending: Dict[str, Any],
+        start_refresh: Callable[[Any], Any],
+        finish: Callable[[Any, Any], Tuple[List[str], bool]] | None = None,
+    ) -> List[MarketDiff]:
+        """Collect finished market refreshes and start the due ones.
+
+        ``start_refresh(exchange)`` returns a future/task resolving to
+        ``(symbols, changed)`` (see ``exchanges.refresh_markets``), or to a raw
+        market list that ``finish(exchange, result)`` applies on the calling
+        thread. ``pending`` holds the running ones between calls. Returns the
+        diffs that changed something.
+        """
+        diffs: List[MarketDiff] = []
+        for name, fut in list(pending.items()):
+            if not fut.done():
+                continue
+            del pending[name]
+            self.mark_refreshed(name)
+            try:
+                result = fut.result()
+                symbols, changed = finish(exchanges[name], result) if finish and name in exchanges else result
+            except BaseException:
+                # a failed refresh keeps the known markets until the next attempt
+                continue
+            if changed and name in exchanges and name in self.by_exchange:
+                diff = self.set_exchange(name, symbols)
+                if diff:
+                    diffs.append(diff)
+        for name in self.refresh_due():
+            if name in exchanges and name not in pending:
+                pending[name] = start_refresh(exchanges[name])
+        return diffs
+
+    def summary(self) -> str:
+        new = self.new_listings()
+        if not new:
+            return ""
+        shown = ", ".join(new[:5]) + (f" +{len(new) - 5}" if len(new) > 5 else "")
+        return f"Новые листинги: {shown}"
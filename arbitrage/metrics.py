@@ -0,0 +1,271 @@
+"""Scanner health counters exposed over HTTP in Prometheus text format.
+
+Updates are a lock and a dict write, so they are safe from the asyncio worker,
+the sync worker and the Tk thread. The endpoint runs on its own daemon thread
+and only reads snapshots, so scraping never blocks the scan loop::
+
+    python -m arbitrage.cli --metrics-port 9108
+    python -m arbitrage.metrics --scrape http://127.0.0.1:9108/metrics
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, lock: threading.Lock) -> None:
+        self.name = name
+        self.help = help_text
+        self._lock = lock
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, lock: threading.Lock) -> None:
+        super().__init__(name, help_text, lock)
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = _key(labels)
+        with self._lock:
+            self.values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, lock: threading.Lock, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help_text, lock)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts incl. +Inf, sum, count)
+        self.values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts, total, n = entry
+            counts[idx] += 1
+            self.values[key] = (counts, total + value, n + 1)
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for key, (counts, total, n) in sorted(self.values.items()):
+            acc = 0
+            for bound, c in zip(list(self.buckets) + [float("inf")], counts):
+                acc += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, [('le', _fmt_value(bound))])} {acc}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        m = Counter(name, help_text, self._lock)
+        self._metrics.append(m)
+        return m
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        m = Gauge(name, help_text, self._lock)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(name, help_text, self._lock, buckets)
+        self._metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        out: List[str] = []
+        with self._lock:
+            for m in self._metrics:
+                out.append(f"# HELP {m.name} {m.help}")
+                out.append(f"# TYPE {m.name} {m.kind}")
+                out.extend(m.render())
+        return "\n".join(out) + "\n"
+
+
+class ScannerMetrics:
+    """The scanner's metric set; one shared instance lives in ``METRICS``."""
+
+    def __init__(self) -> None:
+        self.registry = Registry()
+        r = self.registry
+        self.fetch_latency = r.histogram("arb_fetch_duration_seconds", "Ticker fetch latency per exchange")
+        self.fetch_errors = r.counter("arb_fetch_errors_total", "Ticker fetches that raised or returned nothing")
+        self.fetch_fallbacks = r.counter("arb_fetch_fallbacks_total", "Bulk ticker strategy fallbacks per exchange")
+        self.symbols_fetched = r.gauge("arb_symbols_fetched", "Symbols returned by the last fetch per exchange")
+        self.opportunities = r.gauge("arb_opportunities", "Opportunities found in the last cycle")
+        self.opportunities_total = r.counter("arb_opportunities_total", "Opportunities found across all cycles")
+        self.cache_requests = r.counter("arb_cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+        self.cycle_duration = r.histogram("arb_cycle_duration_seconds", "Full scan cycle duration")
+        self.cycles = r.counter("arb_cycles_total", "Completed scan cycles")
+        self.last_cycle_ts = r.gauge("arb_last_cycle_timestamp_seconds", "Unix time of the last completed cycle")
+        self.quote_skew = r.histogram("arb_quote_skew_seconds", "Estimated skew between exchange quote instants in a synchronized cycle", (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+        self.breaker_state = r.gauge("arb_breaker_state", "Circuit breaker per exchange: 0 closed, 1 half-open, 2 open")
+        self.exchange_health = r.gauge("arb_exchange_health", "Rolling health score per exchange (0..1) from error rate and latency")
+        self.market_changes = r.counter("arb_market_changes_total", "USDT spot symbols listed/delisted per exchange, seen by market refresh")
+        self.shared_symbols = r.gauge("arb_shared_symbols", "Symbols listed on at least two connected exchanges")
+        self.opportunity_duration = r.histogram(
+            "arb_opportunity_duration_seconds",
+            "How long opportunities stayed open (first seen to first cycle gone)",
+            (1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+        )
+        self.consensus_rejections = r.counter("arb_consensus_rejections_total", "Quotes dropped by the cross-exchange price consensus check, per exchange")
+
+    def record_fetch(self, exchange: str, seconds: float, symbols: int, error: bool) -> None:
+        self.fetch_latency.observe(seconds, exchange=exchange)
+        self.symbols_fetched.set(symbols, exchange=exchange)
+        if error:
+            self.fetch_errors.inc(exchange=exchange)
+
+    def record_cycle(self, seconds: float, opportunities: int) -> None:
+        self.cycle_duration.observe(seconds)
+        self.cycles.inc()
+        self.opportunities.set(opportunities)
+        self.opportunities_total.inc(opportunities)
+        self.last_cycle_ts.set(time.time())
+
+    def cache_lookup(self, cache: str, hit: bool) -> None:
+        self.cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+METRICS = ScannerMetrics()
+
+
+class MetricsServer:
+    """Serves ``/metrics`` from a daemon thread."""
+
+    def __init__(self, metrics: ScannerMetrics = METRICS, host: str = "127.0.0.1", port: int = 9108) -> None:
+        registry = metrics.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def parse_text(text: str) -> Dict[str, float]:
+    """Minimal exposition parser: ``'name{labels}' -> value`` (comments skipped)."""
+    samples: Dict[str, float] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        try:
+            samples[name] = float(value.replace("+Inf", "inf"))
+        except ValueError:
+            continue
+    return samples
+
+
+def scrape(url: str, timeout: float = 5.0) -> Dict[str, float]:
+    """Scraper stand-in: fetch and parse an endpoint."""
+    import requests
+
+    r = requests.get(url, timeout=timeout)
+    r.raise_for_status()
+    return parse_text(r.text)
+
+
+def main(argv: List[str] | None = None) -> None:
+    p = argparse.ArgumentParser(description="Простой сборщик метрик сканера")
+    p.add_argument("--scrape", type=str, default="http://127.0.0.1:9108/metrics", help="URL эндпоинта метрик")
+    p.add_argument("--every", type=float, default=0.0, help="Повторять каждые N секунд (0 — один раз)")
+    args = p.parse_args(argv)
+    while True:
+        for name, value in sorted(scrape(args.scrape).items()):
+            print(f"{name} {value:g}")
+        if args.every <= 0:
+            return
+        print()
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
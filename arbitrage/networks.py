@@ -6,6 +6,7 @@ from typing import Dict, Optional, Tuple
 import ccxt.async_support as ccxt
 import ccxt as ccxt_sync
 from .exchanges import BybitDirectSync
+from .tracing import span
 
 
 @dataclass
@@ -95,7 +96,8 @@ async def _load_currencies(exchange: ccxt.Exchange) -> None:
     except Exception:
         pass
     try:
-        await exchange.fetch_currencies()
+        with span("fetch_currencies", "network", exchange=getattr(exchange, "id", "")):
+            await exchange.fetch_currencies()
     except Exception:
         pass
 
@@ -105,8 +107,9 @@ async def best_common_network(
     dst: ccxt.Exchange,
     currency_code: str,
 ) -> Optional[BestNetwork]:
-    await _load_currencies(src)
-    await _load_currencies(dst)
+    with span("best_common_network load", "network", currency=currency_code):
+        await _load_currencies(src)
+        await _load_currencies(dst)
 
     src_networks = _extract_currency_networks(src, currency_code)
     dst_networks = _extract_currency_networks(dst, currency_code)
@@ -154,14 +157,15 @@ def best_common_network_sync(
             dst.load_markets(reload=False)
         except Exception:
             pass
-        try:
-            src.fetch_currencies()
-        except Exception:
-            pass
-        try:
-            dst.fetch_currencies()
-        except Exception:
-            pass
+        with span("best_common_network load", "network", currency=currency_code):
+            try:
+                src.fetch_currencies()
+            except Exception:
+                pass
+            try:
+                dst.fetch_currencies()
+            except Exception:
+                pass
     except Exception:
         return None
 
@@ -244,3 +248,43 @@ def best_withdraw_network_sync(exchange, currency_code: str) -> Optional[BestNet
     if best_name is None:
         return None
     return BestNetwork(network=best_name, withdraw_fee=best_fee, currency=currency_code)
+
+
+# Transfer legs of one arbitrage route, as (network, withdraw fee) or None:
+# the base asset goes buy -> sell exchange, the USDT proceeds come back sell -> buy.
+TransferInfo = Tuple[Optional[Tuple[str, Optional[float]]], Optional[Tuple[str, Optional[float]]]]
+
+# a route whose lookup failed is looked up again after this many seconds;
+# until then its transfers count as unknown, not as "no common network"
+RETRY_SEC = 60.0
+
+
+class NetworksUnavailable(Exception):
+    """An exchange returned no network data for the asset (request failed or not supported)."""
+
+
+def _require_networks(buy, sell, currency_code: str) -> None:
+    # best_common_network returns None both for "nothing in common" and "nothing to compare"
+    if not _extract_currency_networks(buy, currency_code) or not _extract_currency_networks(sell, currency_code):
+        raise NetworksUnavailable(currency_code)
+
+
+def _leg(best: Optional[BestNetwork]) -> Optional[Tuple[str, Optional[float]]]:
+    return None if best is None else (best.network, best.withdraw_fee)
+
+
+async def transfer_networks(buy: ccxt.Exchange, sell: ccxt.Exchange, symbol: str) -> TransferInfo:
+    base, quote = symbol.split("/")
+    base_net = await best_common_network(buy, sell, base)
+    if base_net is None:
+        _require_networks(buy, sell, base)
+    quote_net = await best_common_network(sell, buy, quote)
+    return _leg(base_net), _leg(quote_net)
+
+
+def transfer_networks_sync(buy, sell, symbol: str) -> TransferInfo:
+    base, quote = symbol.split("/")
+    base_net = best_common_network_sync(buy, sell, base)
+    if base_net is None:
+        _require_networks(buy, sell, base)
+    return _leg(base_net), _leg(best_common_network_sync(sell, buy, quote))
@@ -0,0 +1,125 @@
+"""Long-lived exchange objects shared by successive scan runs.
+
+Creating an exchange loads its markets (seconds per venue), so the GUI keeps
+exchanges here across Stop/Start and settings changes instead of creating
+them in every worker run and closing them in its ``finally``. Exchanges that
+are switched off stay warm in the pool until the application closes.
+
+Async ccxt exchanges (and the shared aiohttp session, see transport.py) are
+bound to the event loop that created them, so the pool owns one loop that
+runs forever on a daemon thread. Async workers are submitted to it with
+``submit``; cancelling the returned future cancels the task right away.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from . import transport
+from .breaker import BREAKER
+from .exchanges import close_exchange, create_exchange_safe, create_exchange_sync_safe
+
+
+class ExchangePool:
+    def __init__(self) -> None:
+        self.async_exchanges: Dict[str, Any] = {}
+        self.sync_exchanges: Dict[str, Any] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # sync exchanges are created off the worker thread so a slow venue does not stall the scan
+        self._sync_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="pool-sync")
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="exchange-pool", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """Schedule ``coro`` on the pool loop; ``.cancel()`` on the result cancels the task."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: float | None = None) -> Any:
+        """Run ``coro`` on the pool loop and wait for it (from any other thread)."""
+        return self.submit(coro).result(timeout)
+
+    async def acquire_async(self, names: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """Exchanges for ``names`` (call on the pool loop) and the names that failed.
+
+        Pooled exchanges are reused; missing ones are created concurrently,
+        except those whose circuit breaker is still open.
+        """
+        names = list(names)
+        missing = [n for n in names if n not in self.async_exchanges]
+        attempt = [n for n in missing if BREAKER.allow(n) is not None]
+        failed = [n for n in missing if n not in attempt]
+        created = await asyncio.gather(*[create_exchange_safe(n) for n in attempt], return_exceptions=True)
+        for name, ex in zip(attempt, created):
+            ok = ex is not None and not isinstance(ex, BaseException)
+            BREAKER.record(name, ok)
+            if ok:
+                self.async_exchanges[name] = ex
+            else:
+                failed.append(name)
+        return {n: self.async_exchanges[n] for n in names if n in self.async_exchanges}, failed
+
+    def acquire_sync(self, names: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        names = list(names)
+        failed: List[str] = []
+        for name in names:
+            if name in self.sync_exchanges:
+                continue
+            if BREAKER.allow(name) is None:
+                failed.append(name)
+                continue
+            try:
+                ex = create_exchange_sync_safe(name)
+            except Exception:
+                ex = None
+            BREAKER.record(name, ex is not None)
+            if ex is None:
+                failed.append(name)
+            else:
+                self.sync_exchanges[name] = ex
+        return {n: self.sync_exchanges[n] for n in names if n in self.sync_exchanges}, failed
+
+    def acquire_sync_background(self, names: Iterable[str]) -> concurrent.futures.Future:
+        return self._sync_executor.submit(self.acquire_sync, list(names))
+
+    def submit_sync(self, fn: Callable[..., Any], *args: Any) -> concurrent.futures.Future:
+        """Run a blocking call (e.g. a market-list fetch) off the worker thread."""
+        return self._sync_executor.submit(fn, *args)
+
+    async def _close_async(self) -> None:
+        exchanges, self.async_exchanges = self.async_exchanges, {}
+        await asyncio.gather(*[close_exchange(ex) for ex in exchanges.values()], return_exceptions=True)
+        await transport.close_shared_session()
+
+    def _close_sync(self) -> None:
+        exchanges, self.sync_exchanges = self.sync_exchanges, {}
+        for ex in exchanges.values():
+            try:
+                close = getattr(ex, "close", None)
+                if callable(close):
+                    close()
+            except Exception:
+                pass
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Close every pooled exchange and stop the loop (application exit)."""
+        self._close_sync()
+        self._sync_executor.shutdown(wait=False)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            self.run(self._close_async(), timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,174 @@
+"""Endpoint latency probes: DNS, TCP connect, TLS handshake and time to first byte.
+
+Each sample opens a fresh connection with plain sockets so every phase is
+timed separately (``requests`` only reports the total). Endpoints are probed
+concurrently from a thread pool; samples for one host run back to back so
+they do not compete with each other.
+"""
+from __future__ import annotations
+
+import socket
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+@dataclass
+class ProbeSample:
+    dns_ms: float | None = None
+    tcp_ms: float | None = None
+    tls_ms: float | None = None
+    ttfb_ms: float | None = None
+    status: int | None = None
+    error: str | None = None
+
+
+def _pct(values: List[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+@dataclass
+class EndpointReport:
+    label: str
+    url: str
+    samples: List[ProbeSample] = field(default_factory=list)
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.url).hostname or ""
+
+    @property
+    def ok(self) -> int:
+        return sum(1 for s in self.samples if s.error is None and s.status is not None and s.status < 500)
+
+    def _median(self, attr: str) -> float | None:
+        return _pct([getattr(s, attr) for s in self.samples if getattr(s, attr) is not None], 0.5)
+
+    @property
+    def dns_ms(self) -> float | None:
+        return self._median("dns_ms")
+
+    @property
+    def tcp_ms(self) -> float | None:
+        return self._median("tcp_ms")
+
+    @property
+    def tls_ms(self) -> float | None:
+        return self._median("tls_ms")
+
+    @property
+    def ttfb_p50(self) -> float | None:
+        return _pct([s.ttfb_ms for s in self.samples if s.ttfb_ms is not None and s.error is None], 0.5)
+
+    @property
+    def ttfb_p95(self) -> float | None:
+        return _pct([s.ttfb_ms for s in self.samples if s.ttfb_ms is not None and s.error is None], 0.95)
+
+    @property
+    def status(self) -> int | None:
+        for s in reversed(self.samples):
+            if s.status is not None:
+                return s.status
+        return None
+
+    @property
+    def error(self) -> str | None:
+        errors = [s.error for s in self.samples if s.error]
+        return errors[-1] if errors and not self.ok else None
+
+    def summary(self) -> str:
+        if self.error:
+            return f"ошибка: {self.error}"
+
+        def f(v: float | None) -> str:
+            return "-" if v is None else f"{v:.0f}"
+
+        return (
+            f"DNS {f(self.dns_ms)} / TCP {f(self.tcp_ms)} / TLS {f(self.tls_ms)} мс, "
+            f"TTFB p50 {f(self.ttfb_p50)} p95 {f(self.ttfb_p95)} мс, HTTP {self.status} ({self.ok}/{len(self.samples)})"
+        )
+
+
+def probe_once(url: str, timeout: float = 5.0) -> ProbeSample:
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    sample = ProbeSample()
+    sock: Optional[socket.socket] = None
+    phase = "dns"
+    try:
+        t0 = time.perf_counter()
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        t1 = time.perf_counter()
+        sample.dns_ms = (t1 - t0) * 1e3
+        family, socktype, proto, _, addr = infos[0]
+        phase = "tcp"
+        sock = socket.socket(family, socktype, proto)
+        sock.settimeout(timeout)
+        sock.connect(addr)
+        t2 = time.perf_counter()
+        sample.tcp_ms = (t2 - t1) * 1e3
+        if https:
+            phase = "tls"
+            ctx = ssl.create_default_context()
+            sock = ctx.wrap_socket(sock, server_hostname=host)
+            t3 = time.perf_counter()
+            sample.tls_ms = (t3 - t2) * 1e3
+        else:
+            t3 = t2
+        phase = "http"
+        req = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: arbitrage-probe\r\nAccept: */*\r\nConnection: close\r\n\r\n"
+        sock.sendall(req.encode("ascii"))
+        first = sock.recv(64)
+        t4 = time.perf_counter()
+        sample.ttfb_ms = (t4 - t3) * 1e3
+        if not first:
+            sample.error = "empty response"
+        else:
+            try:
+                sample.status = int(first.split(b" ", 2)[1])
+            except Exception:
+                sample.error = "bad status line"
+    except Exception as e:
+        detail = (e.strerror if isinstance(e, OSError) else None) or str(e) or type(e).__name__
+        sample.error = f"{phase}: {detail}"
+    finally:
+        if sock is not None:
+            try:
+                sock.close()
+            except Exception:
+                pass
+    return sample
+
+
+def probe_endpoint(label: str, url: str, samples: int = 5, timeout: float = 5.0) -> EndpointReport:
+    report = EndpointReport(label, url)
+    for i in range(max(1, samples)):
+        s = probe_once(url, timeout)
+        report.samples.append(s)
+        # an unreachable host will not get better within one run
+        if i == 0 and s.dns_ms is None:
+            break
+    return report
+
+
+def probe_endpoints(
+    endpoints: List[Tuple[str, str]],
+    samples: int = 5,
+    timeout: float = 5.0,
+    max_workers: int = 16,
+) -> Dict[str, EndpointReport]:
+    """Probe ``(label, url)`` pairs concurrently; result keeps the input order."""
+    if not endpoints:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(endpoints)), thread_name_prefix="probe") as pool:
+        futures = [(label, pool.submit(probe_endpoint, label, url, samples, timeout)) for label, url in endpoints]
+        return {label: fut.result() for label, fut in futures}
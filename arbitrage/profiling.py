@@ -0,0 +1,221 @@
+"""Profiling of a live session over a fixed number of scan cycles.
+
+``CycleProfiler`` is started from the thread that runs the scan loop (the CLI
+event loop or ``ArbitrageGUI._worker_main``) and only observes that thread, so
+the Tk main loop does not show up in the hot spots:
+
+* ``cprofile`` — deterministic, ``cProfile`` hooks are per-thread. Exact call
+  counts; with asyncio the cumulative time of coroutines includes awaits.
+* ``sample`` — a daemon thread reads the target thread's stack from
+  ``sys._current_frames()`` every few milliseconds. Low overhead, self/total
+  sample counts per function.
+
+Allocation totals come from ``tracemalloc`` (process-wide; the worker thread
+dominates while a scan is running). The report is a plain text file in the
+output directory, plus a ``.prof`` dump in ``cprofile`` mode for snakeviz and
+friends.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import List, Optional, Tuple
+
+MODES = ("cprofile", "sample")
+
+FuncKey = Tuple[str, int, str]
+
+
+def _func_label(key: FuncKey) -> str:
+    filename, lineno, name = key
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+class _StackSampler:
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                if leaf:
+                    self.self_counts[key] += 1
+                    leaf = False
+                if key not in seen:
+                    seen.add(key)
+                    self.total_counts[key] += 1
+                frame = frame.f_back
+            del frame
+
+    def report(self, top: int) -> List[str]:
+        n = max(1, self.samples)
+        lines = [f"Samples: {self.samples} (every {self.interval * 1e3:.1f} ms)", "", "By self samples:"]
+        for key, c in self.self_counts.most_common(top):
+            lines.append(f"  {c:8d} {100.0 * c / n:6.1f}%  {_func_label(key)}")
+        lines += ["", "By total samples (function on stack):"]
+        for key, c in self.total_counts.most_common(top):
+            lines.append(f"  {c:8d} {100.0 * c / n:6.1f}%  {_func_label(key)}")
+        return lines
+
+
+class CycleProfiler:
+    """Profiles the calling thread for ``cycles`` scan cycles.
+
+    Call ``start()`` from the scan thread, ``cycle_done()`` after each cycle
+    (returns the report path once the last cycle has been profiled) and
+    ``stop()`` on early exit to write a partial report.
+    """
+
+    def __init__(
+        self,
+        cycles: int,
+        out_dir: str = "profiles",
+        mode: str = "cprofile",
+        top: int = 30,
+        sample_interval: float = 0.005,
+        trace_frames: int = 1,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"unknown profile mode: {mode}")
+        self.cycles = max(1, int(cycles))
+        self.out_dir = os.path.abspath(out_dir)
+        self.mode = mode
+        self.top = top
+        self.sample_interval = sample_interval
+        self.trace_frames = trace_frames
+        self.done = 0
+        self.report_path: Optional[str] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._own_tracemalloc = False
+        self._snapshot0: Optional[tracemalloc.Snapshot] = None
+        self._t0 = 0.0
+        self._thread_name = ""
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> "CycleProfiler":
+        self._thread_name = threading.current_thread().name
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._own_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._snapshot0 = self._filtered_snapshot()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+        self._t0 = time.perf_counter()
+        self._running = True
+        return self
+
+    def cycle_done(self) -> Optional[str]:
+        if not self._running:
+            return None
+        self.done += 1
+        if self.done >= self.cycles:
+            return self.stop()
+        return None
+
+    def stop(self) -> Optional[str]:
+        if not self._running:
+            return self.report_path
+        self._running = False
+        elapsed = time.perf_counter() - self._t0
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        snapshot = self._filtered_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+        self.report_path = self._write_report(elapsed, snapshot, peak)
+        return self.report_path
+
+    def _write_report(self, elapsed: float, snapshot: tracemalloc.Snapshot, peak: int) -> str:
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}_{self.mode}")
+        lines = [
+            f"Mode: {self.mode}  thread: {self._thread_name}",
+            f"Cycles: {self.done}  wall time: {elapsed:.2f} s",
+            "",
+        ]
+        if self._profile is not None:
+            buf = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=buf)
+            stats.sort_stats("tottime").print_stats(self.top)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            lines.append(buf.getvalue())
+            self._profile.dump_stats(base + ".prof")
+        if self._sampler is not None:
+            lines += self._sampler.report(self.top)
+            lines.append("")
+        lines += self._allocation_report(snapshot, peak)
+        path = base + ".txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    @staticmethod
+    def _filtered_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def _allocation_report(self, snapshot: tracemalloc.Snapshot, peak: int) -> List[str]:
+        # tracemalloc only sees live blocks: report what is held at the end
+        # and what grew since start; the peak covers transient per-cycle data
+        stats = snapshot.statistics("lineno")
+        total = sum(s.size for s in stats)
+        count = sum(s.count for s in stats)
+        lines = [
+            f"Allocated at end: {total / 1024:.1f} KiB in {count} blocks; peak traced during run: {peak / 1024:.1f} KiB",
+            "",
+            "Top allocation sites (size at end, change since start):",
+        ]
+        diff = snapshot.compare_to(self._snapshot0, "lineno") if self._snapshot0 is not None else []
+        diff.sort(key=lambda d: d.size, reverse=True)
+        for d in diff[: self.top]:
+            frame = d.traceback[0]
+            lines.append(
+                f"  {d.size / 1024:10.1f} KiB {d.size_diff / 1024:+10.1f} KiB {d.count:8d} blocks  {frame.filename}:{frame.lineno}"
+            )
+        return lines
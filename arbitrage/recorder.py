@@ -0,0 +1,331 @@
+"""Compact columnar tick log for scan cycles.
+
+Each cycle's normalized ``tickers_by_exchange`` is appended as one record of
+fixed-width arrays (symbol ids, float64 bid/ask, float32 quoteVolume) keyed by
+a symbol dictionary. Segments rotate by size and every segment is
+self-contained, so it can be memory-mapped and read on its own.
+
+Layout (little-endian, every record 8-byte aligned)::
+
+    file    := MAGIC record*
+    record  := kind:u8 pad:u8[3] length:u32 payload pad-to-8
+    DICT    := kind 'S' (symbols) or 'X' (exchanges); first_id:u32 count:u32 (len:u16 utf8)*
+    CYCLE   := kind 'C'; ts:f64 n_ex:u32 pad:u32 block*
+    block   := ex_id:u32 n:u32 ids:u32[n] pad bid:f64[n] ask:f64[n] qv:f32[n] pad
+
+Missing values are stored as NaN.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"ARBTICK1"
+KIND_SYMBOLS = ord("S")
+KIND_EXCHANGES = ord("X")
+KIND_CYCLE = ord("C")
+
+_REC_HEADER = struct.Struct("<B3xI")
+_DICT_HEADER = struct.Struct("<II")
+_CYCLE_HEADER = struct.Struct("<dI4x")
+_BLOCK_HEADER = struct.Struct("<II")
+_NAN = float("nan")
+
+
+def _pad8(n: int) -> int:
+    return (-n) % 8
+
+
+def _as_float(v) -> float:
+    if v is None:
+        return _NAN
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+class _Dictionary:
+    """Append-only string -> id mapping with a list of not-yet-written entries."""
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.pending: List[str] = []
+
+    def get(self, key: str) -> int:
+        idx = self.ids.get(key)
+        if idx is None:
+            idx = len(self.ids)
+            self.ids[key] = idx
+            self.pending.append(key)
+        return idx
+
+    def reset_pending(self) -> None:
+        # A fresh segment must carry the whole dictionary again
+        self.pending = list(self.ids.keys())
+
+
+def _encode_dict(kind: int, first_id: int, names: List[str]) -> bytes:
+    parts = [_DICT_HEADER.pack(first_id, len(names))]
+    for name in names:
+        raw = name.encode("utf-8")
+        parts.append(struct.pack("<H", len(raw)))
+        parts.append(raw)
+    return _frame(kind, b"".join(parts))
+
+
+def _frame(kind: int, payload: bytes) -> bytes:
+    return _REC_HEADER.pack(kind, len(payload)) + payload + b"\0" * _pad8(len(payload))
+
+
+class TickRecorder:
+    """Background writer of ``tickers_by_exchange`` snapshots.
+
+    ``record`` enqueues a shallow copy of the snapshot: the scan loops keep one
+    ``tickers_by_exchange`` and update it in place (exchanges that are not due
+    keep their last quotes, delisted symbols are popped), while the quote dicts
+    themselves are replaced, never mutated. So the scan loop pays the copy and a
+    queue put; encoding and disk I/O happen on a daemon thread.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, prefix: str = "ticks", max_pending: int = 256) -> None:
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max(4096, int(max_bytes))
+        self.prefix = prefix
+        self.dropped = 0
+        self.cycles_written = 0
+        self._symbols = _Dictionary()
+        self._exchanges = _Dictionary()
+        self._file = None
+        self._file_size = 0
+        self._seq = 0
+        self.current_path: Optional[str] = None
+        self._queue: "queue.Queue[Optional[Tuple[float, Dict[str, Dict[str, dict]]]]]" = queue.Queue(maxsize=max_pending)
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="tick-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, tickers_by_exchange: Dict[str, Dict[str, dict]], ts: float | None = None) -> None:
+        try:
+            snapshot = {name: dict(quotes) for name, quotes in tickers_by_exchange.items()}
+            self._queue.put_nowait((time.time() if ts is None else ts, snapshot))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write_cycle(*item)
+            except Exception:
+                # Recording must never take the scanner down
+                continue
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def _open_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._seq += 1
+        name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{self._seq:04d}.bin"
+        self.current_path = os.path.join(self.directory, name)
+        self._file = open(self.current_path, "wb")
+        self._file.write(MAGIC)
+        self._file_size = len(MAGIC)
+        self._symbols.reset_pending()
+        self._exchanges.reset_pending()
+
+    def _write_cycle(self, ts: float, tickers_by_exchange: Dict[str, Dict[str, dict]]) -> None:
+        if self._file is None or self._file_size >= self.max_bytes:
+            self._open_segment()
+        blocks: List[bytes] = []
+        for ex_name, tickers in tickers_by_exchange.items():
+            ex_id = self._exchanges.get(ex_name)
+            ids = array("I")
+            bids = array("d")
+            asks = array("d")
+            qvs = array("f")
+            for sym, t in tickers.items():
+                if not isinstance(t, dict):
+                    continue
+                ids.append(self._symbols.get(sym))
+                bids.append(_as_float(t.get("bid")))
+                asks.append(_as_float(t.get("ask")))
+                qvs.append(_as_float(t.get("quoteVolume")))
+            n = len(ids)
+            blocks.append(_BLOCK_HEADER.pack(ex_id, n))
+            blocks.append(ids.tobytes())
+            blocks.append(b"\0" * _pad8(8 + 4 * n))
+            blocks.append(bids.tobytes())
+            blocks.append(asks.tobytes())
+            blocks.append(qvs.tobytes())
+            blocks.append(b"\0" * _pad8(4 * n))
+        out: List[bytes] = []
+        if self._exchanges.pending:
+            first = len(self._exchanges.ids) - len(self._exchanges.pending)
+            out.append(_encode_dict(KIND_EXCHANGES, first, self._exchanges.pending))
+            self._exchanges.pending = []
+        if self._symbols.pending:
+            first = len(self._symbols.ids) - len(self._symbols.pending)
+            out.append(_encode_dict(KIND_SYMBOLS, first, self._symbols.pending))
+            self._symbols.pending = []
+        out.append(_frame(KIND_CYCLE, _CYCLE_HEADER.pack(ts, len(tickers_by_exchange)) + b"".join(blocks)))
+        data = b"".join(out)
+        self._file.write(data)
+        self._file.flush()
+        self._file_size += len(data)
+        self.cycles_written += 1
+
+
+class CycleView:
+    """Zero-copy view of one recorded cycle inside a memory-mapped segment."""
+
+    __slots__ = ("ts", "blocks", "_reader")
+
+    def __init__(self, ts: float, blocks: List[Tuple[int, memoryview, memoryview, memoryview, memoryview]], reader: "TickLogReader") -> None:
+        self.ts = ts
+        self.blocks = blocks
+        self._reader = reader
+
+    def to_tickers(self) -> Dict[str, Dict[str, dict]]:
+        """Rebuild the ``tickers_by_exchange`` shape the scanner consumes."""
+        symbols = self._reader.symbols
+        exchanges = self._reader.exchanges
+        result: Dict[str, Dict[str, dict]] = {}
+        for ex_id, ids, bids, asks, qvs in self.blocks:
+            tickers: Dict[str, dict] = {}
+            for sid, bid, ask, qv in zip(ids, bids, asks, qvs):
+                tickers[symbols[sid]] = {
+                    "bid": None if bid != bid else bid,
+                    "ask": None if ask != ask else ask,
+                    "quoteVolume": None if qv != qv else qv,
+                }
+            result[exchanges[ex_id]] = tickers
+        return result
+
+
+class TickLogReader:
+    """Sequential reader over one segment, backed by ``mmap``."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.symbols: List[str] = []
+        self.exchanges: List[str] = []
+        self._fh = open(path, "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        if size < len(MAGIC):
+            self._fh.close()
+            raise ValueError(f"not a tick log: {path}")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"not a tick log: {path}")
+        self._view = memoryview(self._mm)
+
+    def close(self) -> None:
+        view = getattr(self, "_view", None)
+        if view is not None:
+            view.release()
+            self._view = None
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        self._fh.close()
+
+    def __enter__(self) -> "TickLogReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_dict(self, off: int, target: List[str]) -> None:
+        first, count = _DICT_HEADER.unpack_from(self._mm, off)
+        off += _DICT_HEADER.size
+        del target[first:]
+        for _ in range(count):
+            (n,) = struct.unpack_from("<H", self._mm, off)
+            off += 2
+            target.append(bytes(self._mm[off: off + n]).decode("utf-8"))
+            off += n
+
+    def cycles(self) -> Iterator[CycleView]:
+        """Yield cycles in file order; a torn trailing record is ignored.
+
+        Array views inside a yielded cycle are valid until the next iteration.
+        """
+        mm = self._mm
+        view = self._view
+        end = len(mm)
+        off = len(MAGIC)
+        while off + _REC_HEADER.size <= end:
+            kind, length = _REC_HEADER.unpack_from(mm, off)
+            body = off + _REC_HEADER.size
+            nxt = body + length + _pad8(length)
+            if body + length > end:
+                break
+            if kind == KIND_SYMBOLS:
+                self._read_dict(body, self.symbols)
+            elif kind == KIND_EXCHANGES:
+                self._read_dict(body, self.exchanges)
+            elif kind == KIND_CYCLE:
+                ts, n_ex = _CYCLE_HEADER.unpack_from(mm, body)
+                pos = body + _CYCLE_HEADER.size
+                blocks = []
+                for _ in range(n_ex):
+                    ex_id, n = _BLOCK_HEADER.unpack_from(mm, pos)
+                    pos += _BLOCK_HEADER.size
+                    ids = view[pos: pos + 4 * n].cast("I")
+                    pos += 4 * n + _pad8(8 + 4 * n)
+                    bids = view[pos: pos + 8 * n].cast("d")
+                    pos += 8 * n
+                    asks = view[pos: pos + 8 * n].cast("d")
+                    pos += 8 * n
+                    qvs = view[pos: pos + 4 * n].cast("f")
+                    pos += 4 * n + _pad8(4 * n)
+                    blocks.append((ex_id, ids, bids, asks, qvs))
+                try:
+                    yield CycleView(ts, blocks, self)
+                finally:
+                    # Views are only valid until the next cycle; release them so the mmap can close
+                    for _, ids, bids, asks, qvs in blocks:
+                        ids.release()
+                        bids.release()
+                        asks.release()
+                        qvs.release()
+            off = nxt
+
+
+def list_segments(path: str) -> List[str]:
+    """Return segment files for a log path: a single file or a recorder directory."""
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.endswith(".bin"))
+        return [os.path.join(path, n) for n in names]
+    return [path]
+
+
+def iter_snapshots(path: str) -> Iterator[Tuple[float, Dict[str, Dict[str, dict]]]]:
+    """Yield ``(ts, tickers_by_exchange)`` for every cycle across all segments."""
+    for seg in list_segments(path):
+        with TickLogReader(seg) as reader:
+            for cyc in reader.cycles():
+                yield cyc.ts, cyc.to_tickers()
@@ -0,0 +1,94 @@
+"""Offline replay of recorded tick logs through the scanner pipeline."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from .recorder import iter_snapshots
+from .consensus import PriceConsensus
+from .lifecycle import CLOSED, LifecycleTracker
+from .scanner import compute_opportunities
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+@dataclass
+class PairStats:
+    buy_exchange: str
+    sell_exchange: str
+    count: int = 0
+    durations: List[float] = field(default_factory=list)
+    spreads: List[float] = field(default_factory=list)
+
+    def duration_quantiles(self) -> Tuple[float, float, float]:
+        d = sorted(self.durations)
+        return _quantile(d, 0.5), _quantile(d, 0.9), (d[-1] if d else 0.0)
+
+    def spread_quantiles(self) -> Tuple[float, float, float]:
+        s = sorted(self.spreads)
+        return _quantile(s, 0.5), _quantile(s, 0.9), (s[-1] if s else 0.0)
+
+
+@dataclass
+class ReplayResult:
+    cycles: int = 0
+    first_ts: float | None = None
+    last_ts: float | None = None
+    pairs: Dict[Tuple[str, str], PairStats] = field(default_factory=dict)
+
+    @property
+    def total_opportunities(self) -> int:
+        return sum(p.count for p in self.pairs.values())
+
+
+def replay(path: str, min_spread_pct: float = 0.0, min_quote_volume_usd: float = 50000.0) -> ReplayResult:
+    """Feed every recorded snapshot through ``compute_opportunities`` without pausing.
+
+    An opportunity is one continuous run of cycles where (symbol, buy, sell)
+    passes the filters; its duration spans from the first cycle it appeared in
+    to the first cycle it was gone (or the end of the log).
+    """
+    result = ReplayResult()
+    # rolling prices of this log only
+    consensus = PriceConsensus()
+    tracker = LifecycleTracker()
+
+    def _pair(buy: str, sell: str) -> PairStats:
+        st = result.pairs.get((buy, sell))
+        if st is None:
+            st = PairStats(buy_exchange=buy, sell_exchange=sell)
+            result.pairs[(buy, sell)] = st
+        return st
+
+    def _closed(events) -> None:
+        for ev in events:
+            if ev.kind == CLOSED:
+                st = _pair(ev.route.buy_exchange, ev.route.sell_exchange)
+                st.count += 1
+                st.durations.append(ev.duration)
+
+    for ts, tickers_by_exchange in iter_snapshots(path):
+        if result.first_ts is None:
+            result.first_ts = ts
+        result.last_ts = ts
+        result.cycles += 1
+        symbols = sorted(set().union(*[t.keys() for t in tickers_by_exchange.values()])) if tickers_by_exchange else []
+        opps = compute_opportunities(
+            symbols,
+            tickers_by_exchange,
+            min_spread_pct,
+            min_quote_volume_usd=min_quote_volume_usd,
+            consensus=consensus,
+        )
+        for o in opps:
+            _pair(o.buy_exchange, o.sell_exchange).spreads.append(o.spread_pct)
+        _closed(tracker.update(opps, now=ts))
+
+    if result.last_ts is not None:
+        _closed(tracker.close_all(result.last_ts))
+    return result
@@ -1,110 +1,362 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Sequence, Set, Tuple
 
-from .fees import get_taker_fee
+from .consensus import PriceConsensus
+from .fees import FeeMatrix
+from .spreadstats import SpreadStats
+
+# backstop behind the consensus check: it cannot judge every symbol (a loose
+# ARB_CONSENSUS_MAX_DEV, a rolling price learned from the wrong token), and a
+# spread this large is a broken quote whatever the reason
+MAX_SPREAD_PCT = 300.0
 
 
 @dataclass
-class Quote:
-    symbol: str
-    bid: float | None
-    ask: float | None
-    quote_volume: float | None
+class NetPnL:
+    """Transfer costs and net profit of one opportunity (see apply_net_pnl)."""
 
+    base_network: str | None = None
+    base_withdraw_fee: float | None = None  # base units, buy -> sell exchange
+    quote_withdraw_fee: float | None = None  # USDT, sell -> buy exchange
+    transfer_cost: float = 0.0  # known transfer fees in USDT
+    transfers_known: bool = False
+    transferable: bool = True  # False: the exchanges share no network for the base asset
+    pnl: Tuple[float, ...] = ()  # net USDT per deal size of the ladder
 
-@dataclass
+
+# slots: show-all mode builds one per symbol every cycle
+@dataclass(slots=True)
 class Opportunity:
     symbol: str
     buy_exchange: str
     sell_exchange: str
     buy_price: float
     sell_price: float
-    spread_pct: float  # percentage
+    spread_pct: float  # percentage, after taker fees
+    sell_fee: float = 0.0
+    net: NetPnL | None = None
+    z: float | None = None  # spread z-score against the route's history (spreadstats)
 
+    def pnl_at(self, size: float, include_transfers: bool = True) -> float:
+        """Net USDT for a deal of ``size`` USDT (taker fees, and transfers if asked)."""
+        gross = size * self.spread_pct / 100.0
+        if include_transfers and self.net is not None:
+            return gross - self.net.transfer_cost
+        return gross
 
-def _best_bid_ask(quotes_by_exchange: Dict[str, Quote]) -> Tuple[str | None, float | None, str | None, float | None]:
-    best_bid_ex: str | None = None
-    best_bid: float | None = None
-    best_ask_ex: str | None = None
-    best_ask: float | None = None
+    @property
+    def best_pnl(self) -> float:
+        return max(self.net.pnl) if self.net is not None and self.net.pnl else 0.0
 
-    for ex, q in quotes_by_exchange.items():
-        if q.bid is not None and (best_bid is None or q.bid > best_bid):
-            best_bid = q.bid
-            best_bid_ex = ex
-        if q.ask is not None and (best_ask is None or q.ask < best_ask):
-            best_ask = q.ask
-            best_ask_ex = ex
-    return best_bid_ex, best_bid, best_ask_ex, best_ask
 
+def route_key(buy_exchange: str, sell_exchange: str, symbol: str) -> str:
+    """Key of one route in the transfer-network caches."""
+    return f"{buy_exchange}->{sell_exchange}:{symbol}"
 
-def compute_opportunities(
-    symbols: List[str],
+
+@dataclass
+class ScanResult:
+    """Everything one pass over the quote board yields (see scan_quotes)."""
+
+    opportunities: List[Opportunity] = field(default_factory=list)  # past all filters, best first
+    candidates: List[Opportunity] = field(default_factory=list)  # best spreads regardless of the threshold
+    pinned: List[Opportunity] = field(default_factory=list)  # pinned symbols not among the opportunities
+    rejected: List[str] = field(default_factory=list)  # symbols with quotes off the price consensus
+
+
+def _mids(books: List[Tuple[str, Dict[str, dict]]], symbol: str) -> Dict[str, float]:
+    """Mid price of ``symbol`` on every exchange quoting it (one side if the other is missing)."""
+    mids: Dict[str, float] = {}
+    for ex, tickers in books:
+        t = tickers.get(symbol)
+        if t is None:
+            continue
+        b = t.get("bid")
+        a = t.get("ask")
+        if b is not None and a is not None:
+            mids[ex] = (float(b) + float(a)) / 2.0
+        elif b is not None or a is not None:
+            mids[ex] = float(b if b is not None else a)
+    return mids
+
+
+def _best_quotes(
+    books: List[Tuple[str, Dict[str, dict]]],
+    symbol: str,
+    skip: Set[str],
+    min_qv: float,
+) -> Tuple[str | None, float, str | None, float]:
+    """(sell exchange, best bid, buy exchange, best ask) without the ``skip`` exchanges."""
+    sell_ex = buy_ex = None
+    bid = ask = 0.0
+    for ex, tickers in books:
+        t = tickers.get(symbol)
+        if t is None or ex in skip:
+            continue
+        if min_qv > 0.0:
+            try:
+                if t.get("quoteVolume") is None or float(t.get("quoteVolume")) < min_qv:
+                    continue
+            except (TypeError, ValueError):
+                continue
+        b = t.get("bid")
+        a = t.get("ask")
+        if b is not None and (sell_ex is None or float(b) > bid):
+            bid, sell_ex = float(b), ex
+        if a is not None and (buy_ex is None or float(a) < ask):
+            ask, buy_ex = float(a), ex
+    return sell_ex, bid, buy_ex, ask
+
+
+def scan_quotes(
+    symbols: Sequence[str],
     tickers_by_exchange: Dict[str, Dict[str, dict]],
     min_spread_pct: float = 0.0,
     min_quote_volume_usd: float = 50000.0,
-) -> List[Opportunity]:
-    opps: List[Opportunity] = []
+    fees: FeeMatrix | None = None,
+    pinned: Iterable[str] = (),
+    candidate_limit: int = 0,
+    consensus: PriceConsensus | None = None,
+    stats: SpreadStats | None = None,
+) -> ScanResult:
+    """Find the best ask and bid of every symbol once and derive all results from them.
 
-    for symbol in symbols:
-        quotes_by_exchange: Dict[str, Quote] = {}
-        for ex, tickers in tickers_by_exchange.items():
-            t = tickers.get(symbol)
-            bid = float(t.get("bid")) if t and t.get("bid") is not None else None
-            ask = float(t.get("ask")) if t and t.get("ask") is not None else None
-            qv = None
-            if t is not None:
-                if t.get("quoteVolume") is not None:
-                    try:
-                        qv = float(t.get("quoteVolume"))
-                    except Exception:
-                        qv = None
-            quotes_by_exchange[ex] = Quote(symbol=symbol, bid=bid, ask=ask, quote_volume=qv)
-
-        # Enforce per-exchange minimum 24h quote volume BEFORE choosing best bid/ask
-        if min_quote_volume_usd > 0.0:
-            for q in quotes_by_exchange.values():
-                if q.quote_volume is None or q.quote_volume < min_quote_volume_usd:
-                    q.bid = None
-                    q.ask = None
-
-        sell_ex, bid, buy_ex, ask = _best_bid_ask(quotes_by_exchange)
-        if bid is None or ask is None or sell_ex is None or buy_ex is None:
-            continue
-        if sell_ex == buy_ex:
-            continue
+    - ``opportunities``: positive spreads after taker fees that reach
+      ``min_spread_pct``, on exchanges with at least ``min_quote_volume_usd``
+      of 24h volume;
+    - ``candidates``: the ``candidate_limit`` best routes under the same
+      volume filter whatever their spread (shown when nothing passes);
+    - ``pinned``: the best route of each pinned symbol that is not an
+      opportunity, ignoring volume, so a watched pair is always visible.
+      Pinned symbols missing from ``symbols`` are scanned too.
+
+    Candidate and pinned spreads are clipped at zero. Symbols whose best bid
+    and ask are far apart are checked against ``consensus`` first (see
+    consensus.py); quotes off the consensus price are left out and the
+    symbol is listed in ``rejected``. ``consensus`` also keeps the rolling
+    price of every symbol; without one, only the current quotes are used.
+    Routes at or above ``MAX_SPREAD_PCT`` that get past it are dropped.
 
-        buy_fee = get_taker_fee(buy_ex)
-        sell_fee = get_taker_fee(sell_ex)
+    With ``stats``, the spread of every symbol's best route is fed to it and
+    results carry the route's z-score in ``z``.
+    """
+    if fees is None:
+        # no markets at hand (replay, benchmarks): exchange-wide fees
+        fees = FeeMatrix(())
+    fee_rows = {ex: fees.row(ex) for ex in tickers_by_exchange}
+    fee_column = fees.column
+    fee_default = fees.defaults
+    books = list(tickers_by_exchange.items())
+    min_qv = min_quote_volume_usd
+    checker = consensus if consensus is not None else PriceConsensus()
+    limit = checker.limit
+    history = consensus.reference if consensus is not None else None
+    alpha = checker.alpha
+    observe = None
+    if stats is not None:
+        stats.begin()
+        observe = stats.observe
+    pinned_set = set(pinned)
+    scan: Iterable[str] = symbols
+    if pinned_set:
+        missing = pinned_set.difference(symbols)
+        if missing:
+            scan = [*symbols, *sorted(missing)]
 
+    result = ScanResult()
+    opps = result.opportunities
+    heap: List[Tuple[float, int, Opportunity]] = []  # min-heap of the best candidates
+    seq = 0
+
+    def route(symbol: str, buy_ex: str, ask: float, sell_ex: str, bid: float) -> Tuple[float | None, float]:
+        col = fee_column.get(symbol)
+        if col is None:
+            buy_fee = fee_default[buy_ex]
+            sell_fee = fee_default[sell_ex]
+        else:
+            buy_fee = fee_rows[buy_ex][col]
+            sell_fee = fee_rows[sell_ex][col]
         effective_buy = ask * (1.0 + buy_fee)
         effective_sell = bid * (1.0 - sell_fee)
-
         if effective_sell <= 0 or effective_buy <= 0:
-            continue
+            return None, sell_fee
+        return (effective_sell - effective_buy) / effective_buy * 100.0, sell_fee
 
-        raw_spread_pct = (effective_sell - effective_buy) / effective_buy * 100.0
+    for symbol in scan:
+        is_pinned = symbol in pinned_set
+        sell_ex = buy_ex = None
+        bid = ask = 0.0
+        any_sell_ex = any_buy_ex = None
+        any_bid = any_ask = 0.0
+        for ex, tickers in books:
+            t = tickers.get(symbol)
+            if t is None:
+                continue
+            b = t.get("bid")
+            a = t.get("ask")
+            if b is None and a is None:
+                continue
+            b = float(b) if b is not None else None
+            a = float(a) if a is not None else None
+            if is_pinned:
+                if b is not None and (any_sell_ex is None or b > any_bid):
+                    any_bid, any_sell_ex = b, ex
+                if a is not None and (any_buy_ex is None or a < any_ask):
+                    any_ask, any_buy_ex = a, ex
+            # per-exchange minimum 24h quote volume, before choosing best bid/ask
+            if min_qv > 0.0:
+                qv = t.get("quoteVolume")
+                try:
+                    if qv is None or float(qv) < min_qv:
+                        continue
+                except (TypeError, ValueError):
+                    continue
+            if b is not None and (sell_ex is None or b > bid):
+                bid, sell_ex = b, ex
+            if a is not None and (buy_ex is None or a < ask):
+                ask, buy_ex = a, ex
 
-        if raw_spread_pct <= 0:
-            continue
-        # Skip unrealistic spikes
-        if raw_spread_pct >= 300.0:
-            continue
-        display_spread = raw_spread_pct
-
-        if display_spread >= min_spread_pct:
-            opps.append(
-                Opportunity(
-                    symbol=symbol,
-                    buy_exchange=buy_ex,
-                    sell_exchange=sell_ex,
-                    buy_price=ask,
-                    sell_price=bid,
-                    spread_pct=display_spread,
-                )
-            )
+        if (sell_ex is not None and buy_ex is not None and bid > ask * limit) or (
+            is_pinned and any_sell_ex is not None and any_buy_ex is not None and any_bid > any_ask * limit
+        ):
+            # quotes too far apart to be the same token everywhere
+            bad = checker.check(symbol, _mids(books, symbol))
+            if bad is None:
+                result.rejected.append(symbol)
+                continue
+            if bad:
+                result.rejected.append(symbol)
+                sell_ex, bid, buy_ex, ask = _best_quotes(books, symbol, bad, min_qv)
+                if is_pinned:
+                    any_sell_ex, any_bid, any_buy_ex, any_ask = _best_quotes(books, symbol, bad, 0.0)
+        elif history is not None and sell_ex is not None and buy_ex is not None:
+            mid = (bid + ask) * 0.5
+            ref = history.get(symbol)
+            history[symbol] = mid if ref is None else ref + alpha * (mid - ref)
 
+        opp = None
+        found = False
+        if sell_ex is not None and buy_ex is not None and sell_ex != buy_ex:
+            spread, sell_fee = route(symbol, buy_ex, ask, sell_ex, bid)
+            if spread is not None and spread < MAX_SPREAD_PCT:
+                z = observe(symbol, buy_ex, sell_ex, spread) if observe is not None else None
+                if 0 < spread and spread >= min_spread_pct:
+                    opp = Opportunity(symbol, buy_ex, sell_ex, ask, bid, spread, sell_fee=sell_fee, z=z)
+                    opps.append(opp)
+                    found = True
+                if candidate_limit > 0:
+                    clipped = max(spread, 0.0)
+                    if len(heap) < candidate_limit or clipped > heap[0][0]:
+                        if opp is None:
+                            opp = Opportunity(symbol, buy_ex, sell_ex, ask, bid, clipped, sell_fee=sell_fee, z=z)
+                        seq += 1
+                        if len(heap) < candidate_limit:
+                            heapq.heappush(heap, (clipped, seq, opp))
+                        else:
+                            heapq.heapreplace(heap, (clipped, seq, opp))
+        if is_pinned and not found:
+            if any_sell_ex is not None and any_buy_ex is not None and any_sell_ex != any_buy_ex:
+                spread, sell_fee = route(symbol, any_buy_ex, any_ask, any_sell_ex, any_bid)
+                if spread is not None:
+                    z = stats.zscore(symbol, any_buy_ex, any_sell_ex, spread) if stats is not None else None
+                    result.pinned.append(
+                        Opportunity(symbol, any_buy_ex, any_sell_ex, any_ask, any_bid, max(spread, 0.0), sell_fee=sell_fee, z=z)
+                    )
+
+    if stats is not None:
+        stats.end()
     opps.sort(key=lambda o: o.spread_pct, reverse=True)
-    return opps
+    result.candidates = [o for _, _, o in sorted(heap, reverse=True)]
+    result.pinned.sort(key=lambda o: o.spread_pct, reverse=True)
+    return result
+
+
+def compute_opportunities(
+    symbols: List[str],
+    tickers_by_exchange: Dict[str, Dict[str, dict]],
+    min_spread_pct: float = 0.0,
+    min_quote_volume_usd: float = 50000.0,
+    fees: FeeMatrix | None = None,
+    consensus: PriceConsensus | None = None,
+    stats: SpreadStats | None = None,
+) -> List[Opportunity]:
+    return scan_quotes(
+        symbols, tickers_by_exchange, min_spread_pct, min_quote_volume_usd, fees, consensus=consensus, stats=stats
+    ).opportunities
+
+
+def filter_by_z(opps: List[Opportunity], min_z: float | None) -> List[Opportunity]:
+    """Opportunities whose spread is at least ``min_z`` deviations above the route's mean."""
+    if min_z is None:
+        return opps
+    return [o for o in opps if o.z is not None and o.z >= min_z]
+
+
+def apply_net_pnl(
+    opps: List[Opportunity],
+    deal_sizes: Sequence[float],
+    transfers: Mapping[str, tuple] | None = None,
+    include_transfers: bool = True,
+) -> None:
+    """Net PnL stage: fill the transfer fields and ``pnl`` of every opportunity.
+
+    Buying for S USDT and selling on the other exchange nets ``S * spread``
+    (``spread_pct`` already contains both taker fees). Transfers cost a
+    fixed amount per deal: the base withdrawal fee at the cheapest common
+    network, valued at the sell-side proceeds, plus the USDT withdrawal fee
+    for bringing the proceeds back. So a deal-size ladder is one multiply
+    and subtract per size.
+
+    ``transfers`` maps ``route_key`` to ``((network, fee) | None, (network,
+    fee) | None)`` for the base and USDT legs (see networks.transfer_networks);
+    routes without an entry count only the fees that are known, and a base
+    leg of None marks the route as not transferable.
+    """
+    sizes = tuple(float(s) for s in deal_sizes)
+    for o in opps:
+        net = o.net = NetPnL()
+        entry = transfers.get(route_key(o.buy_exchange, o.sell_exchange, o.symbol)) if transfers else None
+        if entry is not None:
+            base_leg, quote_leg = entry
+            net.transferable = base_leg is not None
+            net.transfers_known = base_leg is not None and base_leg[1] is not None and quote_leg is not None and quote_leg[1] is not None
+            if base_leg is not None:
+                net.base_network, net.base_withdraw_fee = base_leg
+                if net.base_withdraw_fee is not None:
+                    net.transfer_cost += net.base_withdraw_fee * o.sell_price * (1.0 - o.sell_fee)
+            if quote_leg is not None and quote_leg[1] is not None:
+                net.quote_withdraw_fee = quote_leg[1]
+                net.transfer_cost += net.quote_withdraw_fee
+        rate = o.spread_pct / 100.0
+        fixed = net.transfer_cost if include_transfers else 0.0
+        net.pnl = tuple(size * rate - fixed for size in sizes)
+
+
+def _transfer_rank(o: Opportunity) -> int:
+    net = o.net
+    if net is None:
+        return 1
+    if not net.transferable:
+        return 2
+    return 0 if net.transfers_known else 1
+
+
+def rank_by_net_pnl(
+    opps: List[Opportunity],
+    min_pnl: float | None = None,
+    include_transfers: bool = True,
+) -> List[Opportunity]:
+    """Opportunities with the best ladder PnL >= ``min_pnl``, best first.
+
+    With transfers counted, a PnL whose fees are not all known is only an
+    upper bound, so such routes come after the ones with known fees, and
+    routes without a common network (nothing to transfer over) come last.
+    """
+    if min_pnl is not None:
+        opps = [o for o in opps if o.best_pnl >= min_pnl]
+    if not include_transfers:
+        return sorted(opps, key=lambda o: o.best_pnl, reverse=True)
+    return sorted(opps, key=lambda o: (_transfer_rank(o), -o.best_pnl))
@@ -0,0 +1,170 @@
+"""Per-cycle symbol selection under a fixed request budget.
+
+Exchanges without a usable bulk endpoint are polled symbol by symbol, so the
+workers can only ask for ``budget`` symbols per cycle. ``SymbolScheduler``
+splits that budget: the hot part goes to the best-ranked symbols every cycle,
+the rest walks the remaining universe in a rotating slice, so every symbol is
+fetched at least once every ``coverage_cycles + 1`` cycles. Each exchange
+keeps its own position in the rotation (``next_batch(name)``): exchanges are
+polled at different cadences, and a shared cursor would advance on every
+cycle any of them is due, so a slower one would skip slices.
+
+Ranking uses what the fetches return anyway (any exchange, including bulk
+ones that return the whole market): an EWMA of the best cross-exchange raw
+spread, an EWMA of the absolute mid-price move between observations, and the
+largest 24h quote volume.
+
+Boosted symbols (new cross-exchange listings, see markets.py) are fetched
+every cycle like pinned ones until their boost expires.
+"""
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set
+
+
+@dataclass
+class SymbolStats:
+    spread_pct: float = 0.0  # EWMA of (best bid - best ask) / best ask, percent
+    move_pct: float = 0.0  # EWMA of |mid change| between observations, percent
+    quote_volume: float = 0.0
+    mid: float | None = None
+    observations: int = 0
+
+
+class SymbolScheduler:
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        budget: int,
+        hot_fraction: float = 0.5,
+        pinned: Iterable[str] = (),
+        alpha: float = 0.3,
+    ) -> None:
+        self.symbols: List[str] = list(symbols)
+        self.budget = max(1, int(budget))
+        self.hot_fraction = min(max(hot_fraction, 0.0), 1.0)
+        self.pinned: Set[str] = set(pinned)
+        self.alpha = alpha
+        self.stats: Dict[str, SymbolStats] = {}
+        self.hot: List[str] = []
+        self.boosted: Dict[str, float] = {}  # symbol -> monotonic expiry
+        self._cursors: Dict[str, int] = {}  # exchange -> position of its cold rotation
+
+    @property
+    def hot_size(self) -> int:
+        return min(len(self.symbols), int(self.budget * self.hot_fraction))
+
+    @property
+    def cold_slice(self) -> int:
+        pinned = len(self.pinned.union(self.boosted).intersection(self.symbols))
+        return max(1, self.budget - self.hot_size - pinned)
+
+    @property
+    def coverage_cycles(self) -> int:
+        """Cycles the rotating slice needs to walk the whole cold universe."""
+        cold = max(0, len(self.symbols) - self.hot_size)
+        return max(1, math.ceil(cold / self.cold_slice))
+
+    def score(self, symbol: str) -> float:
+        st = self.stats.get(symbol)
+        if st is None or not st.observations:
+            return 0.0
+        # spread dominates; volume only breaks ties between similar spreads
+        return max(st.spread_pct, 0.0) + st.move_pct + 0.01 * math.log10(1.0 + st.quote_volume)
+
+    def boost(self, symbols: Iterable[str], seconds: float, now: float | None = None) -> None:
+        """Fetch ``symbols`` every cycle for the next ``seconds``."""
+        until = (time.monotonic() if now is None else now) + seconds
+        for sym in symbols:
+            self.boosted[sym] = until
+
+    def _expire_boosts(self) -> None:
+        now = time.monotonic()
+        for sym in [s for s, until in self.boosted.items() if until <= now]:
+            del self.boosted[sym]
+
+    def set_universe(self, symbols: Iterable[str], budget: int | None = None) -> None:
+        """Swap the symbol universe in place; stats of symbols that stay are kept."""
+        self.symbols = list(symbols)
+        if budget is not None:
+            self.budget = max(1, int(budget))
+        keep = set(self.symbols)
+        self.hot = [s for s in self.hot if s in keep]
+        self.boosted = {s: t for s, t in self.boosted.items() if s in keep}
+        for sym in [s for s in self.stats if s not in keep]:
+            del self.stats[sym]
+        total = len(self.symbols)
+        self._cursors = {name: (pos % total if total else 0) for name, pos in self._cursors.items()}
+
+    def next_batch(self, exchange: str = "") -> List[str]:
+        """Symbols to fetch from ``exchange`` this cycle: pinned + boosted + hot + its next cold slice."""
+        self._expire_boosts()
+        if len(self.symbols) <= self.budget:
+            return list(self.symbols)
+        ranked = sorted(self.symbols, key=self.score, reverse=True)
+        self.hot = [s for s in ranked[: self.hot_size] if self.score(s) > 0.0]
+        chosen = set(self.hot) | ((self.pinned | set(self.boosted)) & set(self.symbols))
+        batch = [s for s in self.symbols if s in chosen]
+        # the cursor walks the full universe, so a symbol leaving the hot set
+        # cannot shift the rotation past cold symbols that are still due
+        n = self.cold_slice + (self.hot_size - len(self.hot))
+        total = len(self.symbols)
+        pos = self._cursors.get(exchange, 0) % total
+        steps = 0
+        while n > 0 and steps < total:
+            sym = self.symbols[pos]
+            if sym not in chosen:
+                batch.append(sym)
+                n -= 1
+            pos = (pos + 1) % total
+            steps += 1
+        self._cursors[exchange] = pos
+        return batch
+
+    def observe(self, tickers_by_exchange: Dict[str, Dict[str, dict]]) -> None:
+        """Update per-symbol stats from one cycle of normalized tickers."""
+        best: Dict[str, List[float]] = {}  # symbol -> [best_bid, best_ask, max_qv]
+        for tickers in tickers_by_exchange.values():
+            for sym, t in tickers.items():
+                bid = t.get("bid")
+                ask = t.get("ask")
+                if bid is None or ask is None:
+                    continue
+                qv = t.get("quoteVolume") or 0.0
+                b = best.get(sym)
+                if b is None:
+                    best[sym] = [float(bid), float(ask), float(qv)]
+                    continue
+                if bid > b[0]:
+                    b[0] = float(bid)
+                if ask < b[1]:
+                    b[1] = float(ask)
+                if qv > b[2]:
+                    b[2] = float(qv)
+        a = self.alpha
+        for sym, (bid, ask, qv) in best.items():
+            if ask <= 0.0 or bid <= 0.0:
+                continue
+            st = self.stats.get(sym)
+            if st is None:
+                st = self.stats[sym] = SymbolStats()
+            spread = (bid - ask) / ask * 100.0
+            mid = (bid + ask) / 2.0
+            if st.observations:
+                st.spread_pct += a * (spread - st.spread_pct)
+                if st.mid:
+                    st.move_pct += a * (abs(mid - st.mid) / st.mid * 100.0 - st.move_pct)
+            else:
+                st.spread_pct = spread
+            st.mid = mid
+            st.quote_volume = qv
+            st.observations += 1
+
+    def describe(self) -> str:
+        if len(self.symbols) <= self.budget:
+            return f"все {len(self.symbols)}"
+        new = f", новых {len(self.boosted)}" if self.boosted else ""
+        return f"{self.budget}: горячих {len(self.hot)}{new}, полный обход за {self.coverage_cycles} цикл."
@@ -0,0 +1,241 @@
+"""Streaming spread statistics per route (symbol, buy exchange, sell exchange).
+
+Every scanner pass feeds the net spread of each symbol's best route (see
+``scanner.scan_quotes``), so a route's typical spread is known without
+keeping its history:
+
+- EWMA mean and variance of the spread, giving a z-score of the current one
+  against the route's past (``RouteStats.z``, None until ``min_samples``);
+- P² quantile sketches (Jain & Chlamtac, 1985) of the spread, five markers
+  each, for the median and the 95th percentile;
+- persistence: how long the spread stays positive once it opens, as a
+  count, mean, maximum and P² median of the run durations.
+
+A pass that sees the same spread as the last one adds no sample: the quotes
+have not changed, and repeating them would skew the statistics towards
+illiquid pairs. Memory is bounded: routes idle for ``idle_ttl`` seconds are
+dropped, and beyond ``max_pairs`` the least recently seen ones go first
+(about 1 KB per route).
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import time
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Tuple
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+MAX_PAIRS = int(_env_float("ARB_STATS_MAX_PAIRS", 20000))
+IDLE_TTL = _env_float("ARB_STATS_IDLE_SEC", 3600.0)
+
+RouteKey = Tuple[str, str, str]
+
+
+@lru_cache(maxsize=None)
+def _increments(p: float) -> Tuple[float, ...]:
+    return (0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0)
+
+
+class P2Quantile:
+    """One quantile estimated by the P² algorithm in constant memory."""
+
+    __slots__ = ("p", "count", "m")
+
+    def __init__(self, p: float) -> None:
+        self.p = p
+        self.count = 0
+        # marker heights [0:5], actual positions [5:10], desired positions [10:15]
+        self.m = array("d", [0.0] * 5 + [0.0, 1.0, 2.0, 3.0, 4.0] + [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0])
+
+    def add(self, x: float) -> None:
+        m = self.m
+        count = self.count = self.count + 1
+        if count <= 5:
+            # the first five samples, kept sorted, become the markers
+            i = count - 1
+            while i > 0 and m[i - 1] > x:
+                m[i] = m[i - 1]
+                i -= 1
+            m[i] = x
+            return
+        if x < m[0]:
+            m[0] = x
+            k = 0
+        elif x >= m[4]:
+            m[4] = x
+            k = 3
+        else:
+            k = bisect_right(m[0:5], x) - 1
+        for i in range(k + 1, 5):
+            m[5 + i] += 1.0
+        dn = _increments(self.p)
+        for i in range(5):
+            m[10 + i] += dn[i]
+        for i in (1, 2, 3):
+            n_prev, n, n_next = m[4 + i], m[5 + i], m[6 + i]
+            d = m[10 + i] - n
+            if (d >= 1.0 and n_next - n > 1.0) or (d <= -1.0 and n_prev - n < -1.0):
+                s = 1.0 if d > 0 else -1.0
+                q_prev, q, q_next = m[i - 1], m[i], m[i + 1]
+                # piecewise-parabolic prediction, linear if it leaves the neighbours' range
+                qp = q + s / (n_next - n_prev) * (
+                    (n - n_prev + s) * (q_next - q) / (n_next - n) + (n_next - n - s) * (q - q_prev) / (n - n_prev)
+                )
+                if not q_prev < qp < q_next:
+                    j = i + int(s)
+                    qp = q + s * (m[j] - q) / (m[5 + j] - n)
+                m[i] = qp
+                m[5 + i] = n + s
+
+    def value(self) -> float | None:
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self.m[min(self.count - 1, int(round(self.p * (self.count - 1))))]
+        return self.m[2]
+
+
+class RouteStats:
+    __slots__ = (
+        "count", "mean", "var", "last", "z", "seen", "last_ts",
+        "p50", "p95", "opened", "runs", "run_total", "run_max", "run_p50",
+    )
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.last: float | None = None  # last spread sample
+        self.z: float | None = None  # z-score of the last sample against the ones before it
+        self.seen = 0  # pass number
+        self.last_ts = 0.0
+        self.p50 = P2Quantile(0.5)
+        self.p95 = P2Quantile(0.95)
+        self.opened: float | None = None  # wall time the current positive run started
+        self.runs = 0
+        self.run_total = 0.0
+        self.run_max = 0.0
+        self.run_p50: P2Quantile | None = None  # created with the first closed run
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+    def close_run(self, now: float) -> None:
+        duration = max(0.0, now - self.opened)
+        self.opened = None
+        self.runs += 1
+        self.run_total += duration
+        self.run_max = max(self.run_max, duration)
+        if self.run_p50 is None:
+            self.run_p50 = P2Quantile(0.5)
+        self.run_p50.add(duration)
+
+
+class SpreadStats:
+    def __init__(
+        self,
+        alpha: float = 0.05,
+        min_samples: int = 20,
+        max_pairs: int = MAX_PAIRS,
+        idle_ttl: float = IDLE_TTL,
+    ) -> None:
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_pairs = max_pairs
+        self.idle_ttl = idle_ttl
+        self.routes: Dict[RouteKey, RouteStats] = {}
+        self._open: Dict[RouteKey, RouteStats] = {}
+        self.passes = 0
+        self.now = 0.0
+
+    def begin(self, now: float | None = None) -> None:
+        self.passes += 1
+        self.now = time.time() if now is None else now
+
+    def observe(self, symbol: str, buy: str, sell: str, spread: float) -> float | None:
+        """Feed the spread of a route in this pass; returns its z-score (None while too few samples)."""
+        key = (symbol, buy, sell)
+        st = self.routes.get(key)
+        if st is None:
+            st = self.routes[key] = RouteStats()
+        st.seen = self.passes
+        st.last_ts = self.now
+        if spread > 0.0:
+            if st.opened is None:
+                st.opened = self.now
+                self._open[key] = st
+        elif st.opened is not None:
+            st.close_run(self.now)
+            del self._open[key]
+        if spread == st.last:
+            return st.z
+        st.last = spread
+        count = st.count = st.count + 1
+        if count == 1:
+            st.mean = spread
+        else:
+            diff = spread - st.mean
+            st.z = diff / math.sqrt(st.var) if count > self.min_samples and st.var > 0.0 else None
+            incr = self.alpha * diff
+            st.mean += incr
+            st.var = (1.0 - self.alpha) * (st.var + diff * incr)
+        st.p50.add(spread)
+        st.p95.add(spread)
+        return st.z
+
+    def zscore(self, symbol: str, buy: str, sell: str, spread: float) -> float | None:
+        """z-score of ``spread`` against the route's statistics, without feeding it."""
+        st = self.routes.get((symbol, buy, sell))
+        if st is None or st.count <= self.min_samples or st.var <= 0.0:
+            return None
+        return (spread - st.mean) / math.sqrt(st.var)
+
+    def end(self) -> None:
+        """Close the runs of routes this pass did not see and keep memory bounded."""
+        for key, st in list(self._open.items()):
+            if st.seen != self.passes:
+                st.close_run(self.now)
+                del self._open[key]
+        if self.passes % 100 == 0 or len(self.routes) > self.max_pairs:
+            self._evict()
+
+    def _evict(self) -> None:
+        routes = self.routes
+        for key in [k for k, st in routes.items() if self.now - st.last_ts > self.idle_ttl]:
+            del routes[key]
+            self._open.pop(key, None)
+        excess = len(routes) - self.max_pairs
+        if excess > 0:
+            for key in heapq.nsmallest(excess, routes, key=lambda k: routes[k].last_ts):
+                del routes[key]
+                self._open.pop(key, None)
+
+    def get(self, symbol: str, buy: str, sell: str) -> RouteStats | None:
+        return self.routes.get((symbol, buy, sell))
+
+    def describe(self, symbol: str, buy: str, sell: str) -> str:
+        """One line for the details panel."""
+        st = self.get(symbol, buy, sell)
+        if st is None or st.count == 0:
+            return "Статистика: нет данных"
+        parts = [
+            f"обычно {st.p50.value():.3f}% (p95 {st.p95.value():.3f}%)",
+            f"σ {st.std:.3f}",
+            f"{st.count} изм.",
+        ]
+        if st.runs:
+            median = st.run_p50.value() if st.run_p50 is not None else None
+            parts.append(f"держится {median or 0.0:.0f}с (макс {st.run_max:.0f}с, {st.runs} раз)")
+        return "Спред: " + ", ".join(parts)
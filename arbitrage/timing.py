@@ -0,0 +1,118 @@
+"""Rolling per-stage timings for the scan pipeline."""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Awaitable, Deque, Dict, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def _pct(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[idx]
+
+
+class _Span:
+    __slots__ = ("_timer", "_stage", "_t0")
+
+    def __init__(self, timer: "StageTimer", stage: str) -> None:
+        self._timer = timer
+        self._stage = stage
+
+    def __enter__(self) -> "_Span":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._timer.add(self._stage, time.perf_counter() - self._t0)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StageTimer:
+    """Keeps the last ``window`` durations per stage (seconds, monotonic clock).
+
+    Stage names like ``fetch:bybit`` are grouped per exchange in the report.
+    Appends to a deque are atomic, so the Tk thread may record render times
+    while the worker records the rest.
+    """
+
+    enabled = True
+
+    def __init__(self, window: int = 200) -> None:
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        buf = self.samples.get(stage)
+        if buf is None:
+            buf = self.samples.setdefault(stage, deque(maxlen=self.window))
+        buf.append(seconds)
+
+    def stage(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    async def timed(self, name: str, aw: Awaitable[T]) -> T:
+        t0 = time.perf_counter()
+        try:
+            return await aw
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def percentiles(self) -> Dict[str, Tuple[float, float, float, int]]:
+        """stage -> (p50, p95, p99, samples) in milliseconds."""
+        out: Dict[str, Tuple[float, float, float, int]] = {}
+        for name, buf in list(self.samples.items()):
+            values = sorted(buf)
+            out[name] = (_pct(values, 0.50) * 1e3, _pct(values, 0.95) * 1e3, _pct(values, 0.99) * 1e3, len(values))
+        return out
+
+    def summary_line(self, stages: Tuple[str, ...] = ("cycle", "fetch", "compute", "networks", "render")) -> str:
+        pct = self.percentiles()
+        parts = []
+        for name in stages:
+            if name in pct:
+                p50, p95, p99, _ = pct[name]
+                parts.append(f"{name} {p50:.0f}/{p95:.0f}/{p99:.0f}")
+        per_ex = [f"{name.split(':', 1)[1]} {v[1]:.0f}" for name, v in sorted(pct.items()) if name.startswith("fetch:")]
+        if per_ex:
+            parts.append("| fetch p95: " + " ".join(per_ex))
+        return "p50/p95/p99 мс: " + "  ".join(parts) if parts else ""
+
+
+class NullTimer:
+    """Drop-in for ``StageTimer`` when instrumentation is off."""
+
+    enabled = False
+
+    def add(self, stage: str, seconds: float) -> None:
+        return None
+
+    def stage(self, name: str) -> _NullSpan:
+        return _NULL_SPAN
+
+    def timed(self, name: str, aw: Awaitable[T]) -> Awaitable[T]:
+        return aw
+
+    def percentiles(self) -> Dict[str, Tuple[float, float, float, int]]:
+        return {}
+
+    def summary_line(self, stages: Tuple[str, ...] = ()) -> str:
+        return ""
+
+
+NULL_TIMER = NullTimer()
@@ -0,0 +1,213 @@
+"""Opt-in span tracer writing Chrome trace-event JSON (chrome://tracing, Perfetto).
+
+Spans are complete ("X") events. Each asyncio task gets its own track (a
+virtual ``tid``), so the per-exchange coroutines launched by
+``asyncio.gather`` show up as parallel rows nested in time under the span
+that launched them; the parent span name is kept in ``args.parent``.
+Synchronous code (the fallback worker, the Tk thread) uses one track per
+thread. Files use the JSON array format without the closing bracket, which
+trace viewers accept, and rotate by size.
+
+Tracing is off unless ``enable`` is called; ``span`` then costs one global
+lookup and returns a shared no-op context manager.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+# (owner task or thread id, track id, current span name)
+_current: contextvars.ContextVar[Optional[Tuple[int, int, str]]] = contextvars.ContextVar("arb_trace_track", default=None)
+
+
+def _owner() -> Tuple[int, str]:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task), task.get_name()
+    th = threading.current_thread()
+    return -(th.ident or 0), th.name
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_cat", "_args", "_t0", "_track", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict[str, Any]) -> None:
+        self._tracer = tracer
+        self._name = name
+        self._cat = cat
+        self._args = args
+
+    def __enter__(self) -> "_Span":
+        owner, owner_name = _owner()
+        cur = _current.get()
+        if cur is not None and cur[0] == owner:
+            self._track = cur[1]
+        else:
+            # first span in this task/thread: new track, remember who launched it
+            self._track = self._tracer._new_track(owner, owner_name)
+            if cur is not None:
+                self._args = {**self._args, "parent": cur[2]}
+        self._token = _current.set((owner, self._track, self._name))
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        dur = time.perf_counter_ns() - self._t0
+        _current.reset(self._token)
+        args = self._args
+        if exc_type is not None:
+            args = {**args, "error": exc_type.__name__}
+        self._tracer._emit({
+            "name": self._name,
+            "cat": self._cat,
+            "ph": "X",
+            "ts": self._t0 // 1000,
+            "dur": dur // 1000,
+            "pid": self._tracer.pid,
+            "tid": self._track,
+            "args": args,
+        })
+
+
+class Tracer:
+    def __init__(self, directory: str, max_bytes: int = 32 * 1024 * 1024, max_files: int = 10, flush_every: int = 512) -> None:
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max(64 * 1024, int(max_bytes))
+        self.max_files = max(1, int(max_files))
+        self.flush_every = flush_every
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._buf: List[str] = []
+        self._file = None
+        self._size = 0
+        self._seq = 0
+        self._track_ids: Dict[int, int] = {}
+        self._track_names: Dict[int, str] = {}
+        self._next_track = itertools.count(1)
+        self.current_path: Optional[str] = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def span(self, name: str, cat: str = "scan", **args: Any) -> _Span:
+        return _Span(self, name, cat, args)
+
+    def _new_track(self, owner: int, owner_name: str) -> int:
+        with self._lock:
+            track = self._track_ids.get(owner)
+            if track is None:
+                track = next(self._next_track)
+                # task ids are recycled by the allocator; keep the map small
+                if len(self._track_ids) > 10000:
+                    self._track_ids.clear()
+                self._track_ids[owner] = track
+            self._track_names[track] = owner_name
+            self._buf.append(self._thread_name_event(track, owner_name))
+        return track
+
+    def _thread_name_event(self, track: int, name: str) -> str:
+        return json.dumps({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": track, "args": {"name": name}})
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, separators=(",", ":"), default=str)
+        with self._lock:
+            self._buf.append(line)
+            if len(self._buf) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open_locked(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._seq += 1
+        name = f"trace_{time.strftime('%Y%m%d_%H%M%S')}_{self._seq:04d}.json"
+        self.current_path = os.path.join(self.directory, name)
+        self._file = open(self.current_path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._size = 2
+        # viewers need thread names in every file
+        for track, tname in self._track_names.items():
+            line = self._thread_name_event(track, tname) + ",\n"
+            self._file.write(line)
+            self._size += len(line)
+        files = sorted(n for n in os.listdir(self.directory) if n.startswith("trace_") and n.endswith(".json"))
+        for old in files[: max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+
+    def _flush_locked(self) -> None:
+        if not self._buf:
+            return
+        if self._file is None or self._size >= self.max_bytes:
+            self._open_locked()
+        data = ",\n".join(self._buf) + ",\n"
+        self._buf = []
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+
+_TRACER: Optional[Tracer] = None
+
+
+def enable(directory: str, max_bytes: int = 32 * 1024 * 1024, max_files: int = 10) -> Tracer:
+    global _TRACER
+    if _TRACER is None:
+        _TRACER = Tracer(directory, max_bytes=max_bytes, max_files=max_files)
+    return _TRACER
+
+
+def disable() -> None:
+    global _TRACER
+    tracer, _TRACER = _TRACER, None
+    if tracer is not None:
+        tracer.close()
+
+
+def enabled() -> bool:
+    return _TRACER is not None
+
+
+def span(name: str, cat: str = "scan", **args: Any):
+    tracer = _TRACER
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, cat, **args)
+
+
+def flush() -> None:
+    tracer = _TRACER
+    if tracer is not None:
+        tracer.flush()
@@ -0,0 +1,120 @@
+"""Shared aiohttp transport for the async ccxt exchanges.
+
+By default every ccxt exchange opens its own ``ClientSession`` with a fresh
+``TCPConnector`` (10 s DNS cache, aiodns when installed). Here one session
+per event loop is shared by all exchanges and handed to ccxt through the
+``session`` config key; ccxt then treats it as foreign and never closes it,
+so ``close_shared_session`` does that once the exchanges are closed.
+
+The connector keeps connections alive longer, caches DNS for minutes and
+always uses the threaded (``getaddrinfo``) resolver, which behaves like the
+sync ``requests`` path and avoids the aiodns resolution failures we saw with
+bybit vs bybitglobal. ``install_uvloop`` switches to uvloop when installed.
+
+Set ``ARB_HTTP_TRANSPORT=default`` (or ``--http-transport default`` in the
+CLI) to go back to the ccxt defaults.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import ssl
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class TransportConfig:
+    limit: int = 100
+    limit_per_host: int = 20
+    keepalive_timeout: float = 60.0
+    ttl_dns_cache: int = 300
+    connect_timeout: float = 10.0
+
+
+CONFIG = TransportConfig()
+_ENABLED = os.getenv("ARB_HTTP_TRANSPORT", "shared").strip().lower() != "default"
+_SESSIONS: Dict[int, Any] = {}  # id(loop) -> session; checked against the loop before reuse
+
+
+def set_enabled(enabled: bool) -> None:
+    global _ENABLED
+    _ENABLED = bool(enabled)
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def _ssl_context() -> ssl.SSLContext:
+    try:
+        import certifi
+
+        return ssl.create_default_context(cafile=certifi.where())
+    except Exception:
+        return ssl.create_default_context()
+
+
+def shared_session() -> Optional[Any]:
+    """Session for the running loop (created on first use), or None when disabled."""
+    if not _ENABLED:
+        return None
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    session = _SESSIONS.get(id(loop))
+    if session is not None and not session.closed and getattr(session, "_loop", None) is loop:
+        return session
+    # loops that died without close_shared_session: their ids can be reused
+    for key in [k for k, s in _SESSIONS.items() if s.closed or _loop_closed(s)]:
+        del _SESSIONS[key]
+    connector = aiohttp.TCPConnector(
+        limit=CONFIG.limit,
+        limit_per_host=CONFIG.limit_per_host,
+        keepalive_timeout=CONFIG.keepalive_timeout,
+        ttl_dns_cache=CONFIG.ttl_dns_cache,
+        use_dns_cache=True,
+        resolver=aiohttp.ThreadedResolver(),
+        ssl=_ssl_context(),
+        enable_cleanup_closed=True,
+    )
+    session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(sock_connect=CONFIG.connect_timeout),
+    )
+    _SESSIONS[id(loop)] = session
+    return session
+
+
+def _loop_closed(session: Any) -> bool:
+    loop = getattr(session, "_loop", None)
+    return loop is None or loop.is_closed()
+
+
+def exchange_options() -> Dict[str, Any]:
+    """Extra ccxt constructor options: the shared session when enabled."""
+    session = shared_session()
+    return {"session": session} if session is not None else {}
+
+
+async def close_shared_session() -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    session = _SESSIONS.get(id(loop))
+    if session is None or getattr(session, "_loop", None) is not loop:
+        return
+    del _SESSIONS[id(loop)]
+    if not session.closed:
+        await session.close()
+
+
+def install_uvloop() -> bool:
+    """Use uvloop for new event loops if it is installed (not available on Windows)."""
+    try:
+        import uvloop  # type: ignore
+    except Exception:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
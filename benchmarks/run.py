@@ -0,0 +1,265 @@
+"""Offline benchmarks for the scanner, normalization and network-selection hot paths.
+
+    python -m benchmarks.run                 # run and compare against baseline.json
+    python -m benchmarks.run --save-baseline --filter scan_quotes  # update these entries
+    python -m benchmarks.run --quick         # smallest scales only
+    python -m benchmarks.run --htx-payload htx_tickers.json.gz  # recorded HTX body
+
+Throughput is normalised by a fixed pure-Python calibration loop, so a
+baseline recorded on one machine stays meaningful on another. A benchmark
+fails when its normalised throughput drops, or its peak traced allocation
+grows, by more than ``--tolerance``. ``--save-baseline`` only writes the
+cases that ran, so re-saving one case keeps the reference numbers of the
+others.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import gzip
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from arbitrage.exchanges import _normalize_tickers
+from arbitrage.fees import FeeMatrix
+from arbitrage.htx import decode_payload
+from arbitrage.networks import _extract_currency_networks, _normalize_network_name
+from arbitrage.consensus import PriceConsensus
+from arbitrage.scanner import compute_opportunities, scan_quotes
+from arbitrage.spreadstats import SpreadStats
+
+from .synthetic import (
+    FakeCurrenciesExchange,
+    make_exchange_names,
+    make_htx_payload,
+    make_network_names,
+    make_symbols,
+    make_tickers_by_exchange,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+SCALES: List[Tuple[int, int]] = [(500, 3), (2000, 8), (5000, 20)]
+QUICK_SCALES: List[Tuple[int, int]] = [(500, 3)]
+
+
+def _calibrate() -> float:
+    """Seconds for a fixed dict/float workload resembling the hot paths."""
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        d: Dict[str, float] = {}
+        for i in range(200_000):
+            d[str(i & 1023)] = float(i) * 1.0001
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _measure(fn: Callable[[], object], items: int, min_time: float) -> Dict[str, float]:
+    fn()  # warm-up
+    gc.collect()
+    runs: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(runs) < 3 or time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+        if len(runs) >= 50:
+            break
+    runs.sort()
+    best = runs[0]
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "best_s": best,
+        "median_s": runs[len(runs) // 2],
+        "items_per_s": items / best if best > 0 else 0.0,
+        "peak_kb": peak / 1024.0,
+    }
+
+
+def _htx_full_decode(payload: bytes, wanted: Dict[str, str]) -> Dict[str, dict]:
+    """The non-streaming equivalent: inflate and parse the whole document first."""
+    doc = json.loads(gzip.decompress(payload))
+    out: Dict[str, dict] = {}
+    for t in doc.get("data", []):
+        sym = wanted.get(t.get("symbol"))
+        if sym is not None:
+            out[sym] = {"bid": t.get("bid"), "ask": t.get("ask"), "quoteVolume": t.get("vol")}
+    return out
+
+
+def _htx_cases(payload: bytes, tag: str, n_wanted: int) -> List[Tuple[str, Callable[[], object], int]]:
+    # requested set: the first n_wanted USDT ids in the payload (like a scanner symbol union)
+    data = json.loads(gzip.decompress(payload))["data"]
+    ids = [t["symbol"] for t in data if str(t.get("symbol", "")).endswith("usdt")]
+    wanted = {i: f"{i[:-4].upper()}/USDT" for i in ids[:n_wanted]}
+    entries = len(data)
+    return [
+        (f"htx_stream_decode[{tag}]", lambda: decode_payload(payload, wanted), entries),
+        (f"htx_full_decode[{tag}]", lambda: _htx_full_decode(payload, wanted), entries),
+    ]
+
+
+def _cases(scales: List[Tuple[int, int]], htx_payload: bytes | None = None) -> List[Tuple[str, Callable[[], object], int]]:
+    cases: List[Tuple[str, Callable[[], object], int]] = []
+    for n_sym, n_ex in scales:
+        symbols = make_symbols(n_sym)
+        exchanges = make_exchange_names(n_ex)
+        raw = make_tickers_by_exchange(symbols, exchanges, seed=n_sym + n_ex)
+        normalized = {ex: _normalize_tickers(ex, t) for ex, t in raw.items()}
+        quotes = sum(len(t) for t in raw.values())
+        tag = f"{n_sym}x{n_ex}"
+        # built once per universe in the workers, so outside the timed call
+        fees = FeeMatrix(symbols, {ex: None for ex in exchanges})
+
+        cases.append((
+            f"normalize_tickers[{tag}]",
+            lambda raw=raw: [_normalize_tickers(ex, t) for ex, t in raw.items()],
+            quotes,
+        ))
+        cases.append((
+            f"compute_opportunities[{tag}]",
+            lambda s=symbols, n=normalized, f=fees: compute_opportunities(s, n, 0.0, min_quote_volume_usd=50000.0, fees=f),
+            n_sym * n_ex,
+        ))
+        cases.append((
+            f"compute_opportunities_all[{tag}]",
+            lambda s=symbols, n=normalized, f=fees: compute_opportunities(s, n, -1e9, min_quote_volume_usd=0.0, fees=f),
+            n_sym * n_ex,
+        ))
+        # GUI cycle in a quiet market: nothing passes, so pinned pairs and candidates are shown
+        cases.append((
+            f"scan_quotes_quiet[{tag}]",
+            lambda s=symbols, n=normalized, f=fees, c=PriceConsensus(): scan_quotes(
+                s, n, 5.0, 50000.0, fees=f, pinned=s[:5], candidate_limit=20, consensus=c
+            ),
+            n_sym * n_ex,
+        ))
+        # 2% of the quotes belong to another token with the same ticker
+        mixed = {
+            ex: _normalize_tickers(ex, t)
+            for ex, t in make_tickers_by_exchange(symbols, exchanges, seed=n_sym + n_ex, mismatched=0.02).items()
+        }
+        cases.append((
+            f"scan_quotes_mismatched[{tag}]",
+            lambda s=symbols, n=mixed, f=fees, c=PriceConsensus(): scan_quotes(s, n, 0.0, 50000.0, fees=f, consensus=c),
+            n_sym * n_ex,
+        ))
+        # spread statistics with fresh quotes every pass: each call scans both
+        # snapshots, so every measured call (timed or traced) does the same work
+        cases.append((
+            f"scan_quotes_stats[{tag}]",
+            lambda s=symbols, snaps=(normalized, mixed), f=fees, st=SpreadStats(): [
+                scan_quotes(s, snap, 0.0, 50000.0, fees=f, stats=st) for snap in snaps
+            ],
+            2 * n_sym * n_ex,
+        ))
+
+    codes = [s.split("/")[0] for s in make_symbols(500)] + ["USDT"]
+    fake = FakeCurrenciesExchange(codes)
+    cases.append((
+        "extract_currency_networks[500]",
+        lambda: [_extract_currency_networks(fake, c) for c in codes],
+        len(codes),
+    ))
+    names = make_network_names(5000)
+    cases.append((
+        "normalize_network_name[5000]",
+        lambda: [_normalize_network_name(n) for n in names],
+        len(names),
+    ))
+    if htx_payload is not None:
+        cases += _htx_cases(htx_payload, "recorded", 600)
+    else:
+        cases += _htx_cases(make_htx_payload(1500), "1500", 600)
+    return cases
+
+
+def _compare(results: Dict[str, Dict[str, float]], calib: float, baseline: dict, tolerance: float) -> List[str]:
+    failures: List[str] = []
+    base_calib = float(baseline.get("calibration_s") or calib)
+    for name, cur in results.items():
+        ref = baseline.get("results", {}).get(name)
+        if not ref:
+            continue
+        # throughput expressed in calibration units is roughly machine independent
+        cur_norm = cur["items_per_s"] * calib
+        ref_norm = ref["items_per_s"] * base_calib
+        if ref_norm > 0 and cur_norm < ref_norm * (1.0 - tolerance):
+            failures.append(f"{name}: throughput {cur_norm / ref_norm:.0%} of baseline")
+        if ref.get("peak_kb", 0) > 0 and cur["peak_kb"] > ref["peak_kb"] * (1.0 + tolerance):
+            failures.append(f"{name}: peak allocation {cur['peak_kb']:.0f} KB vs {ref['peak_kb']:.0f} KB")
+    return failures
+
+
+def _save_baseline(path: str, results: Dict[str, Dict[str, float]], calib: float) -> None:
+    data = {"calibration_s": calib, "python": sys.version.split()[0], "results": {}}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    # stored against the file's calibration, so the normalised throughput is the measured one
+    scale = float(data.get("calibration_s") or calib) / calib
+    for name, r in results.items():
+        data["results"][name] = dict(
+            r, best_s=r["best_s"] * scale, median_s=r["median_s"] * scale, items_per_s=r["items_per_s"] / scale
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main(argv: List[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Бенчмарки горячих путей сканера (офлайн)")
+    p.add_argument("--quick", action="store_true", help="Только минимальный масштаб")
+    p.add_argument("--min-time", type=float, default=0.5, help="Минимальное время замера на кейс (сек)")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Допустимая деградация (доля)")
+    p.add_argument("--baseline", type=str, default=BASELINE_PATH, help="Файл базовой линии")
+    p.add_argument("--save-baseline", action="store_true", help="Записать результаты прогнанных кейсов в базовую линию (остальные не меняются)")
+    p.add_argument("--filter", type=str, default="", help="Запускать только кейсы, содержащие подстроку")
+    p.add_argument("--htx-payload", type=str, default=None, help="Записанный gzip-ответ HTX /market/tickers (python -m arbitrage.htx --record)")
+    args = p.parse_args(argv)
+    htx_payload = None
+    if args.htx_payload:
+        with open(args.htx_payload, "rb") as f:
+            htx_payload = f.read()
+
+    calib = _calibrate()
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'case':<40} {'items/s':>14} {'best ms':>10} {'median ms':>10} {'peak KB':>10}")
+    for name, fn, items in _cases(QUICK_SCALES if args.quick else SCALES, htx_payload):
+        if args.filter and args.filter not in name:
+            continue
+        r = _measure(fn, items, args.min_time)
+        results[name] = r
+        print(f"{name:<40} {r['items_per_s']:>14,.0f} {r['best_s'] * 1e3:>10.2f} {r['median_s'] * 1e3:>10.2f} {r['peak_kb']:>10,.0f}")
+
+    if args.save_baseline:
+        _save_baseline(args.baseline, results, calib)
+        print(f"Baseline saved: {args.baseline} ({len(results)} cases)")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline first.")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = _compare(results, calib, baseline, args.tolerance)
+    if failures:
+        print("REGRESSIONS:")
+        for line in failures:
+            print("  " + line)
+        return 1
+    print("OK: no regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
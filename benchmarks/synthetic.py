@@ -0,0 +1,165 @@
+"""Deterministic synthetic market data shaped like ccxt responses."""
+from __future__ import annotations
+
+import gzip
+import json
+import random
+from typing import Any, Dict, List
+
+_NETWORK_ALIASES = [
+    "TRC20", "TRX", "Tron", "ERC20", "ETH", "Ethereum", "BEP20", "BSC", "BEP20(BSC)",
+    "Arbitrum One", "ARBITRUM", "Optimism", "OP", "Polygon", "MATIC", "SOL", "Solana",
+    "AVAXC", "TON", "APT", "KAVAEVM", "zkSync Era", "Base", "NEAR",
+]
+
+
+def make_symbols(n: int) -> List[str]:
+    """Return ``n`` distinct BASE/USDT symbols (sorted, like get_usdt_spot_symbols)."""
+    out: List[str] = []
+    i = 0
+    while len(out) < n:
+        a, rem = divmod(i, 26 * 26)
+        b, c = divmod(rem, 26)
+        base = chr(65 + a % 26) + chr(65 + b) + chr(65 + c) + ("" if i < 26 ** 3 else str(i))
+        out.append(f"{base}/USDT")
+        i += 1
+    out.sort()
+    return out
+
+
+def make_exchange_names(n: int) -> List[str]:
+    real = ["bitget", "bingx", "bybit", "kucoin", "htx", "mexc", "gateio", "bitmart", "coinw"]
+    return real[:n] + [f"ex{i:02d}" for i in range(max(0, n - len(real)))]
+
+
+def _ticker(rng: random.Random, symbol: str, mid: float, ts: int) -> Dict[str, Any]:
+    spread = mid * rng.uniform(0.0001, 0.004)
+    bid = mid - spread / 2
+    ask = mid + spread / 2
+    base_vol = rng.lognormvariate(10, 2)
+    last = rng.uniform(bid, ask)
+    t: Dict[str, Any] = {
+        "symbol": symbol,
+        "timestamp": ts,
+        "datetime": None,
+        "high": last * 1.05,
+        "low": last * 0.95,
+        "bid": bid,
+        "bidVolume": rng.uniform(1, 1000),
+        "ask": ask,
+        "askVolume": rng.uniform(1, 1000),
+        "vwap": last,
+        "open": last * 0.99,
+        "close": last,
+        "last": last,
+        "previousClose": None,
+        "change": last * 0.01,
+        "percentage": 1.0,
+        "average": last,
+        "baseVolume": base_vol,
+        "quoteVolume": base_vol * last,
+        "info": {
+            "symbol": symbol.replace("/", ""),
+            "bidPrice": str(bid),
+            "askPrice": str(ask),
+            "lastPrice": str(last),
+            "volume": str(base_vol),
+            "turnover24h": str(base_vol * last),
+        },
+    }
+    roll = rng.random()
+    if roll < 0.1:
+        # quoteVolume only in info, like BingX
+        t["quoteVolume"] = None
+        t["info"]["quoteVolume"] = str(base_vol * last)
+    elif roll < 0.15:
+        # neither quoteVolume nor info turnover: baseVolume * last fallback
+        t["quoteVolume"] = None
+        t["info"] = {"symbol": symbol.replace("/", ""), "bestBid": str(bid), "bestAsk": str(ask)}
+    elif roll < 0.18:
+        t["bid"] = None
+        t["ask"] = None
+        t["quoteVolume"] = None
+    return t
+
+
+def make_tickers_by_exchange(
+    symbols: List[str],
+    exchanges: List[str],
+    seed: int = 1,
+    coverage: float = 0.8,
+    mismatched: float = 0.0,
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Raw ccxt-shaped ``fetch_tickers`` results per exchange.
+
+    Each exchange lists roughly ``coverage`` of the symbols; prices share a
+    per-symbol mid with small per-exchange deviations so some spreads are positive.
+    A ``mismatched`` share of the quotes is priced as an unrelated token of
+    the same name.
+    """
+    rng = random.Random(seed)
+    mids = {s: rng.lognormvariate(0, 3) for s in symbols}
+    ts = 1_700_000_000_000
+    out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for ex in exchanges:
+        tickers: Dict[str, Dict[str, Any]] = {}
+        for s in symbols:
+            if rng.random() > coverage:
+                continue
+            mid = mids[s]
+            if mismatched > 0.0 and rng.random() < mismatched:
+                mid = rng.lognormvariate(0, 3)
+            tickers[s] = _ticker(rng, s, mid * rng.uniform(0.995, 1.005), ts)
+        out[ex] = tickers
+    return out
+
+
+class FakeCurrenciesExchange:
+    """Minimal object exposing ccxt's ``currencies`` structure with networks."""
+
+    def __init__(self, codes: List[str], seed: int = 1, networks_per_currency: int = 6) -> None:
+        rng = random.Random(seed)
+        self.currencies: Dict[str, Dict[str, Any]] = {}
+        for code in codes:
+            nets: Dict[str, Any] = {}
+            for raw in rng.sample(_NETWORK_ALIASES, networks_per_currency):
+                nets[raw] = {
+                    "id": raw,
+                    "network": raw,
+                    "active": True,
+                    "deposit": rng.random() > 0.1,
+                    "withdraw": {"fee": round(rng.uniform(0.01, 20), 4), "min": 1.0},
+                    "withdrawEnable": rng.random() > 0.1,
+                    "depositEnable": True,
+                    "fee": None,
+                }
+            self.currencies[code] = {"id": code, "code": code, "networks": nets}
+
+
+def make_network_names(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(_NETWORK_ALIASES) for _ in range(n)]
+
+
+def make_htx_payload(n_bases: int, seed: int = 1) -> bytes:
+    """Gzip body shaped like HTX ``/market/tickers``: USDT pairs plus BTC/ETH/HT/USDC crosses.
+
+    Quote mix roughly follows the live endpoint, where USDT pairs are under half
+    of the entries.
+    """
+    rng = random.Random(seed)
+    data: List[Dict[str, Any]] = []
+    for sym in make_symbols(n_bases):
+        base = sym.split("/")[0].lower()
+        mid = rng.lognormvariate(0, 3)
+        quotes = ["usdt"] + [q for q in ("btc", "eth", "ht", "usdc", "trx") if rng.random() < 0.3]
+        for q in quotes:
+            px = mid if q in ("usdt", "usdc") else mid * rng.uniform(1e-6, 1e-3)
+            amount = rng.lognormvariate(10, 2)
+            data.append({
+                "symbol": f"{base}{q}", "open": px * 0.99, "high": px * 1.05, "low": px * 0.95, "close": px,
+                "amount": amount, "vol": amount * px, "count": rng.randint(10, 100000),
+                "bid": px * 0.9995, "bidSize": rng.uniform(1, 1000), "ask": px * 1.0005, "askSize": rng.uniform(1, 1000),
+            })
+    body = {"status": "ok", "ts": 1_700_000_000_000, "data": data}
+    return gzip.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"), compresslevel=6)
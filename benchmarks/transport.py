@@ -0,0 +1,114 @@
+"""Per-cycle latency and CPU of the async fetch path: ccxt default transport vs shared.
+
+Starts the local stand-in venues in a subprocess (so their CPU is not
+counted), then runs each client mode in its own subprocess::
+
+    python -m benchmarks.transport --venues 4 --symbols 600 --cycles 40
+
+Modes: ``default`` (ccxt's own session per exchange), ``shared`` (one pooled
+session with DNS cache, see arbitrage/transport.py) and ``shared+uvloop``
+when uvloop is installed. Venues are addressed as ``localhost`` so name
+resolution is part of the measurement.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def _client(urls: List[str], cycles: int, warmup: int) -> Dict[str, float]:
+    from arbitrage import transport
+    from arbitrage.exchanges import close_exchange, create_exchange_safe, fetch_tickers, get_usdt_spot_symbols, register_fake_exchange
+
+    names = []
+    for i, url in enumerate(urls):
+        name = f"bench{i + 1}"
+        register_fake_exchange(name, url)
+        names.append(name)
+    exchanges = {n: await create_exchange_safe(n) for n in names}
+    exchanges = {n: ex for n, ex in exchanges.items() if ex is not None}
+    symbols = sorted(set().union(*[set(get_usdt_spot_symbols(ex)) for ex in exchanges.values()]))
+    wall: List[float] = []
+    cpu: List[float] = []
+    try:
+        for i in range(warmup + cycles):
+            w0, c0 = time.perf_counter(), time.process_time()
+            await asyncio.gather(*[fetch_tickers(ex, symbols, name=n) for n, ex in exchanges.items()])
+            if i >= warmup:
+                wall.append(time.perf_counter() - w0)
+                cpu.append(time.process_time() - c0)
+    finally:
+        await asyncio.gather(*[close_exchange(ex) for ex in exchanges.values()])
+        await transport.close_shared_session()
+    return {
+        "exchanges": len(exchanges),
+        "p50_ms": _pct(wall, 0.5) * 1e3,
+        "p95_ms": _pct(wall, 0.95) * 1e3,
+        "cpu_ms": sum(cpu) / max(1, len(cpu)) * 1e3,
+    }
+
+
+def _run_mode(mode: str, urls: List[str], cycles: int, warmup: int) -> Dict[str, float]:
+    from arbitrage import transport
+
+    transport.set_enabled(mode != "default")
+    if mode.endswith("+uvloop") and not transport.install_uvloop():
+        raise SystemExit("uvloop not installed")
+    return asyncio.run(_client(urls, cycles, warmup))
+
+
+def main(argv: List[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Сравнение HTTP-транспорта ccxt на локальном стенде")
+    p.add_argument("--venues", type=int, default=4)
+    p.add_argument("--symbols", type=int, default=600)
+    p.add_argument("--latency-ms", type=float, default=20.0)
+    p.add_argument("--cycles", type=int, default=40)
+    p.add_argument("--warmup", type=int, default=3)
+    p.add_argument("--base-port", type=int, default=8950)
+    p.add_argument("--modes", type=str, default="default,shared,shared+uvloop")
+    p.add_argument("--mode", type=str, default=None, help=argparse.SUPPRESS)
+    p.add_argument("--urls", type=str, default="", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(_run_mode(args.mode, args.urls.split(","), args.cycles, args.warmup)))
+        return 0
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "arbitrage.fakeserver", "--venues", str(args.venues), "--symbols", str(args.symbols),
+         "--latency-ms", str(args.latency_ms), "--jitter-ms", "0", "--port", str(args.base_port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    urls = [f"http://localhost:{args.base_port + i}" for i in range(args.venues)]
+    try:
+        time.sleep(1.5)
+        print(f"{'mode':<16} {'p50 ms':>8} {'p95 ms':>8} {'CPU ms/cycle':>13}")
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.transport", "--mode", mode, "--urls", ",".join(urls),
+                 "--cycles", str(args.cycles), "--warmup", str(args.warmup)],
+                capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                print(f"{mode:<16} skipped: {(out.stderr or out.stdout).strip().splitlines()[-1:]}")
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{mode:<16} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['cpu_ms']:>13.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())